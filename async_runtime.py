@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import threading
+
+# One long-lived event loop shared by every entry point. It runs on a daemon
+# thread so the synchronous scripts can hand coroutines to it without paying
+# for a fresh loop (and fresh HTTP connections) on every call.
+
+_loop = None
+_thread = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the shared background event loop, starting it on first use.
+    """
+    global _loop, _thread
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            _thread = threading.Thread(target=_loop.run_forever, name="btrader-loop", daemon=True)
+            _thread.start()
+            logging.info("Background event loop started.")
+    return _loop
+
+
+def in_loop_thread() -> bool:
+    return _thread is not None and threading.current_thread() is _thread
+
+
+def submit(coro):
+    """
+    Schedules a coroutine on the shared loop and returns a concurrent.futures.Future.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro, timeout=None):
+    """
+    Runs a coroutine on the shared loop and blocks the calling thread for its result.
+    Must not be called from the loop thread itself.
+    """
+    if in_loop_thread():
+        raise RuntimeError("async_runtime.run() called from the event loop thread")
+    return submit(coro).result(timeout)
+
+
+async def _cancel_pending():
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def shutdown(timeout=5):
+    """
+    Cancels outstanding tasks, stops the shared loop and joins its thread.
+    """
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop, _thread = None, None
+    if loop is None or loop.is_closed():
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_cancel_pending(), loop).result(timeout)
+    except Exception as e:
+        logging.warning("Error cancelling pending tasks: %s", e)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    loop.close()
+    logging.info("Background event loop stopped.")
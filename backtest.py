@@ -0,0 +1,314 @@
+"""
+Replays recorded alerts against historical option bars.
+
+Each alert is entered the first time a bar trades inside its premium entry
+range during the ideal entry window, then resolved at the first bar that
+touches a target (win) or the stop loss (loss), or at the close of the
+ideal exit time (time exit). Results are reported per model and prompt.
+
+    python backtest.py --alerts data/backtest/alerts_sample.jsonl --bars data/replay/nifty_2025-07-03.csv
+    python backtest.py --alerts a.jsonl b.jsonl --bars bars.csv --workers 4
+
+Alerts are JSON lines: {"ts": ISO time, "model": ..., "prompt": ..., an
+optional "instrument" (default NIFTY), and either "trade": Trade fields or
+"response": raw model text}, or a run store database (.sqlite3), whose
+alerted trades are grouped by prompt hash. Bars are CSV with ts, strike,
+option_type and either open/high/low/close or price. An optional symbol
+column names the underlying (default NIFTY), and each alert is matched
+only against its own instrument's bars. The parsed bars are cached next
+to the CSV as .npz so later runs load in milliseconds.
+"""
+import argparse
+import csv
+import datetime
+import json
+import logging
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields
+from typing import List, Optional
+
+import numpy as np
+
+from market_data import INDEX_SYMBOL, parse_timestamp
+from scheduler import IST, MARKET_CLOSE, MARKET_OPEN
+from trade_parser import Trade
+from trades import extract_trades
+
+LOT_SIZE = int(os.getenv("BACKTEST_LOT_SIZE", "75"))
+TRADE_FIELDS = {f.name for f in fields(Trade)}
+
+TARGET = "target"
+STOP = "stop"
+TIME_EXIT = "time"
+NO_ENTRY = "no_entry"
+NO_DATA = "no_data"
+
+
+@dataclass
+class Alert:
+    ts: float
+    model: str
+    prompt: str
+    trade: Trade
+    instrument: str = INDEX_SYMBOL
+
+
+@dataclass
+class Outcome:
+    alert: Alert
+    status: str
+    entry_price: Optional[float] = None
+    exit_price: Optional[float] = None
+    entry_ts: Optional[float] = None
+    exit_ts: Optional[float] = None
+
+    @property
+    def pnl(self):
+        if self.entry_price is None or self.exit_price is None:
+            return 0.0
+        return self.exit_price - self.entry_price
+
+
+def _trade_from_dict(data):
+    data = {k: v for k, v in data.items() if k in TRADE_FIELDS}
+    data["targets"] = tuple(data.get("targets", ()))
+    data["models"] = tuple(data.get("models", ()))
+    return Trade(**data)
+
+
+def load_store_alerts(path, alerted_only=True) -> List[Alert]:
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(
+            "SELECT r.ts, t.model, r.prompt_hash, t.option_type, t.strike, t.entry_low, t.entry_high, "
+            "t.targets, t.stop_loss, t.confidence, t.entry_from, t.entry_to, t.exit_from, t.exit_to "
+            "FROM trades t JOIN runs r ON r.id = t.run_id" + (" WHERE t.alerted = 1" if alerted_only else "") +
+            " ORDER BY r.ts"
+        ).fetchall()
+    finally:
+        conn.close()
+    alerts = []
+    for ts, model, digest, option_type, strike, entry_low, entry_high, targets, stop_loss, confidence, *times in rows:
+        trade = Trade(option_type, strike, entry_low, entry_high, tuple(json.loads(targets)), stop_loss,
+                      confidence, *times)
+        alerts.append(Alert(ts, model, digest, trade))
+    return alerts
+
+
+def load_alerts(path) -> List[Alert]:
+    if path.endswith((".sqlite3", ".db")):
+        return load_store_alerts(path)
+    alerts = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                ts = parse_timestamp(record["ts"])
+                model = record.get("model", "unknown")
+                prompt = record.get("prompt", "default")
+                instrument = str(record.get("instrument") or INDEX_SYMBOL).upper()
+                if "trade" in record:
+                    trades = [_trade_from_dict(record["trade"])]
+                else:
+                    trades = extract_trades(record.get("response", ""))
+            except (ValueError, KeyError, TypeError) as e:
+                logging.error("Backtest alert %s:%d Error: %s", path, number, e)
+                continue
+            alerts.extend(Alert(ts, model, prompt, trade, instrument) for trade in trades)
+    return alerts
+
+
+class BarStore:
+    """
+    Option bars grouped per (symbol, strike, option type) into sorted NumPy columns.
+    """
+
+    def __init__(self, series):
+        # series: {(symbol, strike, option_type): (ts, open, high, low, close) arrays}
+        self.series = series
+
+    @classmethod
+    def load(cls, path, use_cache=True):
+        cache = os.path.splitext(path)[0] + ".bars.npz"
+        if use_cache and os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            return cls.from_npz(cache)
+        store = cls.from_csv(path)
+        if use_cache:
+            try:
+                store.save_npz(cache)
+            except OSError as e:
+                logging.warning("Could not write bar cache %s: %s", cache, e)
+        return store
+
+    @classmethod
+    def from_csv(cls, path):
+        rows = defaultdict(list)
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                option_type = (row.get("option_type") or "").upper()
+                if not option_type:
+                    continue
+                close = float(row.get("close") or row["price"])
+                symbol = (row.get("symbol") or INDEX_SYMBOL).upper()
+                rows[(symbol, int(float(row["strike"])), option_type)].append((
+                    parse_timestamp(row["ts"]),
+                    float(row.get("open") or close),
+                    float(row.get("high") or close),
+                    float(row.get("low") or close),
+                    close,
+                ))
+        series = {}
+        for key, values in rows.items():
+            data = np.array(values, dtype=np.float64)
+            data = data[np.argsort(data[:, 0], kind="stable")]
+            series[key] = tuple(data[:, i] for i in range(5))
+        return cls(series)
+
+    @classmethod
+    def from_npz(cls, path):
+        with np.load(path) as data:
+            series = {}
+            for name in data.files:
+                parts = name.rsplit("_", 2)
+                # Caches written before bars were keyed by symbol hold only the index.
+                symbol, strike, option_type = parts if len(parts) == 3 else (INDEX_SYMBOL, *parts)
+                columns = data[name]
+                series[(symbol, int(strike), option_type)] = tuple(columns[i] for i in range(5))
+        return cls(series)
+
+    def save_npz(self, path):
+        np.savez(path, **{f"{symbol}_{strike}_{side}": np.vstack(cols)
+                          for (symbol, strike, side), cols in self.series.items()})
+
+    def window(self, strike, option_type, start, end, symbol=INDEX_SYMBOL):
+        cols = self.series.get((symbol, strike, option_type))
+        if cols is None:
+            return None
+        lo = np.searchsorted(cols[0], start, side="left")
+        hi = np.searchsorted(cols[0], end, side="right")
+        return tuple(c[lo:hi] for c in cols)
+
+
+def _session_bounds(ts):
+    day = datetime.datetime.fromtimestamp(ts, IST).replace(hour=0, minute=0, second=0, microsecond=0)
+    midnight = day.timestamp()
+    opens = midnight + (MARKET_OPEN.hour * 60 + MARKET_OPEN.minute) * 60
+    closes = midnight + (MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute) * 60
+    return midnight, opens, closes
+
+
+def simulate(alert: Alert, bars: BarStore) -> Outcome:
+    """
+    Resolves one alert. Every step is a vectorised mask over the day's bars
+    followed by argmax for the first hit. A bar that touches both target and
+    stop is counted as a stop, since bar data cannot tell which came first.
+    """
+    trade = alert.trade
+    midnight, session_open, session_close = _session_bounds(alert.ts)
+    entry_start = max(alert.ts, midnight + trade.entry_from * 60 if trade.entry_from is not None else session_open)
+    entry_end = midnight + trade.entry_to * 60 if trade.entry_to is not None else session_close
+    exit_at = midnight + trade.exit_to * 60 if trade.exit_to is not None else session_close
+    entry_end = max(entry_end, entry_start)
+    exit_at = min(max(exit_at, entry_end), session_close)
+
+    day = bars.window(trade.strike, trade.option_type, entry_start, exit_at, alert.instrument)
+    if day is None or not day[0].size:
+        return Outcome(alert, NO_DATA)
+    ts, opens, highs, lows, closes = day
+
+    in_window = ts <= entry_end
+    touched = in_window & (lows <= trade.entry_high) & (highs >= trade.entry_low)
+    if not touched.any():
+        return Outcome(alert, NO_ENTRY)
+    entry_index = int(np.argmax(touched))
+    entry_price = float(np.clip(opens[entry_index], trade.entry_low, trade.entry_high))
+
+    after = slice(entry_index + 1, None)
+    target = trade.targets[0]
+    target_hit = highs[after] >= target
+    stop_hit = lows[after] <= trade.stop_loss
+    first_target = int(np.argmax(target_hit)) if target_hit.any() else None
+    first_stop = int(np.argmax(stop_hit)) if stop_hit.any() else None
+
+    if first_stop is not None and (first_target is None or first_stop <= first_target):
+        index = entry_index + 1 + first_stop
+        return Outcome(alert, STOP, entry_price, trade.stop_loss, float(ts[entry_index]), float(ts[index]))
+    if first_target is not None:
+        index = entry_index + 1 + first_target
+        return Outcome(alert, TARGET, entry_price, target, float(ts[entry_index]), float(ts[index]))
+    return Outcome(alert, TIME_EXIT, entry_price, float(closes[-1]), float(ts[entry_index]), float(ts[-1]))
+
+
+def summarize(outcomes: List[Outcome], lot_size=LOT_SIZE):
+    groups = defaultdict(list)
+    for outcome in outcomes:
+        groups[(outcome.alert.model, outcome.alert.prompt)].append(outcome)
+    report = []
+    for (model, prompt), items in sorted(groups.items()):
+        filled = [o for o in items if o.entry_price is not None]
+        wins = sum(1 for o in filled if o.status == TARGET)
+        stops = sum(1 for o in filled if o.status == STOP)
+        pnl = sum(o.pnl for o in filled) * lot_size
+        report.append({
+            "model": model,
+            "prompt": prompt,
+            "alerts": len(items),
+            "filled": len(filled),
+            "targets": wins,
+            "stops": stops,
+            "time_exits": sum(1 for o in filled if o.status == TIME_EXIT),
+            "no_entry": sum(1 for o in items if o.status == NO_ENTRY),
+            "no_data": sum(1 for o in items if o.status == NO_DATA),
+            "hit_rate": round(wins / len(filled), 3) if filled else None,
+            "pnl": round(pnl, 2),
+            "avg_pnl": round(pnl / len(filled), 2) if filled else None,
+        })
+    return report
+
+
+_worker_bars = None
+
+
+def _init_worker(bars_path):
+    global _worker_bars
+    _worker_bars = BarStore.load(bars_path)
+
+
+def _run_alert_file(path):
+    return [simulate(alert, _worker_bars) for alert in load_alerts(path)]
+
+
+def run(alert_paths, bars_path, workers=1):
+    """
+    Backtests every alert file. With workers > 1 the files (one per prompt
+    or model variant) are spread over a process pool; each worker loads
+    the bar cache once.
+    """
+    if workers <= 1 or len(alert_paths) <= 1:
+        bars = BarStore.load(bars_path)
+        return [simulate(alert, bars) for path in alert_paths for alert in load_alerts(path)]
+    BarStore.load(bars_path)  # build the .npz cache once before the workers start
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(bars_path,)) as pool:
+        return [outcome for outcomes in pool.map(_run_alert_file, alert_paths) for outcome in outcomes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--alerts", nargs="+", required=True)
+    parser.add_argument("--bars", required=True)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--lot-size", type=int, default=LOT_SIZE)
+    args = parser.parse_args()
+
+    outcomes = run(args.alerts, args.bars, args.workers)
+    for row in summarize(outcomes, args.lot_size):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
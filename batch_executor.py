@@ -0,0 +1,292 @@
+"""
+Runs many prompt variants (instrument x strategy x expiry) per tick.
+
+BatchExecutor sends every variant to every provider concurrently, bounded by
+an overall and a per-provider limit, and returns whatever has answered when
+the tick deadline passes. OpenAIBatch sends the same variants through the
+OpenAI Batch API instead, for end-of-day analyses that can wait hours in
+exchange for half the price.
+
+    python batch_executor.py tick --instruments NIFTY BANKNIFTY --strategies trend breakout
+    python batch_executor.py submit --instruments NIFTY BANKNIFTY --strategies trend breakout reversal
+    python batch_executor.py collect --wait
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List
+
+import async_runtime
+import providers
+from fanout import FanoutResult, ask_provider, configured_providers
+from prompts import variant_prompt
+from trades import extract_trades, select_highest_confidence
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+PROVIDER_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "4"))
+BATCH_DEADLINE = float(os.getenv("BATCH_DEADLINE", "90"))
+BATCH_STATE_PATH = os.getenv("BATCH_STATE_PATH", "openai_batches.json")
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+
+@dataclass(frozen=True)
+class Variant:
+    key: str
+    prompt: str
+
+
+def variant_grid(instruments, strategies=("",), expiries=("",)) -> List[Variant]:
+    return [
+        Variant("/".join(part for part in (instrument, strategy, expiry) if part),
+                variant_prompt(instrument, strategy, expiry))
+        for instrument, strategy, expiry in itertools.product(instruments, strategies or ("",), expiries or ("",))
+    ]
+
+
+@dataclass
+class BatchResult:
+    answers: dict = field(default_factory=dict)  # variant key -> [Answer]
+    timed_out: list = field(default_factory=list)  # (variant key, provider name)
+    failed: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def complete(self):
+        return not self.timed_out and not self.failed
+
+    def as_fanout_result(self, select=select_highest_confidence):
+        """
+        Folds the batch into one FanoutResult: best_trade is picked over the
+        trades of every variant, and provider names the answer it came from.
+        """
+        result = FanoutResult(mode="batch")
+        owners = {}
+        for key, answers in self.answers.items():
+            for answer in answers:
+                result.answers.append(answer)
+                result.latencies[f"{answer.provider}:{key}"] = answer.latency
+                result.responders.append(answer.provider)
+                for trade in answer.trades:
+                    result.trades.append(trade)
+                    owners[id(trade)] = (answer, key)
+        result.best_trade = select(result.trades)
+        if result.best_trade is not None and id(result.best_trade) in owners:
+            answer, key = owners[id(result.best_trade)]
+            result.provider = f"{answer.provider} {key}"
+            result.raw_response = answer.raw_response
+        return result
+
+
+class BatchExecutor:
+    """
+    Concurrent variant x provider calls for one tick. At most
+    max_concurrency calls are in flight, and at most provider_concurrency
+    per provider, so one slow or rate-limited provider cannot take every
+    slot. Calls still queued or running at the deadline are cancelled and
+    reported in timed_out; everything that answered is kept.
+    """
+
+    def __init__(self, providers=None, max_concurrency=BATCH_CONCURRENCY,
+                 provider_concurrency=PROVIDER_CONCURRENCY, deadline=BATCH_DEADLINE):
+        self.providers = list(providers if providers is not None else configured_providers())
+        self.max_concurrency = max_concurrency
+        self.provider_concurrency = provider_concurrency
+        self.deadline = deadline
+        self._slots = None
+        self._provider_slots = {}
+
+    def _limits(self, provider):
+        # Created on first use so they bind to the loop that runs the batch.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        if provider.name not in self._provider_slots:
+            self._provider_slots[provider.name] = asyncio.Semaphore(self.provider_concurrency)
+        return self._slots, self._provider_slots[provider.name]
+
+    async def _call(self, variant, provider):
+        slots, provider_slots = self._limits(provider)
+        async with provider_slots, slots:
+            return await ask_provider(provider, variant.prompt)
+
+    async def run(self, variants, deadline=None) -> BatchResult:
+        start = time.perf_counter()
+        tasks = {
+            asyncio.create_task(self._call(v, p), name=f"batch-{v.key}-{p.name}"): (v.key, p.name)
+            for v in variants for p in self.providers
+        }
+        result = BatchResult()
+        if not tasks:
+            return result
+        done, pending = await asyncio.wait(tasks, timeout=deadline or self.deadline)
+        for task in pending:
+            task.cancel()
+            result.timed_out.append(tasks[task])
+        for task in done:
+            if task.exception() is not None:
+                logging.error("Batch call %s failed: %s", tasks[task], task.exception())
+                result.failed.append(tasks[task])
+                continue
+            result.answers.setdefault(tasks[task][0], []).append(task.result())
+        result.elapsed = time.perf_counter() - start
+        logging.info("Batch of %d call(s) finished in %.2fs: %d answered, %d timed out, %d failed.",
+                     len(tasks), result.elapsed, len(done) - len(result.failed), len(pending), len(result.failed))
+        return result
+
+    def run_blocking(self, variants, deadline=None):
+        return async_runtime.run(self.run(variants, deadline))
+
+
+class OpenAIBatch:
+    """
+    OpenAI Batch API jobs: submit() uploads one JSONL request per variant and
+    starts a 24h batch; collect() returns the answers once it has completed.
+    Submitted batch ids are kept in state_path so a later run can collect them.
+    """
+
+    def __init__(self, client=None, model=None, state_path=BATCH_STATE_PATH):
+        self.client = client or providers.get_openai_client()
+        self.model = model or providers.OPENAI_MODEL
+        self.system_prompt = providers.SYSTEM_PROMPT
+        self.state_path = state_path
+
+    def _request(self, variant):
+        request = {
+            "custom_id": variant.key,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": self.system_prompt},
+                    {"role": "user", "content": variant.prompt},
+                ],
+            },
+        }
+        if providers.STRUCTURED_OUTPUT:
+            request["body"]["tools"] = [providers.TRADE_TOOL]
+            request["body"]["tool_choice"] = providers.TRADE_TOOL_CHOICE
+        return request
+
+    def submit(self, variants, tag="eod"):
+        body = "\n".join(json.dumps(self._request(v)) for v in variants).encode("utf-8")
+        upload = self.client.files.create(file=("batch.jsonl", body), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id, endpoint=BATCH_ENDPOINT, completion_window="24h", metadata={"tag": tag},
+        )
+        state = self._load()
+        state[batch.id] = {"tag": tag, "submitted": time.time(), "model": self.model,
+                           "variants": {v.key: v.prompt for v in variants}}
+        self._save(state)
+        logging.info("Submitted OpenAI batch %s with %d request(s).", batch.id, len(variants))
+        return batch.id
+
+    def collect(self, batch_id, wait=False, poll_interval=60, timeout=None):
+        """
+        Returns {variant key: answer text}, or None while the batch is still
+        running (after polling until timeout when wait is set).
+        """
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                logging.error("OpenAI batch %s Error: %s", batch_id, batch.status)
+                self.forget(batch_id)
+                return {}
+            if not wait or (deadline and time.time() >= deadline):
+                return None
+            time.sleep(poll_interval)
+
+        answers = {}
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                response = record.get("response") or {}
+                if response.get("status_code") != 200:
+                    logging.error("OpenAI batch request %s Error: %s", record.get("custom_id"), record.get("error"))
+                    continue
+                message = response["body"]["choices"][0]["message"]
+                tool_calls = message.get("tool_calls") or []
+                text = tool_calls[0]["function"]["arguments"] if tool_calls else message.get("content") or ""
+                answers[record["custom_id"]] = text.strip()
+        return answers
+
+    def pending(self):
+        return list(self._load())
+
+    def prompts(self, batch_id):
+        return self._load().get(batch_id, {}).get("variants", {})
+
+    def forget(self, batch_id):
+        state = self._load()
+        if state.pop(batch_id, None) is not None:
+            self._save(state)
+
+    def _load(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.error("Batch state load Error: %s", e)
+            return {}
+
+    def _save(self, state):
+        tmp = f"{self.state_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("tick", "submit", "collect"))
+    parser.add_argument("--instruments", nargs="+", default=["NIFTY"])
+    parser.add_argument("--strategies", nargs="*", default=[])
+    parser.add_argument("--expiries", nargs="*", default=[])
+    parser.add_argument("--deadline", type=float, default=BATCH_DEADLINE)
+    parser.add_argument("--wait", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "tick":
+        variants = variant_grid(args.instruments, args.strategies, args.expiries)
+        batch = BatchExecutor(deadline=args.deadline).run_blocking(variants)
+        for key, answers in sorted(batch.answers.items()):
+            for answer in answers:
+                best = select_highest_confidence(answer.trades)
+                print(json.dumps({"variant": key, "provider": answer.provider, "latency": round(answer.latency, 2),
+                                  "trades": len(answer.trades), "best": best and f"{best.option_type} {best.strike}"}))
+        print(json.dumps({"timed_out": batch.timed_out, "failed": batch.failed, "elapsed": round(batch.elapsed, 2)}))
+        async_runtime.shutdown()
+    elif args.command == "submit":
+        print(OpenAIBatch().submit(variant_grid(args.instruments, args.strategies, args.expiries)))
+    else:
+        from run_store import get_store
+
+        jobs = OpenAIBatch()
+        for batch_id in jobs.pending():
+            answers = jobs.collect(batch_id, wait=args.wait)
+            if answers is None:
+                print(f"{batch_id}: still running")
+                continue
+            prompts = jobs.prompts(batch_id)
+            for key, text in answers.items():
+                trades = extract_trades(text)
+                get_store().record("batch", f"openai-batch:{jobs.model}", prompts.get(key, key), text, trades)
+                print(json.dumps({"batch": batch_id, "variant": key, "trades": len(trades)}))
+            jobs.forget(batch_id)
+        get_store().close()
+
+
+if __name__ == "__main__":
+    main()
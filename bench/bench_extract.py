@@ -0,0 +1,148 @@
+"""
+Benchmark for trade extraction over recorded LLM responses.
+
+Every file in bench/corpus is parsed by the current engine (trades.extract_trades)
+and by the two regex extractors it replaced, and the script reports the
+mean parse time and whether the expected number of trades (bench/expected.json)
+was found.
+
+    python bench/bench_extract.py                # print the table
+    python bench/bench_extract.py --record       # also append totals to bench/history.jsonl
+    python bench/bench_extract.py --repeat 500   # iterations per file (default 200)
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from trades import extract_trades  # noqa: E402
+
+CORPUS_DIR = os.path.join(HERE, "corpus")
+EXPECTED_PATH = os.path.join(HERE, "expected.json")
+HISTORY_PATH = os.path.join(HERE, "history.jsonl")
+
+
+def legacy_api_extract(text):
+    # The extractor previously in main.py / grok.py, compiled on every call.
+    pattern = re.compile(
+        r"Option Type:\s*(?P<type>CE|PE).*?"
+        r"Strike Price:\s*(?P<strike>[\d,]+).*?"
+        r"Premium Entry Range:\s*(?P<entry>₹?[\d–\-to ]+).*?"
+        r"Target\(s\):\s*(?P<target>₹?[\d–\-to ]+).*?"
+        r"Stop Loss:\s*(?P<sl>₹?[\d–\-to ]+).*?"
+        r"Ideal Entry Time:\s*(?P<entry_time>[\d:–to ]+).*?"
+        r"Ideal Exit Time:\s*(?P<exit_time>[\d:–to ]+).*?"
+        r"Confidence Level:\s*(?P<confidence>\d+)%.*?"
+        r"Key Factors:\s*(?P<keyfactors>.*?)(?=Short Reason:|$).*?"
+        r"Short Reason:\s*(?P<reason>.*?)(?=\n\d|$)",
+        re.DOTALL
+    )
+    return list(pattern.finditer(text))
+
+
+def legacy_web_extract(text):
+    # The extractor previously in main2.py: nine re.search calls per block.
+    trades = []
+    for block in re.split(r"(?:📈|📉)\s*Trade\s*#\d+:", text)[1:]:
+        trade = {}
+        for key, pattern in (
+            ("type", r"Option\s*Type:\s*(.+)"), ("strike", r"Strike:\s*(.+)"),
+            ("entry", r"Entry\s*Premium:\s*(.+)"), ("target", r"Target:\s*(.+)"),
+            ("sl", r"Stop\s*Loss:\s*(.+)"), ("entry_time", r"Ideal\s*Entry\s*Time:\s*(.+)"),
+            ("exit_time", r"Ideal\s*Exit\s*Time:\s*(.+)"), ("confidence", r"Confidence:\s*(.+)"),
+        ):
+            match = re.search(pattern, block)
+            trade[key] = match.group(1).strip() if match else ""
+        match = re.search(r"Justification\s*(.+)", block, re.DOTALL)
+        trade["reason"] = match.group(1).strip() if match else ""
+        trades.append(trade)
+    return trades
+
+
+EXTRACTORS = {
+    "engine": extract_trades,
+    "legacy_api": legacy_api_extract,
+    "legacy_web": legacy_web_extract,
+}
+
+
+def time_extractor(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = func(text)
+    return (time.perf_counter() - start) / repeat * 1e6, len(found)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def run(repeat):
+    with open(EXPECTED_PATH, encoding="utf-8") as f:
+        expected = json.load(f)
+    rows = []
+    for name in sorted(os.listdir(CORPUS_DIR)):
+        if not name.endswith(".txt"):
+            continue
+        with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+            text = f.read()
+        row = {"file": name, "bytes": len(text.encode("utf-8")), "expected": expected.get(name)}
+        for label, func in EXTRACTORS.items():
+            micros, found = time_extractor(func, text, repeat)
+            row[label] = {"us": round(micros, 1), "found": found}
+        rows.append(row)
+    return rows
+
+
+def summarize(rows):
+    summary = {}
+    scored = [r for r in rows if r["expected"] is not None]
+    for label in EXTRACTORS:
+        hits = sum(1 for r in scored if r[label]["found"] == r["expected"])
+        summary[label] = {
+            "total_us": round(sum(r[label]["us"] for r in rows), 1),
+            "success_rate": round(hits / len(scored), 3) if scored else None,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--record", action="store_true")
+    args = parser.parse_args()
+
+    rows = run(args.repeat)
+    print(f"{'file':28} {'bytes':>7} {'exp':>4}  " + "  ".join(f"{label:>20}" for label in EXTRACTORS))
+    for row in rows:
+        cells = "  ".join(f"{row[l]['us']:>12.1f}us {row[l]['found']:>3}t" for l in EXTRACTORS)
+        print(f"{row['file']:28} {row['bytes']:>7} {row['expected']!s:>4}  {cells}")
+    summary = summarize(rows)
+    for label, stats in summary.items():
+        print(f"{label:12} total {stats['total_us']:>10.1f}us  success rate {stats['success_rate']}")
+
+    if args.record:
+        entry = {
+            "at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "repeat": args.repeat,
+            "summary": summary,
+        }
+        with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+if __name__ == "__main__":
+    main()
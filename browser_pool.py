@@ -0,0 +1,148 @@
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+
+class BrowserSession:
+    def __init__(self, slot, driver):
+        self.slot = slot
+        self.driver = driver
+        self.created_at = time.time()
+        self.uses = 0
+        self.baseline_memory = None
+
+
+class BrowserPool:
+    """
+    Long-lived pool of warm WebDriver sessions.
+
+    factory(slot) builds a driver for a pool slot; each slot keeps its own
+    browser so slots can use separate Chrome profiles. A session is health
+    checked on checkout and recycled (quit and rebuilt) when it fails the
+    check, raised a WebDriverException, served max_uses prompts or grew its
+    JS heap by more than max_memory_growth_mb since it was warmed.
+    """
+
+    def __init__(self, factory, size=1, warm_url=None, max_uses=25,
+                 max_memory_growth_mb=400, checkout_timeout=600):
+        self.factory = factory
+        self.size = size
+        self.warm_url = warm_url
+        self.max_uses = max_uses
+        self.max_memory_growth_mb = max_memory_growth_mb
+        self.checkout_timeout = checkout_timeout
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self.created = 0
+        self.recycled = 0
+        self.checkouts = 0
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        for slot in range(self.size):
+            self._idle.put(self._create(slot))
+        logging.info("Browser pool started with %d session(s).", self.size)
+        return self
+
+    def _create(self, slot):
+        driver = self.factory(slot)
+        session = BrowserSession(slot, driver)
+        if self.warm_url:
+            driver.get(self.warm_url)
+        session.baseline_memory = self._memory_mb(driver)
+        self.created += 1
+        return session
+
+    def _quit(self, session):
+        try:
+            session.driver.quit()
+        except Exception as e:
+            logging.warning("Error quitting browser in slot %d: %s", session.slot, e)
+
+    def _recycle(self, session, reason):
+        logging.info("Recycling browser in slot %d (%s).", session.slot, reason)
+        self.recycled += 1
+        self._quit(session)
+        return self._create(session.slot)
+
+    @staticmethod
+    def _memory_mb(driver):
+        try:
+            used = driver.execute_script(
+                "return window.performance && performance.memory ? performance.memory.usedJSHeapSize : null;"
+            )
+            return used / (1024 * 1024) if used else None
+        except Exception:
+            return None
+
+    @staticmethod
+    def healthy(driver):
+        try:
+            return driver.execute_script("return document.readyState;") in ("interactive", "complete")
+        except Exception:
+            return False
+
+    def _needs_recycle(self, session):
+        if session.uses >= self.max_uses:
+            return f"served {session.uses} prompts"
+        memory = self._memory_mb(session.driver)
+        if memory is not None and session.baseline_memory is not None:
+            if memory - session.baseline_memory > self.max_memory_growth_mb:
+                return f"heap grew to {memory:.0f} MB"
+        return None
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        Lends a warm driver to the caller and returns it to the pool afterwards.
+        """
+        if not self._started:
+            self.start()
+        try:
+            session = self._idle.get(timeout=timeout or self.checkout_timeout)
+        except queue.Empty:
+            raise TimeoutError("No browser session available") from None
+        self.checkouts += 1
+        broken = False
+        try:
+            if not self.healthy(session.driver):
+                session = self._recycle(session, "failed health check")
+            yield session.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            try:
+                session.uses += 1
+                reason = "webdriver error" if broken else self._needs_recycle(session)
+                if reason:
+                    session = self._recycle(session, reason)
+            except Exception as e:
+                logging.error("Could not rebuild browser in slot %d: %s", session.slot, e)
+            self._idle.put(session)
+
+    def stats(self):
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "created": self.created,
+            "recycled": self.recycled,
+            "checkouts": self.checkouts,
+        }
+
+    def close(self):
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(session)
+        self._started = False
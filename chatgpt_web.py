@@ -0,0 +1,258 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+
+import metrics
+from browser_pool import BrowserPool
+from log_setup import log_request, log_response
+from response_detector import ResponseDetector, cloudflare_challenge, count_answers
+
+# CONFIG
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH", r"C:\Users\Acer\Downloads\chromedriver-win64 (1)\chromedriver-win64\chromedriver.exe")  # <-- Replace with your path
+USER_DATA_DIR = os.getenv("CHROME_USER_DATA_DIR", r"C:\Users\Acer\AppData\Local\Google\Chrome\User Data\SeleniumProfile")
+CHATGPT_URL = os.getenv("CHATGPT_URL", "https://chatgpt.com/c/6860f6df-544c-8007-849c-8c2a4dee1c33")
+HEADLESS = os.getenv("CHROME_HEADLESS") == "1"
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "1"))
+BROWSER_MAX_USES = int(os.getenv("BROWSER_MAX_USES", "25"))
+STUB_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stubs", "chatgpt_stub.html")
+
+# Puts the whole prompt into the prompt box in one call instead of one
+# send_keys event per character. A plain textarea gets its value through the
+# native setter plus an input event, so React sees it; the contenteditable
+# editor ChatGPT uses takes it through insertText, newlines included.
+_INSERT_JS = """
+const [box, text] = arguments;
+box.focus();
+if (box.tagName === "TEXTAREA" || box.tagName === "INPUT") {
+  const proto = box.tagName === "TEXTAREA" ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+  Object.getOwnPropertyDescriptor(proto, "value").set.call(box, text);
+  box.dispatchEvent(new Event("input", {bubbles: true}));
+  return box.value;
+}
+document.execCommand("selectAll", false, null);
+document.execCommand("insertText", false, text);
+return box.innerText;
+"""
+
+
+def handle_retry(driver):
+    try:
+        # Check if the error message is present
+        error_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'Something went wrong')]")
+        if error_elements:
+            logging.warning("ChatGPT page shows 'Something went wrong'; trying to retry.")
+
+            # Try clicking the Retry button
+            retry_buttons = driver.find_elements(By.XPATH, "//button[contains(text(), 'Retry')]")
+            if retry_buttons:
+                retry_buttons[0].click()
+                logging.info("Clicked Retry button.")
+                return True
+            else:
+                logging.warning("Retry button not found even though error was detected.")
+        return False
+    except Exception as e:
+        logging.error("Retry handling Error: %s", e)
+        return False
+
+
+def close_auth_popup(driver):
+    """
+    Closes ChatGPT's login/signup popups like 'Stay logged out', 'Continue', etc.,
+    by clicking both <button> and <a> elements with common texts.
+    """
+    try:
+        wait = WebDriverWait(driver, 5)
+        elements = wait.until(
+            EC.presence_of_all_elements_located(
+                (
+                    By.XPATH,
+                    '//button[contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "stay logged out") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "continue") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "got it") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "dismiss") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "okay")]'
+                    '| //a[contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "stay logged out") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "continue") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "got it") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "dismiss") '
+                    'or contains(translate(text(),"ABCDEFGHIJKLMNOPQRSTUVWXYZ","abcdefghijklmnopqrstuvwxyz"), "okay")]'
+                )
+            )
+        )
+        for el in elements:
+            try:
+                el.click()
+                logging.info("Closed popup element: '%s'", el.text.strip())
+            except Exception as e:
+                logging.warning("Could not click popup element: %s", e)
+    except Exception:
+        # It's okay if no popup appeared
+        pass
+
+
+def make_driver(slot=0, headless=HEADLESS, user_data_dir=USER_DATA_DIR):
+    """
+    Builds a Chrome driver for a pool slot. Chrome locks its profile directory,
+    so every slot after the first gets its own profile (USER_DATA_DIR1, ...),
+    each of which needs a one-off manual ChatGPT login.
+    """
+    chrome_options = Options()
+    if user_data_dir:
+        profile = user_data_dir if slot == 0 else f"{user_data_dir}{slot}"
+        chrome_options.add_argument(f"--user-data-dir={profile}")
+    if headless:
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1280,1024")
+    else:
+        chrome_options.add_argument("--start-maximized")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option("useAutomationExtension", False)
+
+    # Fall back to Selenium Manager when the configured chromedriver is absent.
+    service = Service(CHROMEDRIVER_PATH) if os.path.exists(CHROMEDRIVER_PATH) else Service()
+    return webdriver.Chrome(service=service, options=chrome_options)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                make_driver,
+                size=BROWSER_POOL_SIZE,
+                warm_url=CHATGPT_URL,
+                max_uses=BROWSER_MAX_USES,
+            )
+            metrics.gauge("browser_pool_sessions", "Browser pool size and idle sessions.", _pool_gauge)
+        return _pool
+
+
+def _pool_gauge():
+    stats = _pool.stats()
+    return {(("state", "size"),): stats["size"], (("state", "idle"),): stats["idle"]}
+
+
+def insert_prompt(driver, prompt_box, prompt):
+    """
+    Injects the prompt with one script call, falling back to typing it when
+    the page did not take it.
+    """
+    try:
+        with metrics.stage("selenium_insert"):
+            text = driver.execute_script(_INSERT_JS, prompt_box, prompt)
+        if text and text.strip()[:64] == prompt.strip()[:64]:
+            return
+        logging.warning("Prompt injection did not fill the prompt box; typing it instead.")
+        prompt_box.clear()
+    except WebDriverException as e:
+        logging.error("Prompt injection Error: %s", e)
+    prompt_box.send_keys(prompt)
+
+
+def ask_on_page(driver, prompt: str, url: str = CHATGPT_URL, on_delta=None) -> str:
+    """
+    Sends a prompt on an already open ChatGPT page, waits for the response, and returns text.
+    Only answers that appear after the prompt is sent are considered, so a warm page
+    that still shows earlier answers can be reused. on_delta receives text as it streams in.
+    """
+    if driver.current_url.split("#")[0] != url:
+        driver.get(url)
+        time.sleep(2)  # wait for page to stabilize
+    wait = WebDriverWait(driver, 120)
+
+    # Check redirect
+    if "chatgpt" not in driver.current_url:
+        logging.error("Unexpected redirect detected: %s", driver.current_url)
+        return "Error: Redirected from ChatGPT page. Please log in manually."
+    challenge_deadline = time.time() + 120
+    challenged = False
+    while cloudflare_challenge(driver) and time.time() < challenge_deadline:
+        if not challenged:
+            metrics.CLOUDFLARE_HITS.inc(phase="load")
+            challenged = True
+        logging.warning("Cloudflare challenge detected. Solve it manually in the opened browser window.",
+                        extra={"sample": True})
+        time.sleep(5)
+
+    logging.info("ChatGPT page loaded. Closing popups if any.")
+    close_auth_popup(driver)
+
+    # Wait for prompt box
+    prompt_box = wait.until(EC.element_to_be_clickable((By.ID, "prompt-textarea")))
+    prompt_box.click()
+    insert_prompt(driver, prompt_box, prompt)
+
+    answers_before = count_answers(driver)
+    detector = ResponseDetector(driver, answers_before)
+    detector.install()
+
+    send_button = wait.until(
+        EC.element_to_be_clickable(
+            (By.XPATH, "//button[@aria-label='Send message']")
+        )
+    )
+    log_request("ChatGPT web", prompt)
+    send_button.click()
+
+    def on_cloudflare():
+        logging.warning("Cloudflare challenge detected. Solve it manually in the opened browser window.",
+                        extra={"sample": True})
+
+    with metrics.stage("selenium_wait"):
+        last_text = detector.wait(timeout=300, on_delta=on_delta, on_cloudflare=on_cloudflare)
+    if detector.cloudflare_hits:
+        metrics.CLOUDFLARE_HITS.inc(phase="answer")
+
+    if last_text:
+        log_response("ChatGPT web", last_text)
+        return last_text
+    else:
+        logging.warning("No response received from ChatGPT web.")
+        return "ChatGPT Error: no response received."
+
+
+def ask_chatgpt_via_selenium(prompt: str) -> str:
+    """
+    Borrows a warm browser from the pool, sends the prompt on the ChatGPT page and returns the text.
+    """
+    try:
+        with get_pool().checkout() as driver:
+            return ask_on_page(driver, prompt)
+    except WebDriverException as e:
+        logging.error("WebDriver Error during ChatGPT interaction: %s", e)
+        return f"WebDriver error: {e}"
+    except Exception as e:
+        logging.error("ChatGPT web Error: %s", e)
+        return f"Error: {e}"
+
+
+if __name__ == "__main__":
+    # Offline check against the local stub page: python chatgpt_web.py --stub
+    if "--stub" in sys.argv:
+        from trades import extract_trades
+
+        stub_url = "file://" + STUB_PAGE.replace(os.sep, "/")
+        pool = BrowserPool(lambda slot: make_driver(slot, headless=True, user_data_dir=None), warm_url=stub_url)
+        try:
+            for _ in range(2):
+                with pool.checkout() as driver:
+                    answer = ask_on_page(driver, "stub prompt", url=stub_url)
+                print(extract_trades(answer))
+            print(pool.stats())
+        finally:
+            pool.close()
@@ -0,0 +1,59 @@
+"""
+Offline harness for the response completion detector.
+
+Runs chatgpt_web.ask_on_page against stubs/chatgpt_stub.html in headless
+Chrome under a few scenarios and reports, for each, whether the full answer
+was captured and how long after the stub finished writing the detector
+reported completion.
+
+    python detector_harness.py
+"""
+import os
+import time
+
+from browser_pool import BrowserPool
+from chatgpt_web import STUB_PAGE, ask_on_page, make_driver
+from trades import extract_trades
+
+SCENARIOS = {
+    "fast": "delay=20&chunk=24",
+    "slow": "delay=120&chunk=6",
+    "mid-answer stall": "delay=30&chunk=12&pause=3000",
+    "cloudflare": "delay=30&chunk=12&cloudflare=4000",
+}
+
+
+def run_scenario(pool, name, query):
+    url = "file://" + STUB_PAGE.replace(os.sep, "/") + "?" + query
+    deltas = []
+    with pool.checkout() as driver:
+        driver.get(url)
+        start = time.time()
+        answer = ask_on_page(driver, f"harness: {name}", url=url, on_delta=deltas.append)
+        elapsed = time.time() - start
+        lag_ms = driver.execute_script("return window.__stubDoneAt ? Date.now() - window.__stubDoneAt : null;")
+        expected = driver.execute_script("return ANSWER;")
+    return {
+        "scenario": name,
+        "complete": answer == expected.strip(),
+        "trades": len(extract_trades(answer)),
+        "deltas": len(deltas),
+        "elapsed_s": round(elapsed, 2),
+        "detect_lag_ms": lag_ms,
+    }
+
+
+def main():
+    pool = BrowserPool(lambda slot: make_driver(slot, headless=True, user_data_dir=None))
+    try:
+        results = [run_scenario(pool, name, query) for name, query in SCENARIOS.items()]
+    finally:
+        pool.close()
+    for result in results:
+        print(result)
+    if not all(r["complete"] and r["trades"] == 2 for r in results):
+        raise SystemExit("Detector harness failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field, replace
+
+import async_runtime
+import metrics
+import providers
+from response_cache import cached
+from trade_parser import Trade
+from trades import extract_trades, select_highest_confidence
+
+
+@dataclass
+class Provider:
+    name: str
+    ask: object
+    extract: object = extract_trades
+    model: str = ""
+
+
+@dataclass
+class Answer:
+    provider: str
+    model: str
+    raw_response: str
+    trades: list
+    latency: float
+    usage: dict = field(default_factory=dict)
+    prompt: str = ""
+
+
+@dataclass
+class FanoutResult:
+    mode: str
+    provider: str = None
+    raw_response: str = ""
+    trades: list = field(default_factory=list)
+    best_trade: Trade = None
+    latencies: dict = field(default_factory=dict)
+    responders: list = field(default_factory=list)
+    answers: list = field(default_factory=list)
+
+
+def configured_providers():
+    """
+    Builds the provider list from the environment: API providers are enabled
+    by their keys, the Selenium web path by CHATGPT_WEB=1. Every provider
+    sits behind the shared response cache. With STRUCTURED_OUTPUT the API
+    providers answer through tool calling, cached apart from free text.
+    """
+    result = []
+    structured = providers.STRUCTURED_OUTPUT
+    if providers.OPENAI_API_KEY:
+        model = f"openai:{providers.OPENAI_MODEL}"
+        ask = providers.ask_chatgpt_structured if structured else providers.ask_chatgpt
+        result.append(Provider("chatgpt", cached(ask, f"{model}+tools" if structured else model), model=model))
+    if providers.XAI_API_KEY:
+        model = f"xai:{providers.GROK_MODEL}"
+        ask = providers.ask_grok_structured if structured else providers.ask_grok_async
+        result.append(Provider("grok", cached(ask, f"{model}+tools" if structured else model), model=model))
+    if os.getenv("CHATGPT_WEB") == "1":
+        from chatgpt_web import ask_chatgpt_via_selenium
+        result.append(Provider("chatgpt-web", cached(ask_chatgpt_via_selenium, "chatgpt-web"), model="chatgpt-web"))
+    return result
+
+
+async def ask_provider(provider, prompt):
+    """
+    One provider call as an Answer; synchronous providers run in a worker thread.
+    """
+    start = time.perf_counter()
+    with providers.capture_usage() as usage, metrics.stage(f"llm.{provider.name}"):
+        if asyncio.iscoroutinefunction(provider.ask):
+            raw = await provider.ask(prompt)
+        else:
+            raw = await asyncio.to_thread(provider.ask, prompt)
+    latency = time.perf_counter() - start
+    try:
+        trades = provider.extract(raw)
+    except Exception as e:
+        logging.error("Extraction failed for %s: %s", provider.name, e)
+        trades = []
+    logging.info("%s answered in %.2fs with %d trade(s).", provider.name, latency, len(trades))
+    return Answer(provider.name, provider.model or provider.name, raw, trades, latency, usage, prompt)
+
+
+class FanoutEngine:
+    """
+    Sends one prompt to every provider concurrently.
+
+    "first" mode returns as soon as any provider's response yields trades and
+    cancels the rest. "consensus" mode waits up to the deadline and merges
+    trades that several providers agree on (same option type and strike)
+    before select_highest_confidence runs. Synchronous providers run in
+    worker threads; cancelling them only discards their result, the
+    underlying request is left to finish on its own.
+    """
+
+    def __init__(self, providers, select=select_highest_confidence, deadline=120, min_votes=2):
+        self.providers = list(providers)
+        self.select = select
+        self.deadline = deadline
+        self.min_votes = min_votes
+
+    def _start(self, prompt):
+        return {
+            asyncio.create_task(ask_provider(p, prompt), name=f"fanout-{p.name}"): p.name
+            for p in self.providers
+        }
+
+    async def first_valid(self, prompt, deadline=None):
+        result = FanoutResult(mode="first")
+        tasks = self._start(prompt)
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=deadline or self.deadline):
+                try:
+                    answer = await next_done
+                except asyncio.TimeoutError:
+                    raise
+                except Exception as e:
+                    logging.error("Provider failed: %s", e)
+                    continue
+                result.latencies[answer.provider] = answer.latency
+                result.responders.append(answer.provider)
+                result.answers.append(answer)
+                if not result.raw_response:
+                    result.provider, result.raw_response = answer.provider, answer.raw_response
+                if answer.trades:
+                    result.provider, result.raw_response = answer.provider, answer.raw_response
+                    result.trades = answer.trades
+                    break
+        except asyncio.TimeoutError:
+            logging.warning("No provider returned valid trades within the deadline.")
+        finally:
+            for task in tasks:
+                task.cancel()
+        result.best_trade = self.select(result.trades)
+        return result
+
+    async def consensus(self, prompt, deadline=None):
+        result = FanoutResult(mode="consensus")
+        tasks = self._start(prompt)
+        done, pending = await asyncio.wait(tasks, timeout=deadline or self.deadline)
+        for task in pending:
+            logging.warning("Provider %s missed the consensus deadline.", tasks[task])
+            task.cancel()
+
+        answers = []
+        for task in done:
+            if task.exception() is not None:
+                logging.error("Provider %s failed: %s", tasks[task], task.exception())
+                continue
+            answer = task.result()
+            result.latencies[answer.provider] = answer.latency
+            result.responders.append(answer.provider)
+            result.answers.append(answer)
+            if answer.trades:
+                answers.append((answer.provider, answer.raw_response, answer.trades))
+
+        result.trades = self.merge(answers)
+        if answers:
+            result.provider = ", ".join(name for name, _, _ in answers)
+            result.raw_response = "\n\n".join(f"[{name}]\n{raw}" for name, raw, _ in answers)
+        result.best_trade = self.select(result.trades)
+        return result
+
+    def merge(self, answers):
+        """
+        Groups trades by (option type, strike) and keeps the groups backed by
+        at least min_votes providers, capped at the number of providers that
+        returned any trades. Each merged trade is the highest-confidence
+        member with the group's mean confidence.
+        """
+        groups = {}
+        for name, _, trades in answers:
+            for trade in trades:
+                groups.setdefault((trade.option_type, trade.strike), {}).setdefault(name, trade)
+
+        required = min(self.min_votes, len(answers))
+        merged = []
+        for members in groups.values():
+            if len(members) < required:
+                continue
+            confidences = [t.confidence for t in members.values()]
+            best = max(members.values(), key=lambda t: t.confidence)
+            merged.append(replace(
+                best,
+                confidence=round(sum(confidences) / len(confidences)),
+                models=tuple(sorted(members)),
+            ))
+        merged.sort(key=lambda t: len(t.models), reverse=True)
+        return merged
+
+    def run(self, prompt, mode="first", deadline=None):
+        """
+        Blocking wrapper for callers outside the event loop.
+        """
+        if mode == "consensus":
+            return async_runtime.run(self.consensus(prompt, deadline))
+        return async_runtime.run(self.first_valid(prompt, deadline))
@@ -1,33 +1,28 @@
 import os
-import schedule
-import time
-import re
-from telegram import Bot
 from dotenv import load_dotenv
-import datetime
-import asyncio
 import logging
-import requests
-
-logging.basicConfig(
-    filename="nifty_bot.log",
-    level=logging.INFO,
-    format="%(asctime)s — %(levelname)s — %(message)s",
-)
-
-# List of NSE trading holidays for 2025
-NSE_HOLIDAYS_2025 = {
-    "2025-02-26", "2025-03-14", "2025-03-31", "2025-04-10", "2025-04-14",
-    "2025-04-18", "2025-05-01", "2025-08-15", "2025-08-27", "2025-10-02",
-    "2025-10-21", "2025-10-22", "2025-11-05", "2025-12-25",
-}
+import time
 
-def is_market_closed_today():
-    today = datetime.date.today()
-    weekday = today.weekday()  # Monday=0, Sunday=6
-    is_weekend = weekday >= 5
-    is_holiday = today.isoformat() in NSE_HOLIDAYS_2025
-    return is_weekend or is_holiday
+import async_runtime
+import metrics
+from indicators import IndicatorEngine
+from log_setup import setup_logging
+from market_data import feed_from_env
+from metrics import latency_report
+from position_monitor import PositionMonitor
+from prescreen import prescreen_from_env
+from prompt_compiler import PromptCompiler, market_slots
+from prompts import PROMPT
+from providers import GROK_MODEL, capture_usage, stream_grok
+from response_cache import cached_stream, get_cache
+from run_store import get_store
+from scheduler import AsyncScheduler
+from session_clock import get_clock
+from telegram_sender import TelegramSender
+from trade_state import TradeStateTracker, alert_messages
+from trades import TradeStreamParser, pick_streamed_trade, stream_trades
+
+setup_logging()
 
 # Load environment variables
 load_dotenv()
@@ -36,123 +31,90 @@ load_dotenv()
 XAI_API_KEY = os.getenv("XAI_API_KEY")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
+EARLY_ALERT_CONFIDENCE = int(os.getenv("EARLY_ALERT_CONFIDENCE", "75"))
 
-bot = Bot(token=TELEGRAM_BOT_TOKEN)
-
-PROMPT = """Act as a professional NIFTY options trader and market analyst. Based on current market conditions (today’s data), give me the best intraday options trade on NIFTY index. Include only 1–2 high-probability trades.
-For each option trade, include the following:
-1. Option Type (CE or PE)
-2. Strike Price
-3. Premium Entry Range
-4. Target(s)
-5. Stop Loss
-6. Ideal Entry Time
-7. Ideal Exit Time
-8. Confidence Level in % (based on OI, volume, trend, VIX, price action, etc.)
-9. Key Factors (OI analysis, PCR, trend, support/resistance, candle patterns, news flow, etc.)
-10. Short Reason Why this trade setup is good today
-Only include trades with strong confirmation from price action + OI shift + volume + momentum indicators. Prefer same day expiry (if Thursday), and ATM/1 strike ITM trades with good liquidity. Be concise, practical and avoid risky trades."""
-
-
-def ask_grok(prompt):
-    try:
-        logging.info(f"Sending prompt to Grok:\n{prompt}")
-        headers = {
-            "Authorization": f"Bearer {XAI_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        payload = {
-            "model": "grok-3",  # Assuming Grok 3 is the model name
-            "messages": [
-                {"role": "system", "content": "Act as a professional NIFTY options trader and market analyst."},
-                {"role": "user", "content": prompt}
-            ]
-        }
-        response = requests.post(
-            "https://api.x.ai/v1/chat/completions",  # Replace with actual xAI API endpoint if different
-            headers=headers,
-            json=payload
-        )
-        response.raise_for_status()
-        response_data = response.json()
+sender = TelegramSender(TELEGRAM_BOT_TOKEN, default_chat_id=CHAT_ID, parse_mode="Markdown")
+ask_grok_stream = cached_stream(stream_grok, f"xai:{GROK_MODEL}")
+tracker = TradeStateTracker()
+prompt_compiler = PromptCompiler(GROK_MODEL)
+clock = get_clock()
+market_feed = feed_from_env()
+indicator_engine = IndicatorEngine()
+if market_feed:
+    market_feed.subscribe(indicator_engine.on_tick)
+prescreen = prescreen_from_env(market_feed.snapshot if market_feed else None, indicator_engine, providers=("grok",))
 
-        if not response_data or not response_data.get("choices"):
-            raise ValueError("No valid response from Grok")
 
-        grok_response = response_data["choices"][0]["message"]["content"].strip()
-        logging.info("Grok Response:\n%s", grok_response)
-        return grok_response
-
-    except Exception as e:
-        logging.error("Grok Error: %s", str(e))
-        return f"Grok Error: {e}"
-
-def extract_trades(text):
-    trades = []
-    pattern = re.compile(
-        r"Option Type:\s*(?P<type>CE|PE).*?"
-        r"Strike Price:\s*(?P<strike>[\d,]+).*?"
-        r"Premium Entry Range:\s*(?P<entry>₹?[\d–\-to ]+).*?"
-        r"Target\(s\):\s*(?P<target>₹?[\d–\-to ]+).*?"
-        r"Stop Loss:\s*(?P<sl>₹?[\d–\-to ]+).*?"
-        r"Ideal Entry Time:\s*(?P<entry_time>[\d:–to ]+).*?"
-        r"Ideal Exit Time:\s*(?P<exit_time>[\d:–to ]+).*?"
-        r"Confidence Level:\s*(?P<confidence>\d+)%.*?"
-        r"Key Factors:\s*(?P<keyfactors>.*?)(?=Short Reason:|$).*?"
-        r"Short Reason:\s*(?P<reason>.*?)(?=\n\d|$)",
-        re.DOTALL
-    )
-    for match in pattern.finditer(text):
-        trades.append({
-            "Option Type": match.group("type").strip(),
-            "Strike Price": match.group("strike").strip(),
-            "Premium Entry Range": match.group("entry").strip(),
-            "Target(s)": match.group("target").strip(),
-            "Stop Loss": match.group("sl").strip(),
-            "Ideal Entry Time": match.group("entry_time").strip(),
-            "Ideal Exit Time": match.group("exit_time").strip(),
-            "Confidence Level": match.group("confidence").strip(),
-            "Volume Surge: ": "",
-            "VIX:": "",
-            "Price Action": "",
-            "Momentum": "",
-            "reason": match.group("reason").strip()
-        })
-    return trades
+def send_to_telegram(message):
+    sender.send(message)
 
-def select_highest_confidence(trades):
-    if not trades:
-        return None
-    return max(trades, key=lambda x: int(x["Confidence Level"]))
 
-async def async_send_message(message):
-    try:
-        await bot.send_message(chat_id=CHAT_ID, text=message, parse_mode="Markdown")
-    except Exception as e:
-        print(f"Telegram Error: {e}")
-
-def send_to_telegram(message):
-    asyncio.run(async_send_message(message))
+position_monitor = PositionMonitor(notify=lambda message, trade: send_to_telegram(message), on_close=tracker.close)
+if market_feed:
+    market_feed.subscribe(position_monitor.on_tick)
 
+@metrics.traced("tick")
 def run_task():
-    print("Running scheduled job...")
-    if is_market_closed_today():
+    logging.info("Running scheduled job...")
+    if not clock.is_trading_day():
         logging.info("Market closed today. Skipping job.")
         return
-    raw_response = ask_grok(PROMPT)
-    trades = extract_trades(raw_response)
-    best_trade = select_highest_confidence(trades)
+    if not prescreen.evaluate().call:
+        return
+    # A trade at or above EARLY_ALERT_CONFIDENCE is sent as soon as its fields
+    # have streamed in; otherwise the best trade is picked at the end.
+    snapshot = market_feed.snapshot if market_feed else None
+    prompt = prompt_compiler.compile(PROMPT, market_slots(snapshot, indicator_engine)).text
+    parser = TradeStreamParser()
+    start = time.perf_counter()
+    with metrics.stage("llm"), capture_usage() as usage:
+        best_trade = pick_streamed_trade(
+            indicator_engine.screen_stream(stream_trades(ask_grok_stream(prompt), parser)), EARLY_ALERT_CONFIDENCE
+        )
+    latency = time.perf_counter() - start
+    prompt_compiler.observe(usage)
 
+    alerted = None
     if best_trade:
-        formatted = "\n".join([f"*{k}* {v}" for k, v in best_trade.items()])
-        send_to_telegram(f"*NIFTY Trade Alert (Highest Confidence)*\n\n{formatted}")
-    else:
+        change = tracker.observe(best_trade)
+        for message in alert_messages(change, "*NIFTY Trade Alert (Highest Confidence)*", markdown=True):
+            send_to_telegram(message)
+        if change.material:
+            alerted = best_trade
+            # After the alert, so its follow-ups are queued behind it.
+            if market_feed:
+                position_monitor.track(change)
+        else:
+            logging.info("Suppressed repeat alert for %s %s.", best_trade.option_type, best_trade.strike)
+    elif tracker.observe_empty():
         send_to_telegram("No valid trade found in the Grok response.")
+    get_store().record("grok.py", f"xai:{GROK_MODEL}", prompt, parser.raw_response(), parser.trades,
+                       latency=latency, usage=usage, alerted=alerted)
 
 # Run every 30 seconds (for testing); change to every 15 minutes for production
-schedule.every(30).seconds.do(run_task)
+scheduler = AsyncScheduler(clock=clock)
+scheduler.every(30, run_task, name="grok-nifty", jitter=1.0)
 
 print("Running NIFTY Options Alert Bot...")
-while True:
-    schedule.run_pending()
-    time.sleep(1)
\ No newline at end of file
+metrics.serve()
+# Position follow-ups are sent from the event loop, where the sender cannot start itself.
+sender.start()
+if market_feed:
+    market_feed.start()
+try:
+    async_runtime.run(scheduler.run())
+except KeyboardInterrupt:
+    print("Stopping NIFTY Options Alert Bot...")
+finally:
+    logging.info("Scheduler stats: %s", scheduler.stats())
+    logging.info("Provider latency: %s", latency_report())
+    logging.info("Response cache: %s", get_cache().stats())
+    logging.info("Trade state: %s", tracker.stats())
+    logging.info("Pre-screen: %s", prescreen.stats())
+    logging.info("Positions: %s", position_monitor.stats())
+    logging.info("Prompt compiler: %s", prompt_compiler.stats())
+    if market_feed:
+        market_feed.stop()
+    sender.close()
+    get_store().close()
+    async_runtime.shutdown()
@@ -0,0 +1,193 @@
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryBudget:
+    """
+    Process-wide cap on retries. Every first attempt deposits `ratio` of a
+    token and every retry spends a whole one, with a small per-second
+    reserve, so retries can never exceed roughly `ratio` of total traffic
+    even when a provider is down.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=0.1, max_tokens=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.exhausted = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.max_tokens, self.tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def deposit(self):
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+
+RETRY_BUDGET = RetryBudget()
+
+
+def retry_after_seconds(value):
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _RetryPolicy:
+    def __init__(self, name, connect_timeout, read_timeout, max_retries, backoff_base,
+                 backoff_max, max_retry_after, budget):
+        self.name = name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+        self.histogram = metrics.latency_histogram(name)
+
+    def delay(self, attempt, retry_after=None):
+        # Full-jitter exponential backoff, stretched to honour Retry-After.
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_retry_after))
+        return delay
+
+    def should_retry(self, attempt, reason):
+        if attempt >= self.max_retries:
+            return False
+        if not self.budget.withdraw():
+            logging.warning("%s: retry budget exhausted, not retrying (%s).", self.name, reason)
+            metrics.RETRIES.inc(client=self.name, outcome="budget_exhausted")
+            return False
+        logging.warning("%s: retrying after %s (attempt %d).", self.name, reason, attempt + 1)
+        metrics.RETRIES.inc(client=self.name, outcome="retried")
+        return True
+
+
+class HttpClient(_RetryPolicy):
+    """
+    Keep-alive requests.Session with per-request timeouts and budgeted retries.
+    """
+
+    def __init__(self, name, connect_timeout=5.0, read_timeout=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=20.0, max_retry_after=60.0,
+                 pool_size=8, budget=RETRY_BUDGET):
+        super().__init__(name, connect_timeout, read_timeout, max_retries, backoff_base,
+                         backoff_max, max_retry_after, budget)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.histogram.observe(time.perf_counter() - start)
+                if not self.should_retry(attempt, type(e).__name__):
+                    raise
+                time.sleep(self.delay(attempt))
+                attempt += 1
+                continue
+            self.histogram.observe(time.perf_counter() - start)
+            if response.status_code in RETRY_STATUSES and self.should_retry(attempt, response.status_code):
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                response.close()
+                time.sleep(self.delay(attempt, retry_after))
+                attempt += 1
+                continue
+            return response
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpClient(_RetryPolicy):
+    """
+    httpx.AsyncClient counterpart of HttpClient for code running on the event loop.
+    """
+
+    def __init__(self, name, connect_timeout=5.0, read_timeout=60.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=20.0, max_retry_after=60.0,
+                 pool_size=8, budget=RETRY_BUDGET):
+        super().__init__(name, connect_timeout, read_timeout, max_retries, backoff_base,
+                         backoff_max, max_retry_after, budget)
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def request(self, method, url, **kwargs):
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.TimeoutException) as e:
+                self.histogram.observe(time.perf_counter() - start)
+                if not self.should_retry(attempt, type(e).__name__):
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+                attempt += 1
+                continue
+            self.histogram.observe(time.perf_counter() - start)
+            if response.status_code in RETRY_STATUSES and self.should_retry(attempt, response.status_code):
+                retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+                await asyncio.sleep(self.delay(attempt, retry_after))
+                attempt += 1
+                continue
+            return response
+
+    async def post(self, url, **kwargs):
+        return await self.request("POST", url, **kwargs)
+
+    async def close(self):
+        await self.client.aclose()
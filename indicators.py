@@ -0,0 +1,469 @@
+import logging
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from market_data import INDEX_SYMBOL, Tick, session_day
+
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+# option_type of index futures ticks; their volume weights the index VWAP.
+FUTURES = "FUT"
+# Batch mode: whole-history arrays. EMA is evaluated in blocks with a
+# closed-form weighted sum, so there is no per-element Python loop; blocks
+# keep the decay powers well inside float64 range.
+
+def ema(values, span=None, alpha=None, initial=None):
+    """
+    Exponential moving average of values. Seeds with initial, or with the
+    first value when initial is None.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if x.size == 0:
+        return x
+    alpha = alpha if alpha is not None else 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    out = np.empty_like(x)
+    prev = x[0] if initial is None else initial
+    block = max(1, int(300 / -math.log(decay))) if 0 < decay < 1 else x.size
+    for start in range(0, x.size, block):
+        chunk = x[start:start + block]
+        n = chunk.size
+        powers = decay ** np.arange(n + 1)
+        # out[t] = decay^(t+1) * prev + alpha * decay^t * sum_k chunk[k] / decay^k
+        weighted = powers[:n] * np.cumsum(chunk / powers[:n])
+        out[start:start + n] = powers[1:] * prev + alpha * weighted
+        prev = out[start + n - 1]
+    return out
+
+
+def rsi(closes, period=RSI_PERIOD):
+    """
+    Wilder RSI; the first `period` values are NaN.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    out = np.full(closes.shape, np.nan)
+    if closes.size <= period:
+        return out
+    delta = np.diff(closes)
+    gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+    avg_gain = ema(gains[period:], alpha=1.0 / period, initial=gains[:period].mean())
+    avg_loss = ema(losses[period:], alpha=1.0 / period, initial=losses[:period].mean())
+    avg_gain = np.concatenate(([gains[:period].mean()], avg_gain))
+    avg_loss = np.concatenate(([losses[:period].mean()], avg_loss))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[period:] = np.where(avg_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + avg_gain / avg_loss))
+    return out
+
+
+def macd(closes, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    """
+    Returns (macd line, signal line, histogram).
+    """
+    line = ema(closes, span=fast) - ema(closes, span=slow)
+    signal_line = ema(line, span=signal)
+    return line, signal_line, line - signal_line
+
+
+def vwap(prices, volumes):
+    """
+    Running VWAP from per-bar prices and (non-cumulative) volumes.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    cum_volume = np.cumsum(volumes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(cum_volume > 0, np.cumsum(prices * volumes) / cum_volume, np.nan)
+
+
+# Incremental mode: O(1) per update, same recurrences as the batch functions.
+
+class RingBuffer:
+    """
+    Fixed-capacity float64 history; append is O(1), values() returns oldest first.
+    """
+
+    def __init__(self, capacity):
+        self.data = np.full(capacity, np.nan)
+        self.capacity = capacity
+        self.count = 0
+
+    def append(self, value):
+        self.data[self.count % self.capacity] = value
+        self.count += 1
+
+    def last(self):
+        return self.data[(self.count - 1) % self.capacity] if self.count else math.nan
+
+    def values(self):
+        if self.count <= self.capacity:
+            return self.data[:self.count]
+        split = self.count % self.capacity
+        return np.concatenate((self.data[split:], self.data[:split]))
+
+
+class EMA:
+    def __init__(self, span=None, alpha=None):
+        self.alpha = alpha if alpha is not None else 2.0 / (span + 1)
+        self.value = None
+
+    def update(self, x):
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class RSI:
+    """
+    Wilder RSI: an SMA seed over the first period changes, then smoothing.
+    """
+
+    def __init__(self, period=RSI_PERIOD):
+        self.period = period
+        self.prev = None
+        self.seed_gains = []
+        self.seed_losses = []
+        self.avg_gain = self.avg_loss = None
+        self.value = None
+
+    def update(self, close):
+        if self.prev is not None:
+            change = close - self.prev
+            gain, loss = max(change, 0.0), max(-change, 0.0)
+            if self.avg_gain is None:
+                self.seed_gains.append(gain)
+                self.seed_losses.append(loss)
+                if len(self.seed_gains) == self.period:
+                    self.avg_gain = sum(self.seed_gains) / self.period
+                    self.avg_loss = sum(self.seed_losses) / self.period
+            else:
+                self.avg_gain += (gain - self.avg_gain) / self.period
+                self.avg_loss += (loss - self.avg_loss) / self.period
+            if self.avg_gain is not None:
+                self.value = 100.0 if self.avg_loss == 0 else 100.0 - 100.0 / (1.0 + self.avg_gain / self.avg_loss)
+        self.prev = close
+        return self.value
+
+
+class MACD:
+    def __init__(self, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+        self.fast, self.slow, self.signal = EMA(fast), EMA(slow), EMA(signal)
+        self.line = self.signal_line = self.histogram = None
+
+    def update(self, close):
+        self.line = self.fast.update(close) - self.slow.update(close)
+        self.signal_line = self.signal.update(self.line)
+        self.histogram = self.line - self.signal_line
+        return self.histogram
+
+
+class VWAP:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.pv = 0.0
+        self.volume = 0.0
+
+    def update(self, price, volume):
+        if volume > 0:
+            self.pv += price * volume
+            self.volume += volume
+        return self.value
+
+    @property
+    def value(self):
+        return self.pv / self.volume if self.volume else None
+
+
+class InstrumentIndicators:
+    """
+    Indicators for one instrument over bar closes of bar_seconds.
+
+    Ticks inside a bar only move the pending close and volume; when a tick
+    opens the next bar the finished bar is pushed into the ring buffers and
+    every indicator, so values are always "as of the last closed bar".
+    Volume is taken as cumulative day volume (as exchange feeds send it) and
+    differenced per bar; instruments without their own volume (the index)
+    get it through add_volume. VWAP and the volume baseline restart with
+    each session, the other indicators carry over.
+    """
+
+    def __init__(self, bar_seconds=60, history=390):
+        self.bar_seconds = bar_seconds
+        self.closes = RingBuffer(history)
+        self.volumes = RingBuffer(history)
+        self.rsi = RSI()
+        self.macd = MACD()
+        self.ema20 = EMA(20)
+        self.vwap = VWAP()
+        self.bar = None
+        self.pending_close = None
+        self.pending_volume = 0.0
+        self.last_cum_volume = None
+        self.day = None
+
+    def update(self, ts, price, cum_volume=0):
+        """
+        Applies one tick and returns the volume traded since the previous one.
+        """
+        self._advance(ts)
+        self.pending_close = price
+        traded = 0.0
+        if cum_volume:
+            if self.last_cum_volume is not None and cum_volume >= self.last_cum_volume:
+                traded = cum_volume - self.last_cum_volume
+            elif self.last_cum_volume is None:
+                traded = cum_volume
+            self.pending_volume += traded
+            self.last_cum_volume = cum_volume
+        if not self.bar_seconds:
+            self._close_bar()
+        return traded
+
+    def add_volume(self, ts, volume):
+        """
+        Adds volume traded elsewhere (futures or options) to the bar of ts.
+        """
+        self._advance(ts)
+        self.pending_volume += volume
+
+    def _advance(self, ts):
+        # Any tick from a later bar closes the pending one, whichever arrives first.
+        bar = int(ts // self.bar_seconds) if self.bar_seconds else None
+        day = session_day(ts)
+        if self.bar is not None and bar != self.bar:
+            self._close_bar()
+        if day != self.day:
+            if self.day is not None:
+                self.vwap.reset()
+                self.last_cum_volume = None
+            self.day = day
+        self.bar = bar
+
+    def _close_bar(self):
+        close, volume = self.pending_close, self.pending_volume
+        if close is None:
+            return
+        self.closes.append(close)
+        self.volumes.append(volume)
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.ema20.update(close)
+        self.vwap.update(close, volume)
+        self.pending_volume = 0.0
+
+    def reading(self):
+        return {
+            "close": float(self.closes.last()) if self.closes.count else None,
+            "rsi": self.rsi.value,
+            "macd": self.macd.line,
+            "macd_signal": self.macd.signal_line,
+            "macd_hist": self.macd.histogram,
+            "ema20": self.ema20.value,
+            "vwap": self.vwap.value,
+            "bars": self.closes.count,
+        }
+
+
+class ChainIndicators:
+    """
+    Put-call ratio and strike-wise OI change, kept as running sums and
+    per-strike NumPy columns so each option tick is an O(1) update.
+    """
+
+    SIDES = {"CE": 0, "PE": 1}
+
+    def __init__(self, capacity=64):
+        self.index = {}
+        self.strikes = np.zeros(capacity, dtype=np.int64)
+        self.open_oi = np.zeros((capacity, 2))
+        self.oi = np.zeros((capacity, 2))
+        self.total_oi = np.zeros(2)
+
+    def _slot(self, strike):
+        slot = self.index.get(strike)
+        if slot is None:
+            slot = len(self.index)
+            if slot == len(self.strikes):
+                grow = len(self.strikes)
+                self.strikes = np.concatenate((self.strikes, np.zeros(grow, dtype=np.int64)))
+                self.open_oi = np.vstack((self.open_oi, np.zeros((grow, 2))))
+                self.oi = np.vstack((self.oi, np.zeros((grow, 2))))
+            self.index[strike] = slot
+            self.strikes[slot] = strike
+        return slot
+
+    def update(self, strike, option_type, oi):
+        side = self.SIDES.get(option_type)
+        if side is None:
+            return
+        slot = self._slot(strike)
+        if self.open_oi[slot, side] == 0:
+            self.open_oi[slot, side] = oi
+        self.total_oi[side] += oi - self.oi[slot, side]
+        self.oi[slot, side] = oi
+
+    def pcr(self):
+        return self.total_oi[1] / self.total_oi[0] if self.total_oi[0] else None
+
+    def oi_change(self):
+        """
+        (strikes, change) where change[:, 0] is CE and [:, 1] is PE OI change since open.
+        """
+        n = len(self.index)
+        return self.strikes[:n], self.oi[:n] - self.open_oi[:n]
+
+    def oi_shift(self, top=2):
+        """
+        Strikes with the largest call and put OI additions and unwinding.
+        """
+        strikes, change = self.oi_change()
+        if not strikes.size:
+            return {}
+        shift = {}
+        for side, label in ((0, "CE"), (1, "PE")):
+            order = np.argsort(change[:, side])
+            shift[f"{label} unwinding"] = [(int(strikes[i]), int(change[i, side])) for i in order[:top] if change[i, side] < 0]
+            shift[f"{label} writing"] = [(int(strikes[i]), int(change[i, side])) for i in order[::-1][:top] if change[i, side] > 0]
+        return shift
+
+
+@dataclass
+class Screen:
+    ok: bool
+    reasons: List[str] = field(default_factory=list)
+
+
+class IndicatorEngine:
+    """
+    Feeds market ticks into per-instrument indicators and the chain
+    aggregates of each underlying. Subscribe on_tick to a MarketFeed;
+    summary() goes into the prompt and check_trade() screens the trades
+    extracted from a response.
+
+    Index ticks carry no volume, so the index VWAP is weighted by the
+    underlying's futures volume, or by its option chain's traded volume
+    until a futures tick has been seen.
+    """
+
+    def __init__(self, bar_seconds=60, history=390, max_premium_drift=0.25):
+        self.bar_seconds = bar_seconds
+        self.history = history
+        self.max_premium_drift = max_premium_drift
+        self.instruments = {}
+        self.chains = {}
+        self.chain_days = {}
+        self.futures = set()
+        self.last_price = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, key):
+        found = self.instruments.get(key)
+        if found is None:
+            found = self.instruments[key] = InstrumentIndicators(self.bar_seconds, self.history)
+        return found
+
+    def chain(self, symbol=INDEX_SYMBOL):
+        return self.chains.get(symbol)
+
+    def _chain(self, symbol, ts):
+        # Open interest change is measured from each session's first tick.
+        day = session_day(ts)
+        if self.chain_days.get(symbol) != day:
+            self.chains[symbol] = ChainIndicators()
+            self.chain_days[symbol] = day
+        return self.chains[symbol]
+
+    def on_tick(self, tick: Tick):
+        key = (tick.symbol, tick.strike, tick.option_type) if tick.option_type else tick.symbol
+        with self._lock:
+            traded = self.instrument(key).update(tick.ts, tick.price, tick.volume)
+            self.last_price[key] = tick.price
+            if tick.option_type == FUTURES:
+                if tick.symbol not in self.futures:
+                    # Option volume weighted the VWAP so far; start over on futures volume.
+                    self.futures.add(tick.symbol)
+                    index = self.instrument(tick.symbol)
+                    index.vwap.reset()
+                    index.pending_volume = 0.0
+                self.instrument(tick.symbol).add_volume(tick.ts, traded)
+            elif tick.option_type:
+                self._chain(tick.symbol, tick.ts).update(tick.strike, tick.option_type, tick.oi)
+                if tick.symbol not in self.futures:
+                    self.instrument(tick.symbol).add_volume(tick.ts, traded)
+
+    def reading(self, symbol=INDEX_SYMBOL, strike=0, option_type=""):
+        key = (symbol, strike, option_type) if option_type else symbol
+        with self._lock:
+            found = self.instruments.get(key)
+            return found.reading() if found else None
+
+    def summary(self, symbol=INDEX_SYMBOL):
+        with self._lock:
+            index = self.instruments.get(symbol)
+            if index is None or index.rsi.value is None:
+                return ""
+            r = index.reading()
+            parts = [f"RSI(14) {r['rsi']:.1f}", f"MACD {r['macd']:+.2f} / signal {r['macd_signal']:+.2f}",
+                     f"EMA20 {r['ema20']:.2f}"]
+            if r["vwap"] is not None:
+                parts.append(f"VWAP {r['vwap']:.2f} ({(r['close'] - r['vwap']) / r['vwap'] * 100:+.2f}%)")
+            chain = self.chains.get(symbol)
+            pcr = chain.pcr() if chain is not None else None
+            if pcr is not None:
+                parts.append(f"PCR {pcr:.2f}")
+            lines = [f"Indicators ({self.bar_seconds // 60 or 1}m bars): " + " | ".join(parts)]
+            for label, strikes in (chain.oi_shift() if chain is not None else {}).items():
+                if strikes:
+                    lines.append(f"{label}: " + ", ".join(f"{s} ({c / 1e5:+.1f}L)" for s, c in strikes))
+            return "\n".join(lines)
+
+    def check_trade(self, trade, symbol=INDEX_SYMBOL):
+        """
+        Rejects a trade whose direction most of MACD, RSI and price against
+        VWAP contradict (both of MACD and RSI before VWAP has volume), or
+        whose entry range is far from the option's live premium. Passes
+        trades it has no data for.
+        """
+        reasons = []
+        with self._lock:
+            index = self.instruments.get(symbol)
+            if index is not None and index.rsi.value is not None and index.macd.histogram is not None:
+                bullish = trade.option_type == "CE"
+                against = [index.macd.histogram < 0 if bullish else index.macd.histogram > 0,
+                           index.rsi.value < 50 if bullish else index.rsi.value > 50]
+                details = f"RSI {index.rsi.value:.1f}, MACD hist {index.macd.histogram:+.2f}"
+                vwap, close = index.vwap.value, index.closes.last()
+                if vwap is not None:
+                    against.append(close < vwap if bullish else close > vwap)
+                    details += f", {'below' if close < vwap else 'above'} VWAP {vwap:.2f}"
+                if sum(against) * 2 > len(against):
+                    reasons.append(f"momentum against {trade.option_type} ({details})")
+            premium = self.last_price.get((symbol, trade.strike, trade.option_type))
+            if premium is not None:
+                low = trade.entry_low * (1 - self.max_premium_drift)
+                high = trade.entry_high * (1 + self.max_premium_drift)
+                if not low <= premium <= high:
+                    reasons.append(f"live premium {premium:.1f} far from entry {trade.entry_low:g}-{trade.entry_high:g}")
+        return Screen(not reasons, reasons)
+
+    def screen_stream(self, trades):
+        """
+        Passes streamed trades through check_trade as they arrive.
+        """
+        for trade in trades:
+            if self._screen(trade):
+                yield trade
+
+    def _screen(self, trade):
+        screen = self.check_trade(trade)
+        if not screen.ok:
+            logging.info("Indicator screen rejected %s %s: %s", trade.option_type, trade.strike,
+                         "; ".join(screen.reasons))
+        return screen.ok
+
+    def confirmed(self, trades):
+        return [trade for trade in trades if self._screen(trade)]
@@ -0,0 +1,221 @@
+"""
+Offline load test: the multi_bot pipeline against mock_server.py.
+
+Ticks are started at a fixed rate whether or not earlier ones have
+finished (open loop), so a slow provider shows up as queueing and overlap
+rather than as a lower request rate. Reports tick latency percentiles,
+throughput, and what went wrong: provider errors, timeouts, answers
+without a parseable trade, suppressed repeats and Telegram failures.
+
+    python loadtest.py --rate 2 --duration 60 --latency 1.5 --jitter 1 --error-rate 0.05
+    python loadtest.py --rate 5 --duration 30 --mode consensus --malformed-rate 0.2
+    python loadtest.py --target http://127.0.0.1:8799 --rate 1 --duration 60   # an already running mock
+
+Runs are isolated from the real bot: the run store, logs and trade state go
+to a temporary directory and the response cache is off unless --cache.
+Each tick's prompt is made unique so overlapping ticks are not coalesced
+into one provider call; --same-prompt keeps them identical, as in the bot.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import itertools
+import time
+from collections import Counter
+
+import numpy as np
+
+from mock_server import MockServer, add_config_arguments, config_from_args
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def configure_env(mock_env, workdir, args):
+    """
+    Sets the environment multi_bot and its modules read at import time.
+    """
+    env = dict(mock_env)
+    env.update({
+        "CHAT_ID": "1",
+        "FANOUT_MODE": args.mode,
+        "FANOUT_DEADLINE": str(args.deadline),
+        "STRUCTURED_OUTPUT": "1" if args.structured else "0",
+        "RUN_STORE_PATH": os.path.join(workdir, "runs.sqlite3"),
+        "LOG_PATH": os.path.join(workdir, "loadtest.log"),
+        "LOG_CONSOLE_LEVEL": "ERROR",
+        "METRICS_ENABLED": "1",
+        "MARKET_DATA_SOURCE": "",
+        "SUBSCRIPTIONS_PATH": "",
+        "PROMPT_STRATEGIES": "",
+        "PROMPT_EXPIRIES": "",
+    })
+    if not args.cache:
+        env["RESPONSE_CACHE_TTL"] = "0"
+        env["RESPONSE_CACHE_PATH"] = ""
+    if not args.providers or "openai" not in args.providers:
+        env["OPENAI_API_KEY"] = ""
+    if not args.providers or "xai" not in args.providers:
+        env["XAI_API_KEY"] = ""
+    for key, value in env.items():
+        if value:
+            os.environ[key] = value
+        else:
+            os.environ.pop(key, None)
+
+
+def classify(result, providers):
+    """
+    Outcomes of one tick: one per provider, plus the tick itself.
+    """
+    from response_cache import ERROR_PREFIXES
+
+    outcomes = Counter()
+    if result is None:
+        outcomes["tick:skipped"] += 1
+        return outcomes
+    answered = set()
+    for answer in result.answers:
+        answered.add(answer.provider)
+        if answer.raw_response.startswith(ERROR_PREFIXES):
+            outcomes[f"{answer.provider}:error"] += 1
+        elif answer.trades:
+            outcomes[f"{answer.provider}:trade"] += 1
+        else:
+            outcomes[f"{answer.provider}:unparsed"] += 1
+    for name in providers:
+        if name not in answered:
+            outcomes[f"{name}:no_answer"] += 1
+    outcomes["tick:trade" if result.best_trade else "tick:no_trade"] += 1
+    return outcomes
+
+
+async def drive(pipeline, rate, duration, providers):
+    loop = asyncio.get_running_loop()
+    interval = 1.0 / rate
+    latencies, outcomes, inflight = [], Counter(), set()
+    max_inflight = 0
+
+    async def tick():
+        start = time.perf_counter()
+        try:
+            result = await pipeline.run()
+        except Exception as e:
+            outcomes[f"tick:exception:{type(e).__name__}"] += 1
+            return
+        latencies.append(time.perf_counter() - start)
+        outcomes.update(classify(result, providers))
+
+    start = loop.time()
+    count = max(1, int(duration * rate))
+    for i in range(count):
+        delay = start + i * interval - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(tick())
+        inflight.add(task)
+        task.add_done_callback(inflight.discard)
+        max_inflight = max(max_inflight, len(inflight))
+    if inflight:
+        await asyncio.gather(*inflight)
+    return latencies, outcomes, loop.time() - start, max_inflight
+
+
+def report(latencies, outcomes, elapsed, ticks, max_inflight):
+    values = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "ticks": ticks,
+        "completed": len(latencies),
+        "elapsed": round(elapsed, 2),
+        "throughput": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        "max_inflight": max_inflight,
+        "latency": {
+            **{f"p{p}": round(float(np.percentile(values, p)), 3) for p in PERCENTILES},
+            "mean": round(float(values.mean()), 3),
+            "max": round(float(values.max()), 3),
+        },
+        "outcomes": dict(sorted(outcomes.items())),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=1.0, help="ticks per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of ticks")
+    parser.add_argument("--mode", choices=("first", "consensus"), default="first")
+    parser.add_argument("--deadline", type=float, default=30.0, help="fan-out deadline per tick")
+    parser.add_argument("--providers", nargs="*", default=["openai", "xai"], choices=("openai", "xai"))
+    parser.add_argument("--structured", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on")
+    parser.add_argument("--same-prompt", action="store_true", help="let overlapping ticks share one call")
+    parser.add_argument("--target", help="URL of a running mock_server.py instead of an in-process one")
+    parser.add_argument("--flush-timeout", type=float, default=30.0,
+                        help="seconds to wait for queued Telegram messages after the last tick")
+    parser.add_argument("--json", action="store_true", help="print the report as one JSON line")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.target:
+        url = args.target.rstrip("/")
+        mock_env = {"OPENAI_BASE_URL": f"{url}/v1", "XAI_BASE_URL": f"{url}/v1", "TELEGRAM_API_URL": url,
+                    "OPENAI_API_KEY": "mock", "XAI_API_KEY": "mock", "TELEGRAM_BOT_TOKEN": "1:mock"}
+    else:
+        server = MockServer(config_from_args(args)).start()
+        mock_env = server.env()
+
+    with tempfile.TemporaryDirectory(prefix="btrader-loadtest-") as workdir:
+        configure_env(mock_env, workdir, args)
+        # Imported only now: these modules read their configuration at import time.
+        import async_runtime
+        import metrics
+        import multi_bot
+        from metrics import latency_report
+        from response_cache import get_cache
+        from run_store import get_store
+
+        pipeline = multi_bot.pipelines[0]
+        if not args.same_prompt:
+            serial, with_data = itertools.count(1), pipeline.with_data
+            pipeline.with_data = lambda prompt: f"{with_data(prompt)}\n(load test tick {next(serial)})"
+        multi_bot.sender.start()
+        names = [p.name for p in multi_bot.fanout_providers]
+        ticks = max(1, int(args.duration * args.rate))
+        latencies, outcomes, elapsed, max_inflight = async_runtime.run(
+            drive(pipeline, args.rate, args.duration, names)
+        )
+        # Alerts queue behind the per-chat rate limit; whatever is still
+        # queued after the timeout is reported, not waited for.
+        flush_start = time.perf_counter()
+        try:
+            multi_bot.sender.flush(timeout=args.flush_timeout)
+        except TimeoutError:
+            pass
+        telegram = multi_bot.sender.stats()
+        telegram["flush_seconds"] = round(time.perf_counter() - flush_start, 2)
+
+        result = report(latencies, outcomes, elapsed, ticks, max_inflight)
+        result["providers"] = names
+        result["provider_latency"] = latency_report()
+        result["parse_failures"] = metrics.PARSE_FAILURES.value()
+        result["response_cache"] = get_cache().stats()
+        result["trade_state"] = pipeline.tracker.stats()
+        result["telegram"] = telegram
+        if server is not None:
+            result["mock"] = server.state.stats()
+
+        multi_bot.sender.close(timeout=1)
+        get_store().close()
+        async_runtime.shutdown()
+    if server is not None:
+        server.stop()
+
+    if args.json:
+        print(json.dumps(result, default=str))
+    else:
+        print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import atexit
+import datetime
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+
+LOG_PATH = os.getenv("LOG_PATH", "nifty_bot.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "14"))
+# Debug events (and any record logged with extra={"sample": True}) are kept
+# one in every LOG_DEBUG_SAMPLE per call site.
+LOG_DEBUG_SAMPLE = int(os.getenv("LOG_DEBUG_SAMPLE", "20"))
+# Records at or above this level are also echoed to the console, e.g. a
+# Cloudflare challenge that has to be solved by hand.
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "WARNING").upper()
+
+TEXT_FORMAT = "%(asctime)s — %(levelname)s — %(message)s"
+# Attributes every LogRecord has; anything else came in through extra= and
+# becomes a field of the JSON event.
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, msg, the extra= fields and
+    the traceback, if any.
+    """
+
+    def format(self, record):
+        event = {
+            "ts": datetime.datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key != "sample":
+                event[key] = value
+        if record.exc_info:
+            event["exc"] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """
+    Rotates on the time schedule and also whenever the file passes max_bytes.
+    """
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, when=LOG_ROTATE_WHEN, backup_count=LOG_BACKUP_COUNT):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.max_bytes = max_bytes
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes > 0 and self.stream is not None:
+            return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+        return False
+
+    def rotation_filename(self, default_name):
+        # Size rollovers can happen twice within one time suffix.
+        name, n = default_name, 0
+        while os.path.exists(name):
+            n += 1
+            name = f"{default_name}.{n}"
+        return name
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Passes every record at INFO and above except those marked sample=True;
+    of the rest, keeps one in `every` per call site (logger and message).
+    """
+
+    def __init__(self, every=LOG_DEBUG_SAMPLE):
+        super().__init__()
+        self.every = max(int(every), 1)
+        self.seen = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.INFO and not getattr(record, "sample", False):
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self.seen.get(key, 0)
+            self.seen[key] = count + 1
+            if count % self.every == 0:
+                record.sampled = self.every
+                return True
+            self.dropped += 1
+            return False
+
+
+_listener = None
+_sampler = None
+_setup_lock = threading.Lock()
+
+
+def setup_logging(path=LOG_PATH, level=LOG_LEVEL, fmt=LOG_FORMAT, console_level=LOG_CONSOLE_LEVEL):
+    """
+    Points the root logger at a QueueHandler; a QueueListener thread does the
+    formatting and file I/O, so logging never blocks the caller on disk.
+    Safe to call more than once; only the first call configures anything.
+    """
+    global _listener, _sampler
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        formatter = JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT)
+        file_handler = SizedTimedRotatingFileHandler(path)
+        file_handler.setFormatter(formatter)
+        handlers = [file_handler]
+        if console_level and console_level != "NONE":
+            console = logging.StreamHandler()
+            console.setLevel(console_level)
+            console.setFormatter(logging.Formatter(TEXT_FORMAT))
+            handlers.append(console)
+
+        _sampler = SamplingFilter()
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(_sampler)
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """
+    Drains the queue and closes the files. Call last at shutdown.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def logging_stats():
+    return {"sampled_out": _sampler.dropped if _sampler else 0}
+
+
+def log_request(provider, prompt, stream=False):
+    """
+    Logs a model call by prompt hash and size; the prompt text itself lives
+    once in the run store.
+    """
+    digest = prompt_hash(prompt)
+    logging.info("%s prompt to %s (%s, %d chars)", "Streaming" if stream else "Sending", provider, digest,
+                 len(prompt), extra={"event": "llm_request", "provider": provider, "prompt_hash": digest,
+                                     "prompt_chars": len(prompt), "stream": stream})
+
+
+def log_response(provider, text):
+    logging.info("%s response (%d chars)", provider, len(text),
+                 extra={"event": "llm_response", "provider": provider, "response_chars": len(text)})
+    logging.debug("%s response body:\n%s", provider, text)
@@ -1,46 +1,21 @@
 import os
-import openai
 import schedule
 import time
-import re
-from telegram import Bot
 from dotenv import load_dotenv
-import datetime
-import asyncio
 import logging
-from openai import OpenAI
 
+import metrics
+from log_setup import setup_logging
+from providers import OPENAI_MODEL, capture_usage, stream_chatgpt
+from response_cache import cached_stream, get_cache
+from run_store import get_store
+from session_clock import is_market_closed_today
+from telegram_sender import TelegramSender
+from trade_state import TradeStateTracker, alert_messages
+from trades import TradeStreamParser, pick_streamed_trade, stream_trades
 
-logging.basicConfig(
-    filename="nifty_bot.log",
-    level=logging.INFO,
-    format="%(asctime)s — %(levelname)s — %(message)s",
-)
-# List of NSE trading holidays for 2025
-NSE_HOLIDAYS_2025 = {
-    "2025-02-26", 
-    "2025-03-14", 
-    "2025-03-31", 
-    "2025-04-10", 
-    "2025-04-14", 
-    "2025-04-18", 
-    "2025-05-01", 
-    "2025-08-15", 
-    "2025-08-27", 
-    "2025-10-02", 
-    "2025-10-21", 
-    "2025-10-22", 
-    "2025-11-05", 
-    "2025-12-25", 
-}
-
-def is_market_closed_today():
-    today = datetime.date.today()
-    weekday = today.weekday()  # Monday=0, Sunday=6
-    is_weekend = weekday >= 5  # Saturday=5, Sunday=6
-    is_holiday = today.isoformat() in NSE_HOLIDAYS_2025
-    return is_weekend or is_holiday
 
+setup_logging()
 # Load environment variables
 load_dotenv()
 
@@ -48,9 +23,11 @@ load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 CHAT_ID = os.getenv("CHAT_ID")
+EARLY_ALERT_CONFIDENCE = int(os.getenv("EARLY_ALERT_CONFIDENCE", "75"))
 
-bot = Bot(token=TELEGRAM_BOT_TOKEN)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+sender = TelegramSender(TELEGRAM_BOT_TOKEN, default_chat_id=CHAT_ID)
+ask_chatgpt_stream = cached_stream(stream_chatgpt, f"openai:{OPENAI_MODEL}")
+tracker = TradeStateTracker()
 
 # The prompt to submit every 15 minutes
 PROMPT = """Act as a professional NIFTY options trader and market strategist. Based strictly on today’s live market data (price action, OI, volume, momentum, VIX, and institutional activity), provide 1–2 high-probability intraday trades on the NIFTY index options.
@@ -75,95 +52,45 @@ For each trade, provide:
 9. Key Technical + Derivative Factors (OI/PCR, support/resistance, trend, candle patterns, etc.)
 10. Short Justification (why this setup is valid today)
 Only share trades with clean risk-reward, momentum confirmation, and derivative strength. Avoid directional bias unless validated by data."""
-def ask_chatgpt(prompt):
-    try:
-        logging.info(f"Sending prompt to ChatGPT:\n{prompt}")
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # or "gpt-4"
-            messages=[
-                {"role": "system", "content": "Act as a professional NIFTY options trader and market analyst."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        if not response or not response.choices:
-            raise ValueError("No valid response from ChatGPT")
-
-        chatgpt_response = response.choices[0].message.content.strip()
-        logging.info("ChatGPT Response:\n%s", chatgpt_response)
-        return chatgpt_response
-
-    except Exception as e:
-        logging.error("ChatGPT Error: %s", str(e))
-        return f"ChatGPT Error: {e}"
-
-def extract_trades(text):
-    trades = []
-    pattern = re.compile(
-        r"Option Type:\s*(?P<type>CE|PE).*?"
-        r"Strike Price:\s*(?P<strike>[\d,]+).*?"
-        r"Premium Entry Range:\s*(?P<entry>₹?[\d–\-to ]+).*?"
-        r"Target\(s\):\s*(?P<target>₹?[\d–\-to ]+).*?"
-        r"Stop Loss:\s*(?P<sl>₹?[\d–\-to ]+).*?"
-        r"Ideal Entry Time:\s*(?P<entry_time>[\d:–to ]+).*?"
-        r"Ideal Exit Time:\s*(?P<exit_time>[\d:–to ]+).*?"
-        r"Confidence Level:\s*(?P<confidence>\d+)%.*?"
-        r"Key Factors:\s*(?P<keyfactors>.*?)(?=Short Reason:|$).*?"
-        r"Short Reason:\s*(?P<reason>.*?)(?=\n\d|$)",
-        re.DOTALL
-    )
-    for match in pattern.finditer(text):
-        trades.append({
-            "Option Type": match.group("type").strip(),
-            "Strike Price": match.group("strike").strip(),
-            "Premium Entry Range": match.group("entry").strip(),
-            "Target(s)": match.group("target").strip(),
-            "Stop Loss": match.group("sl").strip(),
-            "Ideal Entry Time": match.group("entry_time").strip(),
-            "Ideal Exit Time": match.group("exit_time").strip(),
-            "Confidence Level": match.group("confidence").strip(),
-            "Volume Surge: ": "",  # optional to extract
-            "VIX:": "",            # optional to extract
-            "Price Action": "",    # optional to extract
-            "Momentum": "",        # optional to extract
-            "reason": match.group("reason").strip()
-        })
-    return trades
-
-def select_highest_confidence(trades):
-    if not trades:
-        return None
-    return max(trades, key=lambda x: int(x["Confidence Level"]))
-
-async def async_send_message(message):
-    try:
-        await bot.send_message(chat_id=CHAT_ID, text=message)
-    except Exception as e:
-        print(f"Telegram Error: {e}")
-
-
 
 def send_to_telegram(message):
-    asyncio.run(async_send_message(message))
+    sender.send(message)
 
+@metrics.traced("tick")
 def run_task():
-    print("Running scheduled job...")
+    logging.info("Running scheduled job...")
     # if is_market_closed_today():
     #     return
-    raw_response = ask_chatgpt(PROMPT)
-    trades = extract_trades(raw_response)
-    best_trade = select_highest_confidence(trades)
+    # A trade at or above EARLY_ALERT_CONFIDENCE is sent as soon as its fields
+    # have streamed in; otherwise the best trade is picked at the end.
+    parser = TradeStreamParser()
+    start = time.perf_counter()
+    with metrics.stage("llm"), capture_usage() as usage:
+        best_trade = pick_streamed_trade(stream_trades(ask_chatgpt_stream(PROMPT), parser), EARLY_ALERT_CONFIDENCE)
+    latency = time.perf_counter() - start
     
+    alerted = None
     if best_trade:
-        formatted = "\n".join([f"{k}: {v}" for k, v in best_trade.items()])
-        send_to_telegram("🔔 *NIFTY Trade Alert (Highest Confidence)*\n\n" + formatted)
-    else:
+        change = tracker.observe(best_trade)
+        if change.material:
+            alerted = best_trade
+        else:
+            logging.info("Suppressed repeat alert for %s %s.", best_trade.option_type, best_trade.strike)
+        for message in alert_messages(change, "🔔 *NIFTY Trade Alert (Highest Confidence)*"):
+            send_to_telegram(message)
+    elif tracker.observe_empty():
         send_to_telegram("No valid trade found in the ChatGPT response.")
+    get_store().record("main.py", f"openai:{OPENAI_MODEL}", PROMPT, parser.raw_response(), parser.trades,
+                       latency=latency, usage=usage, alerted=alerted)
 
 # Schedule every 15 minutes
 # schedule.every(30).seconds.do(run_task)
 
 print("Running NIFTY Options Alert Bot...")
 run_task()  # Run immediately on startup
+logging.info("Response cache: %s", get_cache().stats())
+sender.close()
+get_store().close()
 
 # while True:
 #     run_pending()
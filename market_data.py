@@ -0,0 +1,397 @@
+import asyncio
+import csv
+import datetime
+import json
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import async_runtime
+from scheduler import IST
+
+# Either a replay file (.csv / .parquet) or tcp://host:port for a local feed.
+MARKET_DATA_SOURCE = os.getenv("MARKET_DATA_SOURCE")
+# Replay speed: 1 = real time, 60 = a minute per second, 0 = as fast as possible.
+MARKET_DATA_SPEED = float(os.getenv("MARKET_DATA_SPEED", "1"))
+INDEX_SYMBOL = "NIFTY"
+VIX_SYMBOL = "INDIAVIX"
+DATA_NOTE = "Base the trades on these numbers; do not assume values that are not given."
+IST_OFFSET = IST.utcoffset(None).total_seconds()
+
+
+@dataclass(slots=True)
+class Tick:
+    """
+    One price update. Index and VIX ticks leave strike/option_type empty;
+    option ticks carry cumulative day volume and open interest.
+    """
+    ts: float
+    symbol: str
+    price: float
+    volume: int = 0
+    oi: int = 0
+    strike: int = 0
+    option_type: str = ""
+
+
+def parse_timestamp(value):
+    """
+    Epoch seconds from a number or an ISO time; naive times are IST.
+    """
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=IST)
+        return parsed.timestamp()
+
+
+def session_day(ts):
+    """
+    IST calendar day of an epoch timestamp, as a day number. NSE sessions
+    never cross midnight, so a new day is a new session.
+    """
+    return int((ts + IST_OFFSET) // 86400)
+
+
+def tick_from_row(row):
+    """
+    Builds a Tick from a CSV row or JSON object with the replay file columns
+    ts, symbol, strike, option_type, price, volume, oi.
+    """
+    return Tick(
+        ts=parse_timestamp(row["ts"]),
+        symbol=str(row["symbol"]).upper(),
+        price=float(row["price"]),
+        volume=int(float(row.get("volume") or 0)),
+        oi=int(float(row.get("oi") or 0)),
+        strike=int(float(row.get("strike") or 0)),
+        option_type=str(row.get("option_type") or "").upper(),
+    )
+
+
+class _ReplaySource:
+    """
+    Replays recorded ticks, sleeping between timestamps scaled by speed.
+    """
+
+    def __init__(self, path, speed=MARKET_DATA_SPEED):
+        self.path = path
+        self.speed = speed
+
+    def rows(self):
+        raise NotImplementedError
+
+    async def ticks(self):
+        previous = None
+        for row in self.rows():
+            tick = tick_from_row(row)
+            if self.speed > 0 and previous is not None and tick.ts > previous:
+                await asyncio.sleep((tick.ts - previous) / self.speed)
+            previous = tick.ts
+            yield tick
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.path!r})"
+
+
+class CsvReplaySource(_ReplaySource):
+    def rows(self):
+        with open(self.path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+
+class ParquetReplaySource(_ReplaySource):
+    """
+    Parquet replay; needs pyarrow, which is not a hard dependency.
+    """
+
+    def rows(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet replay needs pyarrow: pip install pyarrow") from None
+        for batch in pq.ParquetFile(self.path).iter_batches():
+            yield from batch.to_pylist()
+
+
+class SocketSource:
+    """
+    Reads newline-delimited JSON ticks from a local TCP feed and reconnects
+    with backoff when the feed goes away.
+    """
+
+    def __init__(self, host, port, max_backoff=30):
+        self.host = host
+        self.port = port
+        self.max_backoff = max_backoff
+
+    async def ticks(self):
+        backoff = 1
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError as e:
+                logging.warning("Market feed %s:%s unavailable (%s); retrying in %ss.",
+                                self.host, self.port, e, backoff)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            try:
+                while line := await reader.readline():
+                    try:
+                        tick = tick_from_row(json.loads(line))
+                    except (ValueError, KeyError) as e:
+                        logging.error("Market feed parse Error: %s", e)
+                        continue
+                    backoff = 1
+                    yield tick
+            finally:
+                writer.close()
+            logging.warning("Market feed %s:%s closed; reconnecting in %ss.", self.host, self.port, backoff)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def __repr__(self):
+        return f"SocketSource({self.host!r}, {self.port})"
+
+
+def open_source(spec, speed=MARKET_DATA_SPEED):
+    if spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        return SocketSource(host or "127.0.0.1", int(port))
+    if spec.endswith(".parquet"):
+        return ParquetReplaySource(spec, speed)
+    return CsvReplaySource(spec, speed)
+
+
+@dataclass(slots=True)
+class OptionQuote:
+    price: float
+    volume: int
+    oi: int
+    open_oi: int
+
+
+class MarketSnapshot:
+    """
+    Rolling in-memory view of one underlying (symbol), VIX and that
+    underlying's option chain, updated tick by tick and safe to read from
+    worker threads. Ticks for other underlyings and futures are ignored.
+    The day's open, high and low, the VIX open and the chain's opening OI
+    start over with each IST session day.
+    """
+
+    def __init__(self, window_seconds=15 * 60, symbol=INDEX_SYMBOL):
+        self.window_seconds = window_seconds
+        self.symbol = symbol
+        self.day = None
+        self.spot = None
+        self.day_open = self.day_high = self.day_low = None
+        self.vix = None
+        self.vix_open = None
+        self.chain = {}
+        self.last_ts = None
+        self._prices = deque()
+        self._lock = threading.Lock()
+
+    def _new_session(self, day):
+        # Called with the lock held.
+        self.day = day
+        self.spot = self.day_open = self.day_high = self.day_low = None
+        self.vix = self.vix_open = None
+        self.chain = {}
+        self._prices.clear()
+
+    def update(self, tick: Tick):
+        if tick.option_type not in ("", "CE", "PE"):
+            return
+        if tick.symbol != self.symbol and (tick.symbol != VIX_SYMBOL or tick.option_type):
+            return
+        with self._lock:
+            day = session_day(tick.ts)
+            if day != self.day:
+                self._new_session(day)
+            self.last_ts = tick.ts
+            if tick.option_type:
+                quote = self.chain.get((tick.strike, tick.option_type))
+                if quote is None:
+                    self.chain[(tick.strike, tick.option_type)] = OptionQuote(tick.price, tick.volume, tick.oi, tick.oi)
+                else:
+                    quote.price, quote.volume, quote.oi = tick.price, tick.volume, tick.oi
+            elif tick.symbol == VIX_SYMBOL:
+                self.vix = tick.price
+                if self.vix_open is None:
+                    self.vix_open = tick.price
+            else:
+                self.spot = tick.price
+                if self.day_open is None:
+                    self.day_open = self.day_high = self.day_low = tick.price
+                self.day_high = max(self.day_high, tick.price)
+                self.day_low = min(self.day_low, tick.price)
+                self._prices.append((tick.ts, tick.price))
+                while self._prices and tick.ts - self._prices[0][0] > self.window_seconds:
+                    self._prices.popleft()
+
+    def ready(self):
+        return self.spot is not None
+
+    def _change(self, seconds):
+        # Percent change of spot over the last `seconds`, from the rolling window.
+        if not self._prices:
+            return None
+        cutoff = self._prices[-1][0] - seconds
+        for ts, price in self._prices:
+            if ts >= cutoff:
+                return (self.spot - price) / price * 100
+        return None
+
+    def pcr(self):
+        calls = sum(q.oi for (_, side), q in self.chain.items() if side == "CE")
+        puts = sum(q.oi for (_, side), q in self.chain.items() if side == "PE")
+        return puts / calls if calls else None
+
+    def metrics(self, strikes_around=2):
+        """
+        Plain numbers for rule checks: spot moves, VIX change, PCR and the
+        largest OI change (percent of open) among the strikes around ATM.
+        """
+        with self._lock:
+            if self.spot is None:
+                return {}
+            values = {
+                "spot": self.spot,
+                "move_5m": self._change(300),
+                "move_15m": self._change(900),
+                "vix": self.vix,
+                "vix_change": (self.vix - self.vix_open) / self.vix_open * 100 if self.vix_open else None,
+                "pcr": self.pcr(),
+                "max_oi_change": None,
+            }
+            strikes = sorted({strike for strike, _ in self.chain})
+            if strikes:
+                atm_index = min(range(len(strikes)), key=lambda i: abs(strikes[i] - self.spot))
+                near = set(strikes[max(atm_index - strikes_around, 0):atm_index + strikes_around + 1])
+                changes = [abs(q.oi - q.open_oi) / q.open_oi * 100
+                           for (strike, _), q in self.chain.items() if strike in near and q.open_oi]
+                values["max_oi_change"] = max(changes, default=None)
+            return values
+
+    def summary(self, strikes_around=2):
+        """
+        Compact numeric summary for the prompt: spot and range, VIX, PCR,
+        heaviest OI strikes and the chain around ATM with OI change since open.
+        """
+        with self._lock:
+            if self.spot is None:
+                return ""
+            as_of = datetime.datetime.fromtimestamp(self.last_ts, IST).strftime("%H:%M")
+            lines = [f"Market data as of {as_of} IST:"]
+            moves = []
+            for label, seconds in (("5m", 300), ("15m", 900)):
+                change = self._change(seconds)
+                if change is not None:
+                    moves.append(f"{label} {change:+.2f}%")
+            lines.append(
+                f"{self.symbol} {self.spot:.2f} | open {self.day_open:.2f} high {self.day_high:.2f} "
+                f"low {self.day_low:.2f}" + (" | " + " ".join(moves) if moves else "")
+            )
+            if self.vix is not None:
+                lines.append(f"India VIX {self.vix:.2f} (open {self.vix_open:.2f})")
+            if self.chain:
+                pcr = self.pcr()
+                max_ce = max((k for k in self.chain if k[1] == "CE"), key=lambda k: self.chain[k].oi, default=None)
+                max_pe = max((k for k in self.chain if k[1] == "PE"), key=lambda k: self.chain[k].oi, default=None)
+                parts = [f"PCR {pcr:.2f}" if pcr is not None else None,
+                         f"max CE OI {max_ce[0]}" if max_ce else None,
+                         f"max PE OI {max_pe[0]}" if max_pe else None]
+                lines.append(" | ".join(p for p in parts if p))
+                strikes = sorted({strike for strike, _ in self.chain})
+                atm_index = min(range(len(strikes)), key=lambda i: abs(strikes[i] - self.spot))
+                atm = strikes[atm_index]
+                for strike in strikes[max(atm_index - strikes_around, 0):atm_index + strikes_around + 1]:
+                    cells = []
+                    for side in ("CE", "PE"):
+                        q = self.chain.get((strike, side))
+                        if q:
+                            oi_change = (q.oi - q.open_oi) / q.open_oi * 100 if q.open_oi else 0.0
+                            cells.append(f"{side} {q.price:.1f} OI {q.oi / 1e5:.1f}L ({oi_change:+.1f}%)")
+                    lines.append(f"{strike}{' (ATM)' if strike == atm else ''}: " + " | ".join(cells))
+            return "\n".join(lines)
+
+
+class MarketFeed:
+    """
+    Pumps ticks from a source into a MarketSnapshot on the shared event loop.
+    """
+
+    def __init__(self, source, snapshot: Optional[MarketSnapshot] = None):
+        self.source = source
+        self.snapshot = snapshot or MarketSnapshot()
+        self.ticks = 0
+        self.errors = 0
+        self.finished = False
+        self.listeners = []
+        self._future = None
+
+    def subscribe(self, listener):
+        """
+        Registers listener(tick), called on the loop thread after each update.
+        """
+        self.listeners.append(listener)
+
+    async def run(self):
+        try:
+            async for tick in self.source.ticks():
+                self.snapshot.update(tick)
+                self.ticks += 1
+                for listener in self.listeners:
+                    try:
+                        listener(tick)
+                    except Exception as e:
+                        self.errors += 1
+                        logging.error("Market data listener Error: %s", e)
+        finally:
+            self.finished = True
+            logging.info("Market feed %r stopped after %d ticks.", self.source, self.ticks)
+
+    def start(self):
+        if self._future is None:
+            self._future = async_runtime.submit(self.run())
+        return self
+
+    def stop(self):
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def stats(self):
+        return {"ticks": self.ticks, "errors": self.errors, "finished": self.finished}
+
+
+def feed_from_env():
+    """
+    MarketFeed for MARKET_DATA_SOURCE, or None when it is not set.
+    """
+    if not MARKET_DATA_SOURCE:
+        return None
+    return MarketFeed(open_source(MARKET_DATA_SOURCE))
+
+
+def with_market_data(prompt, snapshot: Optional[MarketSnapshot], indicators=None):
+    """
+    Appends the live numbers (and indicators.summary(), if given) to the
+    prompt. The data goes after the fixed instructions so the unchanging
+    prefix stays identical between calls.
+    """
+    if snapshot is None or not snapshot.ready():
+        return prompt
+    extra = indicators.summary() if indicators is not None else ""
+    return (
+        f"{prompt}\n\n{snapshot.summary()}\n" + (f"{extra}\n" if extra else "") + DATA_NOTE
+    )
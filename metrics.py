@@ -0,0 +1,345 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no /metrics endpoint
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Collection is on whenever the endpoint is; METRICS_ENABLED=1 forces it on
+# without serving (e.g. to read render() from a script).
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1" if METRICS_PORT else "0") == "1"
+# Logs one JSON "trace" event per tick with the offset and duration of every stage.
+TRACE_TICKS = os.getenv("TRACE_TICKS") == "1"
+PREFIX = "btrader_"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, float("inf"))
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, float("inf"))
+
+
+class LatencyHistogram:
+    """
+    Cumulative-bucket latency histogram (seconds), safe to share across threads.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def percentile(self, q):
+        """
+        Upper bound of the bucket holding the q-th percentile (0 < q <= 100).
+        """
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = self.count * q / 100
+            seen = 0
+            for bound, n in zip(self.buckets, self.counts):
+                seen += n
+                if seen >= rank:
+                    return bound
+        return self.buckets[-1]
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, total = {}, 0
+            for bound, n in zip(self.buckets, self.counts):
+                total += n
+                cumulative[str(bound)] = total
+            return {"count": self.count, "sum": round(self.sum, 4), "buckets": cumulative}
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def latency_histogram(provider):
+    with _histograms_lock:
+        if provider not in _histograms:
+            _histograms[provider] = LatencyHistogram()
+        return _histograms[provider]
+
+
+def latency_histograms():
+    with _histograms_lock:
+        return dict(_histograms)
+
+
+def latency_report():
+    """
+    Per-provider request count, mean and p50/p90/p99 bucket bounds.
+    """
+    report = {}
+    for name, hist in list(_histograms.items()):
+        report[name] = {
+            "count": hist.count,
+            "mean": round(hist.sum / hist.count, 3) if hist.count else 0.0,
+            "p50": hist.percentile(50),
+            "p90": hist.percentile(90),
+            "p99": hist.percentile(99),
+        }
+    return report
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self):
+        lines = [f"# HELP {PREFIX}{self.name} {self.help}", f"# TYPE {PREFIX}{self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{PREFIX}{self.name}{_labels(key)} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Read at scrape time: fn() returns a number, or a dict mapping label
+    tuples such as (("pool", "idle"),) to numbers, so nothing is updated on
+    the hot path.
+    """
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+
+    def render(self):
+        lines = [f"# HELP {PREFIX}{self.name} {self.help}", f"# TYPE {PREFIX}{self.name} gauge"]
+        try:
+            value = self.fn()
+        except Exception as e:
+            logging.error("Metrics gauge %s Error: %s", self.name, e)
+            return lines
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        for key, number in values:
+            if number is not None:
+                lines.append(f"{PREFIX}{self.name}{_labels(key)} {number}")
+        return lines
+
+
+def _render_histograms(name, help, label, histograms):
+    lines = [f"# HELP {PREFIX}{name} {help}", f"# TYPE {PREFIX}{name} histogram"]
+    for value, hist in sorted(histograms.items()):
+        snap = hist.snapshot()
+        for bound, count in snap["buckets"].items():
+            le = "+Inf" if bound == "inf" else bound
+            lines.append(f'{PREFIX}{name}_bucket{{{label}="{value}",le="{le}"}} {count}')
+        lines.append(f'{PREFIX}{name}_sum{{{label}="{value}"}} {snap["sum"]}')
+        lines.append(f'{PREFIX}{name}_count{{{label}="{value}"}} {snap["count"]}')
+    return lines
+
+
+_counters = {}
+_gauges = {}
+_stages = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name, help=""):
+    with _registry_lock:
+        if name not in _counters:
+            _counters[name] = Counter(name, help)
+        return _counters[name]
+
+
+def gauge(name, help, fn):
+    """
+    Registers (or replaces) a scrape-time gauge.
+    """
+    with _registry_lock:
+        _gauges[name] = Gauge(name, help, fn)
+
+
+def stage_histogram(name):
+    with _registry_lock:
+        if name not in _stages:
+            _stages[name] = LatencyHistogram(STAGE_BUCKETS)
+        return _stages[name]
+
+
+PARSE_FAILURES = counter("parse_failures_total", "Model answers with text but no parseable trade.")
+RETRIES = counter("http_retries_total", "HTTP retries by client and outcome.")
+CLOUDFLARE_HITS = counter("cloudflare_challenges_total", "ChatGPT web prompts that hit a Cloudflare challenge.")
+STRUCTURED_PARSES = counter("structured_parses_total",
+                            "JSON answers validated directly (json) or that fell back to the label parser.")
+SUPPRESSED_ALERTS = counter("suppressed_alerts_total", "Alerts withheld by the trade state tracker.")
+
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans = []
+
+    def add(self, stage, start, duration):
+        self.spans.append({"stage": stage, "offset": round(start - self.start, 4), "duration": round(duration, 4)})
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        stage_histogram(self.name).observe(duration)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(self.name, self.start, duration)
+        return False
+
+
+def stage(name):
+    """
+    Times a block into the stage histogram (and the current trace). A
+    shared no-op context when metrics and tracing are both off.
+    """
+    if not METRICS_ENABLED and not TRACE_TICKS:
+        return nullcontext()
+    return _Stage(name)
+
+
+class _Tick:
+    def __init__(self, name):
+        self.name = name
+        self.trace = None
+        self.token = None
+
+    def __enter__(self):
+        if TRACE_TICKS:
+            self.trace = Trace(self.name)
+            self.token = _current_trace.set(self.trace)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.start
+        if METRICS_ENABLED:
+            stage_histogram(self.name).observe(duration)
+        if self.trace is not None:
+            _current_trace.reset(self.token)
+            logging.info("Trace %s %.3fs", self.name, duration,
+                         extra={"event": "trace", "tick": self.name, "total": round(duration, 4),
+                                "spans": self.trace.spans})
+        return False
+
+
+def traced(name):
+    """
+    Decorator for a scheduled job (sync or async): times the whole tick and,
+    with TRACE_TICKS, collects the stages inside it into one trace event.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with _Tick(name):
+                    return await func(*args, **kwargs)
+        else:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with _Tick(name):
+                    return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render():
+    """
+    All metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for item in list(_counters.values()) + list(_gauges.values()):
+        lines.extend(item.render())
+    lines.extend(_render_histograms("stage_seconds", "Time spent per pipeline stage.", "stage", dict(_stages)))
+    lines.extend(_render_histograms("http_request_seconds", "Provider HTTP request latency.", "client",
+                                    latency_histograms()))
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug("Metrics request: " + format, *args)
+
+
+_server = None
+
+
+def serve(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Serves /metrics from a daemon thread. Returns the server, or None when
+    port is 0.
+    """
+    global _server, METRICS_ENABLED
+    if not port or _server is not None:
+        return _server
+    METRICS_ENABLED = True
+    _server = ThreadingHTTPServer((host, port), _Handler)
+    _server.daemon_threads = True
+    threading.Thread(target=_server.serve_forever, name="metrics", daemon=True).start()
+    logging.info("Metrics endpoint on http://%s:%d/metrics", host, port)
+    return _server
+
+
+def stop():
+    global _server
+    if _server is not None:
+        _server.shutdown()
+        _server.server_close()
+        _server = None
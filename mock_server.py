@@ -0,0 +1,340 @@
+"""
+Local stand-in for the OpenAI and xAI chat completions APIs and the
+Telegram Bot API, with configurable latency, error rates and streaming.
+
+    python mock_server.py --port 8799 --latency 2 --jitter 1 --error-rate 0.05
+
+then point the bot at it:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8799/v1 XAI_BASE_URL=http://127.0.0.1:8799/v1 \
+    TELEGRAM_API_URL=http://127.0.0.1:8799 OPENAI_API_KEY=mock XAI_API_KEY=mock \
+    TELEGRAM_BOT_TOKEN=1:mock CHAT_ID=1 python multi_bot.py
+
+Answers are random but well-formed trades in the label format, or in the
+report_trades tool call when the request carries tools. GET /stats returns
+the request and injected-failure counts.
+"""
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+SPOT = 24600
+
+
+@dataclass
+class MockConfig:
+    latency: float = 1.0  # seconds before a completion starts
+    jitter: float = 0.5  # uniform extra latency, 0..jitter
+    error_rate: float = 0.0  # share of completions answered with HTTP 500
+    rate_limit_rate: float = 0.0  # share answered with HTTP 429
+    timeout_rate: float = 0.0  # share that hang for hang_seconds before answering
+    hang_seconds: float = 120.0
+    malformed_rate: float = 0.0  # share of answers with drifted labels (no parseable trade)
+    stream_chunk_chars: int = 24
+    stream_chunk_delay: float = 0.05
+    telegram_latency: float = 0.05
+    telegram_rate_limit_rate: float = 0.0  # share of sendMessage calls answered with 429 retry_after
+    seed: int = None
+
+
+def random_trade(rng):
+    option_type = rng.choice(("CE", "PE"))
+    strike = SPOT + 50 * rng.randint(-3, 3)
+    entry = round(rng.uniform(60, 180), 1)
+    return {
+        "option_type": option_type,
+        "strike": strike,
+        "entry_low": entry,
+        "entry_high": round(entry + rng.choice((3, 5, 8)), 1),
+        "targets": [round(entry * 1.2, 1), round(entry * 1.4, 1)],
+        "stop_loss": round(entry * 0.8, 1),
+        "confidence": rng.randint(60, 90),
+        "entry_time": "09:45-10:15",
+        "exit_time": "14:00-14:30",
+        "key_factors": "OI build-up at the strike, PCR turning, VWAP reclaim",
+        "reason": "Momentum and OI shift agree.",
+    }
+
+
+def trade_text(trade):
+    return "\n".join([
+        f"Option Type: {trade['option_type']}",
+        f"Strike Price: {trade['strike']}",
+        f"Premium Entry Range: ₹{trade['entry_low']:g}–₹{trade['entry_high']:g}",
+        "Target(s): " + ", ".join(f"₹{t:g}" for t in trade["targets"]),
+        f"Stop Loss: ₹{trade['stop_loss']:g}",
+        f"Ideal Entry Time: {trade['entry_time']}",
+        f"Ideal Exit Time: {trade['exit_time']}",
+        f"Confidence Level: {trade['confidence']}%",
+        f"Key Factors: {trade['key_factors']}",
+        f"Short Reason: {trade['reason']}",
+    ])
+
+
+def malformed_text(trade):
+    # The kind of label drift the parser cannot recover from.
+    return (f"I would look at the {trade['strike']} {trade['option_type']} around {trade['entry_low']:g}, "
+            f"aiming higher with a tight stop. Conviction is moderate.")
+
+
+class MockState:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.counts = {}
+        self.messages = []
+        self.lock = threading.Lock()
+        self.message_id = 0
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def roll(self):
+        with self.lock:
+            return self.rng.random()
+
+    def answer(self):
+        with self.lock:
+            trades = [random_trade(self.rng) for _ in range(self.rng.randint(1, 2))]
+            malformed = self.rng.random() < self.config.malformed_rate
+        return trades, malformed
+
+    def stats(self):
+        with self.lock:
+            return {"counts": dict(self.counts), "telegram_messages": len(self.messages)}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState = None
+
+    def log_message(self, format, *args):
+        logging.debug("Mock request: " + format, *args)
+
+    def _json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. a fan-out cancelled once another provider answered.
+            self.state.count("client_gone")
+
+    def _body(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if not raw:
+            return {}
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(raw)
+        return dict(parse_qsl(raw.decode("utf-8")))
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/stats":
+            self._json(200, self.state.stats())
+        else:
+            self._json(404, {"error": "not found"})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        body = self._body()
+        if path.endswith("/chat/completions"):
+            self._completion(body)
+        elif path.startswith("/bot"):
+            self._telegram(path.rsplit("/", 1)[-1], body)
+        else:
+            self._json(404, {"error": "not found"})
+
+    def _completion(self, body):
+        state, config = self.state, self.state.config
+        state.count("completions")
+        time.sleep(config.latency + state.roll() * config.jitter)
+        roll = state.roll()
+        if roll < config.error_rate:
+            state.count("injected_500")
+            self._json(500, {"error": {"message": "mock server error", "type": "server_error"}})
+            return
+        roll -= config.error_rate
+        if roll < config.rate_limit_rate:
+            state.count("injected_429")
+            self._json(429, {"error": {"message": "mock rate limit", "type": "rate_limit_exceeded"}},
+                       {"Retry-After": "1"})
+            return
+        roll -= config.rate_limit_rate
+        if roll < config.timeout_rate:
+            state.count("injected_hang")
+            time.sleep(config.hang_seconds)
+
+        trades, malformed = state.answer()
+        if malformed:
+            state.count("malformed")
+        model = body.get("model", "mock")
+        tool_call = None
+        if body.get("tools") and not malformed:
+            arguments = json.dumps({"trades": trades})
+            tool_call = {"id": "call_mock", "type": "function",
+                         "function": {"name": body["tools"][0]["function"]["name"], "arguments": arguments}}
+            content = None
+        else:
+            content = malformed_text(trades[0]) if malformed else "\n\n".join(map(trade_text, trades))
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        completion_tokens = len(content or tool_call["function"]["arguments"]) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens, "prompt_tokens_details": {"cached_tokens": 0}}
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            self._stream(model, content or "", usage if include_usage else None)
+            return
+        message = {"role": "assistant", "content": content}
+        if tool_call:
+            message["tool_calls"] = [tool_call]
+        self._json(200, {
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if tool_call else "stop"}],
+            "usage": usage,
+        })
+
+    def _stream(self, model, content, usage=None):
+        config = self.state.config
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        size = max(1, config.stream_chunk_chars)
+        try:
+            for i in range(0, len(content), size):
+                chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model,
+                         "choices": [{"index": 0, "delta": {"content": content[i:i + size]}, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(config.stream_chunk_delay)
+            if usage:
+                chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            self.state.count("stream_aborted")
+
+    def _telegram(self, method, body):
+        state, config = self.state, self.state.config
+        state.count(f"telegram_{method}")
+        time.sleep(config.telegram_latency)
+        if method == "getMe":
+            self._json(200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Mock",
+                                                    "username": "mock_bot"}})
+            return
+        if method != "sendMessage":
+            self._json(200, {"ok": True, "result": True})
+            return
+        if state.roll() < config.telegram_rate_limit_rate:
+            state.count("telegram_429")
+            self._json(429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                             "parameters": {"retry_after": 1}})
+            return
+        with state.lock:
+            state.message_id += 1
+            message_id = state.message_id
+            state.messages.append((time.time(), body.get("chat_id"), body.get("text", "")))
+        chat_id = int(body.get("chat_id", 0))
+        self._json(200, {"ok": True, "result": {
+            "message_id": message_id, "date": int(time.time()), "text": body.get("text", ""),
+            "chat": {"id": chat_id, "type": "group" if chat_id < 0 else "private"},
+        }})
+
+
+class MockServer:
+    """
+    The mock API on a daemon thread; use as a context manager or call
+    start() / stop().
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.state = MockState(config or MockConfig())
+        handler = type("Handler", (_Handler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """
+        Environment variables that point the bot at this server.
+        """
+        return {
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "XAI_BASE_URL": f"{self.url}/v1",
+            "TELEGRAM_API_URL": self.url,
+            "OPENAI_API_KEY": "mock",
+            "XAI_API_KEY": "mock",
+            "TELEGRAM_BOT_TOKEN": "1:mock",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-server", daemon=True)
+        self._thread.start()
+        logging.info("Mock API server on %s", self.url)
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def add_config_arguments(parser):
+    defaults = MockConfig()
+    for name, value in asdict(defaults).items():
+        kind = int if name in ("stream_chunk_chars", "seed") else float
+        parser.add_argument("--" + name.replace("_", "-"), type=kind, default=value)
+
+
+def config_from_args(args):
+    return MockConfig(**{name: getattr(args, name) for name in asdict(MockConfig())})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = MockServer(config_from_args(args), args.host, args.port)
+    print(f"Serving mock OpenAI / xAI / Telegram APIs on {server.url}")
+    for key, value in server.env().items():
+        print(f"  {key}={value}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
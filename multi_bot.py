@@ -0,0 +1,182 @@
+import os
+import logging
+from dotenv import load_dotenv
+
+import async_runtime
+import metrics
+from batch_executor import BatchExecutor, Variant, variant_grid
+from fanout import FanoutEngine, configured_providers
+from indicators import IndicatorEngine
+from log_setup import setup_logging
+from market_data import INDEX_SYMBOL, feed_from_env
+from metrics import latency_report
+from position_monitor import PositionMonitor
+from prescreen import prescreen_from_env
+from prompt_compiler import PromptCompiler, market_slots
+from prompts import prompt_for
+from response_cache import get_cache
+from run_store import get_store
+from scheduler import AsyncScheduler
+from session_clock import get_clock
+from subscriptions import SubscriptionRouter, load_subscriptions
+from telegram_sender import TelegramSender
+from trade_state import STATE_PATH, TradeStateTracker
+from trades import select_highest_confidence
+
+setup_logging()
+
+# Load environment variables
+load_dotenv()
+
+# Config values
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+CHAT_ID = os.getenv("CHAT_ID")
+FANOUT_MODE = os.getenv("FANOUT_MODE", "first")  # "first" or "consensus"
+FANOUT_DEADLINE = float(os.getenv("FANOUT_DEADLINE", "90"))
+# Comma-separated; when set, every tick asks each strategy x expiry variant
+# of the instrument prompt through the batch executor.
+PROMPT_STRATEGIES = [s.strip() for s in os.getenv("PROMPT_STRATEGIES", "").split(",") if s.strip()]
+PROMPT_EXPIRIES = [e.strip() for e in os.getenv("PROMPT_EXPIRIES", "").split(",") if e.strip()]
+
+sender = TelegramSender(TELEGRAM_BOT_TOKEN, default_chat_id=CHAT_ID)
+router = SubscriptionRouter(load_subscriptions(default_chat_id=CHAT_ID), sender)
+market_feed = feed_from_env()
+indicator_engine = IndicatorEngine()
+if market_feed:
+    market_feed.subscribe(indicator_engine.on_tick)
+fanout_providers = configured_providers()
+# Counts tokens for the first provider's model; the prompt is the same for all.
+prompt_compiler = PromptCompiler(fanout_providers[0].model if fanout_providers else "gpt-3.5-turbo")
+# Shared by all pipelines so the concurrency limits hold across instruments.
+batch_executor = BatchExecutor(fanout_providers, deadline=FANOUT_DEADLINE)
+
+
+def select_confirmed(trades):
+    return select_highest_confidence(indicator_engine.confirmed(trades))
+
+
+def state_path(instrument):
+    if not STATE_PATH or instrument == INDEX_SYMBOL:
+        return STATE_PATH
+    root, ext = os.path.splitext(STATE_PATH)
+    return f"{root}.{instrument.lower()}{ext}"
+
+
+class Pipeline:
+    """
+    One instrument's tick: a single fan-out call whose alert is rendered
+    once and routed to all of the instrument's subscribers. The market
+    feed, indicators and rule pre-screen cover the index only; other
+    instruments get the plain prompt and are called on every tick.
+    """
+
+    def __init__(self, instrument):
+        self.instrument = instrument
+        self.prompt = prompt_for(instrument)
+        self.variants = variant_grid([instrument], PROMPT_STRATEGIES, PROMPT_EXPIRIES) \
+            if PROMPT_STRATEGIES or PROMPT_EXPIRIES else []
+        self.live = instrument == INDEX_SYMBOL
+        self.tracker = TradeStateTracker(path=state_path(instrument))
+        self.engine = FanoutEngine(
+            fanout_providers, select=select_confirmed if self.live else select_highest_confidence,
+            deadline=FANOUT_DEADLINE,
+        )
+        # Follow-ups need option ticks, which only the index feed provides.
+        self.monitor = None
+        if self.live and market_feed:
+            self.monitor = PositionMonitor(
+                notify=lambda message, trade: router.deliver(instrument, trade, [message]),
+                on_close=self.tracker.close,
+            )
+            market_feed.subscribe(self.monitor.on_tick)
+        self.prescreen = prescreen_from_env(
+            market_feed.snapshot if market_feed and self.live else None,
+            indicator_engine if self.live else None,
+            providers=[p.name for p in fanout_providers],
+        )
+
+    def with_data(self, prompt):
+        if not self.live:
+            return prompt_compiler.compile(prompt).text
+        slots = market_slots(market_feed.snapshot if market_feed else None, indicator_engine)
+        return prompt_compiler.compile(prompt, slots).text
+
+    @metrics.traced("tick")
+    async def run(self):
+        """
+        One tick. Returns the FanoutResult, or None when the pre-screen skipped it.
+        """
+        logging.info("Running scheduled job for %s...", self.instrument)
+        if not self.prescreen.evaluate().call:
+            return None
+        prompt = self.with_data(self.prompt)
+        with metrics.stage("llm"):
+            if self.variants:
+                batch = await batch_executor.run([Variant(v.key, self.with_data(v.prompt)) for v in self.variants])
+                result = batch.as_fanout_result(self.engine.select)
+            elif FANOUT_MODE == "consensus":
+                result = await self.engine.consensus(prompt)
+            else:
+                result = await self.engine.first_valid(prompt)
+        logging.info("Fan-out %s %s latencies: %s", self.instrument, result.mode, result.latencies)
+
+        alerted = None
+        if result.best_trade:
+            change = self.tracker.observe(result.best_trade)
+            if change.material:
+                alerted = result.best_trade
+                if self.monitor:
+                    self.monitor.track(change, self.instrument)
+            else:
+                logging.info("Suppressed repeat alert for %s %s %s.", self.instrument,
+                             result.best_trade.option_type, result.best_trade.strike)
+            router.deliver_change(self.instrument, change, f"🔔 *{self.instrument} Trade Alert ({result.provider})*")
+        elif self.tracker.observe_empty():
+            router.notify(self.instrument, f"No valid {self.instrument} trade found in any model response.")
+        alert_sources = (result.provider or "").split(", ")
+        for answer in result.answers:
+            owns_alert = answer.provider in alert_sources or alerted in answer.trades
+            prompt_compiler.observe(answer.usage)
+            get_store().record(
+                "multi_bot.py", answer.model, answer.prompt or prompt, answer.raw_response, answer.trades,
+                latency=answer.latency, usage=answer.usage, alerted=alerted if owns_alert else None,
+            )
+        return result
+
+
+pipelines = [Pipeline(instrument) for instrument in router.instruments()]
+
+# Run every 30 seconds (for testing); change to every 15 minutes for production
+scheduler = AsyncScheduler(clock=get_clock())
+for pipeline in pipelines:
+    scheduler.every(30, pipeline.run, name=f"fanout-{pipeline.instrument.lower()}", jitter=1.0)
+
+if __name__ == "__main__":
+    print(f"Running Options Alert Bot for {router.instruments()} with {[p.name for p in fanout_providers]} "
+          f"({FANOUT_MODE})...")
+    metrics.serve()
+    # Pipelines send from the event loop, where the sender cannot start itself.
+    sender.start()
+    if market_feed:
+        market_feed.start()
+    try:
+        async_runtime.run(scheduler.run())
+    except KeyboardInterrupt:
+        print("Stopping NIFTY Options Alert Bot...")
+    finally:
+        logging.info("Scheduler stats: %s", scheduler.stats())
+        logging.info("Provider latency: %s", latency_report())
+        logging.info("Response cache: %s", get_cache().stats())
+        for pipeline in pipelines:
+            logging.info("%s trade state: %s", pipeline.instrument, pipeline.tracker.stats())
+            logging.info("%s pre-screen: %s", pipeline.instrument, pipeline.prescreen.stats())
+            if pipeline.monitor:
+                logging.info("%s positions: %s", pipeline.instrument, pipeline.monitor.stats())
+        logging.info("Subscriptions: %s", router.stats())
+        logging.info("Prompt compiler: %s", prompt_compiler.stats())
+        logging.info("Telegram: %s", sender.stats())
+        if market_feed:
+            market_feed.stop()
+        sender.close()
+        get_store().close()
+        async_runtime.shutdown()
@@ -0,0 +1,308 @@
+"""
+Paper-trades alerted trades against live option ticks.
+
+Every alert the bot sends opens a position. Option ticks for its strike
+move it through entry, targets and stop loss, and the ideal exit time
+closes it. Each step is pushed to Telegram as a follow-up. Replay a
+recorded day against recorded alerts with:
+
+    python position_monitor.py --replay data/replay/nifty_2025-07-03.csv --alerts data/backtest/alerts_sample.jsonl
+"""
+import argparse
+import datetime
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from market_data import INDEX_SYMBOL, Tick
+from scheduler import IST, MARKET_CLOSE
+from trade_parser import Trade
+from trades import format_minutes, format_price
+
+WAITING, OPEN, CLOSED = 0, 1, 2
+
+ENTRY = "entry"
+TARGET = "target"
+STOP = "stop"
+TIME_EXIT = "time_exit"
+EXPIRED = "expired"
+INVALIDATED = "invalidated"
+
+
+@dataclass
+class Position:
+    instrument: str
+    trade: Trade
+    alerted_at: float
+    entry_until: float
+    exit_at: float
+    state: int = WAITING
+    entry_price: Optional[float] = None
+    targets_hit: int = 0
+    last_price: Optional[float] = None
+    exit_reason: str = ""
+
+    @property
+    def key(self):
+        return self.instrument, self.trade.strike, self.trade.option_type
+
+    def label(self):
+        return f"{self.instrument} {self.trade.strike} {self.trade.option_type}"
+
+
+@dataclass
+class Event:
+    kind: str
+    position: Position
+    price: float
+    ts: float
+
+
+def _day_time(ts, minutes, default):
+    day = datetime.datetime.fromtimestamp(ts, IST).replace(hour=0, minute=0, second=0, microsecond=0)
+    if minutes is None:
+        minutes = default.hour * 60 + default.minute
+    return day.timestamp() + minutes * 60
+
+
+def event_message(event: Event):
+    p, price = event.position, format_price(event.price)
+    pnl = f" ({event.price - p.entry_price:+g} pts from ₹{p.entry_price:g})" if p.entry_price is not None else ""
+    if event.kind == ENTRY:
+        return f"✅ {p.label()} entry zone reached at {price}."
+    if event.kind == TARGET:
+        target = p.trade.targets[p.targets_hit - 1]
+        final = " — final target, position closed" if p.state == CLOSED else ""
+        return f"🎯 {p.label()} target {p.targets_hit} {format_price(target)} hit at {price}{pnl}{final}."
+    if event.kind == STOP:
+        return f"🛑 {p.label()} stop loss {format_price(p.trade.stop_loss)} hit at {price}{pnl}."
+    if event.kind == TIME_EXIT:
+        exit_time = format_minutes(p.trade.exit_to) if p.trade.exit_to is not None else "market close"
+        return f"⏰ {p.label()} ideal exit time {exit_time} reached; exit at {price}{pnl}."
+    if event.kind == EXPIRED:
+        return f"⌛ {p.label()} was not triggered in its entry window."
+    return f"❌ {p.label()} closed ({event.kind})."
+
+
+class PositionMonitor:
+    """
+    Open positions indexed by (instrument, strike, option type).
+
+    Their levels are also kept in NumPy columns: entry band, stop, a
+    targets matrix padded with inf, and the entry and exit deadlines. An
+    option tick looks up the rows for its key and evaluates entry, targets
+    and stop for all of them in one pass. Deadlines are checked across
+    every open row at most once per second of tick time. notify(message,
+    trade) receives every follow-up, and on_close(trade) is called when a
+    position ends, so the alert state can drop it. Runs on the market feed
+    thread; open() and close() may be called from any thread.
+    """
+
+    def __init__(self, notify=None, on_close=None, time_check_interval=1.0):
+        self.notify = notify
+        self.on_close = on_close
+        self.time_check_interval = time_check_interval
+        self.positions = []
+        self.events = 0
+        self.closed = {}
+        self._index = {}
+        self._last_time_check = 0.0
+        self._finished = False
+        self._lock = threading.Lock()
+        self._rebuild()
+
+    def open(self, trade: Trade, instrument=INDEX_SYMBOL, now=None):
+        """
+        Tracks an alerted trade. A revision of an open position keeps its
+        fill and targets hit but takes the new levels.
+        """
+        now = now or datetime.datetime.now(IST).timestamp()
+        exit_at = _day_time(now, trade.exit_to, MARKET_CLOSE)
+        entry_until = min(_day_time(now, trade.entry_to, MARKET_CLOSE), exit_at)
+        position = Position(instrument, trade, now, entry_until, exit_at)
+        with self._lock:
+            for existing in self.positions:
+                if existing.key == position.key:
+                    position.state, position.entry_price = existing.state, existing.entry_price
+                    position.targets_hit = min(existing.targets_hit, len(trade.targets))
+                    self.positions.remove(existing)
+                    break
+            self.positions.append(position)
+            self._rebuild()
+        return position
+
+    def close(self, trade: Trade, instrument=INDEX_SYMBOL, reason=INVALIDATED):
+        with self._lock:
+            for row, position in enumerate(self.positions):
+                if position.key == (instrument, trade.strike, trade.option_type):
+                    self._finish(row, reason)
+                    self.positions.remove(position)
+                    self._rebuild()
+                    return position
+        return None
+
+    def track(self, change, instrument=INDEX_SYMBOL):
+        """
+        Applies a trade_state Change: a material alert opens (or revises) its
+        position and closes the ones it invalidated.
+        """
+        if not change.material:
+            return
+        for old in change.invalidated:
+            self.close(old, instrument)
+        self.open(change.trade, instrument)
+
+    def _rebuild(self):
+        # Called with the lock held whenever positions are added or removed.
+        n = len(self.positions)
+        width = max((len(p.trade.targets) for p in self.positions), default=1)
+        self._entry_low = np.array([p.trade.entry_low for p in self.positions], dtype=np.float64)
+        self._entry_high = np.array([p.trade.entry_high for p in self.positions], dtype=np.float64)
+        self._stop = np.array([p.trade.stop_loss for p in self.positions], dtype=np.float64)
+        self._targets = np.full((n, width), np.inf)
+        for row, p in enumerate(self.positions):
+            self._targets[row, :len(p.trade.targets)] = p.trade.targets
+        self._target_count = np.array([len(p.trade.targets) for p in self.positions], dtype=np.int64)
+        self._hits = np.array([p.targets_hit for p in self.positions], dtype=np.int64)
+        self._state = np.array([p.state for p in self.positions], dtype=np.int8)
+        self._entry_until = np.array([p.entry_until for p in self.positions], dtype=np.float64)
+        self._exit_at = np.array([p.exit_at for p in self.positions], dtype=np.float64)
+        index = {}
+        for row, p in enumerate(self.positions):
+            index.setdefault(p.key, []).append(row)
+        self._index = {key: np.array(rows, dtype=np.int64) for key, rows in index.items()}
+
+    def on_tick(self, tick: Tick):
+        events = []
+        with self._lock:
+            if not self.positions:
+                return
+            if tick.option_type:
+                rows = self._index.get((tick.symbol, tick.strike, tick.option_type))
+                if rows is not None:
+                    events.extend(self._evaluate(rows, tick.price, tick.ts))
+                    for row in rows:
+                        self.positions[row].last_price = tick.price
+            if tick.ts - self._last_time_check >= self.time_check_interval:
+                self._last_time_check = tick.ts
+                events.extend(self._check_deadlines(tick.ts))
+            if self._finished:
+                self._finished = False
+                self.positions = [p for p in self.positions if p.state != CLOSED]
+                self._rebuild()
+        for event in events:
+            self._emit(event)
+
+    def _evaluate(self, rows, price, ts):
+        state = self._state[rows]
+        entered = (state == WAITING) & (price >= self._entry_low[rows]) & (price <= self._entry_high[rows]) \
+            & (ts <= self._entry_until[rows])
+        live = (state == OPEN) | entered
+        stopped = live & (price <= self._stop[rows])
+        hits = (price >= self._targets[rows]).sum(axis=1)
+        new_target = live & ~stopped & (hits > self._hits[rows])
+        if not (entered.any() or stopped.any() or new_target.any()):
+            return []
+
+        events = []
+        for i in np.flatnonzero(entered | stopped | new_target):
+            row = rows[i]
+            position = self.positions[row]
+            if entered[i]:
+                position.state = self._state[row] = OPEN
+                position.entry_price = price
+                events.append(Event(ENTRY, position, price, ts))
+            if stopped[i]:
+                self._finish(row, STOP)
+                events.append(Event(STOP, position, price, ts))
+            elif new_target[i]:
+                position.targets_hit = self._hits[row] = int(hits[i])
+                if position.targets_hit >= self._target_count[row]:
+                    self._finish(row, TARGET)
+                events.append(Event(TARGET, position, price, ts))
+        return events
+
+    def _check_deadlines(self, ts):
+        due = ((self._state == OPEN) & (ts >= self._exit_at)) | \
+              ((self._state == WAITING) & (ts > self._entry_until))
+        events = []
+        for row in np.flatnonzero(due):
+            position = self.positions[row]
+            if position.state == OPEN:
+                price = position.last_price if position.last_price is not None else position.entry_price
+                self._finish(row, TIME_EXIT)
+                events.append(Event(TIME_EXIT, position, price, ts))
+            else:
+                self._finish(row, EXPIRED)
+                events.append(Event(EXPIRED, position, position.last_price or 0.0, ts))
+        return events
+
+    def _finish(self, row, reason):
+        # The state column is updated too, so the rest of this tick skips the row.
+        position = self.positions[row]
+        position.state = self._state[row] = CLOSED
+        position.exit_reason = reason
+        self._finished = True
+        self.closed[reason] = self.closed.get(reason, 0) + 1
+        if self.on_close:
+            try:
+                self.on_close(position.trade)
+            except Exception as e:
+                logging.error("Position close callback Error: %s", e)
+
+    def _emit(self, event):
+        self.events += 1
+        message = event_message(event)
+        logging.info("Position %s: %s", event.kind, message,
+                     extra={"event": "position", "kind": event.kind, "strike": event.position.trade.strike,
+                            "option_type": event.position.trade.option_type, "price": event.price})
+        if self.notify:
+            try:
+                self.notify(message, event.position.trade)
+            except Exception as e:
+                logging.error("Position notify Error: %s", e)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": sum(1 for p in self.positions if p.state == OPEN),
+                "waiting": sum(1 for p in self.positions if p.state == WAITING),
+                "events": self.events,
+                "closed": dict(self.closed),
+            }
+
+
+def replay(ticks_path, alerts_path, notify=print):
+    """
+    Drives a monitor from a replay file, opening each alert when the replay
+    reaches its timestamp.
+    """
+    from backtest import load_alerts
+    from market_data import CsvReplaySource, tick_from_row
+
+    alerts = sorted(load_alerts(alerts_path), key=lambda a: a.ts)
+    monitor = PositionMonitor(notify=lambda message, trade: notify(message))
+    pending = 0
+    for row in CsvReplaySource(ticks_path, speed=0).rows():
+        tick = tick_from_row(row)
+        while pending < len(alerts) and alerts[pending].ts <= tick.ts:
+            monitor.open(alerts[pending].trade, now=alerts[pending].ts)
+            pending += 1
+        monitor.on_tick(tick)
+    return monitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--replay", required=True)
+    parser.add_argument("--alerts", required=True)
+    args = parser.parse_args()
+    monitor = replay(args.replay, args.alerts)
+    print(monitor.stats())
+
+
+if __name__ == "__main__":
+    main()
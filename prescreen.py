@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from indicators import IndicatorEngine
+from market_data import MarketSnapshot
+from metrics import latency_histogram
+
+PRESCREEN_CONFIG = os.getenv("PRESCREEN_CONFIG")  # JSON file, see PreScreen.from_config
+PRESCREEN_MIN_SCORE = float(os.getenv("PRESCREEN_MIN_SCORE", "2"))
+# Longest stretch without a model call, so a quiet morning still gets a view.
+PRESCREEN_MAX_SKIP = float(os.getenv("PRESCREEN_MAX_SKIP", "900"))
+# Used for "time saved" until the provider has latency samples.
+DEFAULT_CALL_SECONDS = 20.0
+
+
+@dataclass
+class Rule:
+    name: str
+    check: Callable[[dict], bool]
+    weight: float = 1.0
+
+
+def momentum(rsi_band=(45, 55), macd_min=2.0):
+    low, high = rsi_band
+
+    def check(ctx):
+        rsi, hist = ctx.get("rsi"), ctx.get("macd_hist")
+        return (rsi is not None and not low <= rsi <= high) or (hist is not None and abs(hist) >= macd_min)
+    return check
+
+
+def price_move(min_percent=0.15, window="move_15m"):
+    def check(ctx):
+        move = ctx.get(window)
+        return move is not None and abs(move) >= min_percent
+    return check
+
+
+def oi_shift(min_percent=5.0):
+    def check(ctx):
+        change = ctx.get("max_oi_change")
+        return change is not None and change >= min_percent
+    return check
+
+
+def pcr_extreme(low=0.8, high=1.2):
+    def check(ctx):
+        pcr = ctx.get("pcr")
+        return pcr is not None and not low <= pcr <= high
+    return check
+
+
+def vwap_distance(min_percent=0.2):
+    def check(ctx):
+        distance = ctx.get("vwap_distance")
+        return distance is not None and abs(distance) >= min_percent
+    return check
+
+
+def vix_move(min_percent=3.0):
+    def check(ctx):
+        change = ctx.get("vix_change")
+        return change is not None and abs(change) >= min_percent
+    return check
+
+
+RULE_FACTORIES = {
+    "momentum": momentum,
+    "price_move": price_move,
+    "oi_shift": oi_shift,
+    "pcr_extreme": pcr_extreme,
+    "vix_move": vix_move,
+    "vwap_distance": vwap_distance,
+}
+
+
+def default_rules():
+    return [Rule(name, factory()) for name, factory in RULE_FACTORIES.items()]
+
+
+@dataclass
+class Decision:
+    call: bool
+    score: float
+    passed: List[str] = field(default_factory=list)
+    reason: str = ""
+
+
+class PreScreen:
+    """
+    Deterministic gate in front of the LLM call.
+
+    Each rule looks at the market snapshot and indicator readings. The
+    model is called only when the weights of the passing rules reach
+    min_score. It is also called when there is no market data yet (fail
+    open), and at least once every max_skip_seconds. Skips are counted, and
+    the time saved is estimated from the providers' mean latency.
+    """
+
+    def __init__(self, snapshot: MarketSnapshot, indicators: IndicatorEngine = None, rules=None,
+                 min_score=PRESCREEN_MIN_SCORE, max_skip_seconds=PRESCREEN_MAX_SKIP, providers=()):
+        self.snapshot = snapshot
+        self.indicators = indicators
+        self.rules = rules if rules is not None else default_rules()
+        self.min_score = min_score
+        self.max_skip_seconds = max_skip_seconds
+        self.providers = tuple(providers)
+        self.calls = 0
+        self.skips = 0
+        self.time_saved = 0.0
+        self.last_call = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, path, snapshot, indicators=None, **kwargs):
+        """
+        Loads rules from JSON such as
+        {"min_score": 2, "rules": {"momentum": {"macd_min": 3}, "oi_shift": {"min_percent": 8, "weight": 2}}}
+        where each key names a RULE_FACTORIES entry and the other keys are its arguments.
+        """
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        rules = []
+        for name, params in config.get("rules", {}).items():
+            params = dict(params or {})
+            weight = params.pop("weight", 1.0)
+            rules.append(Rule(name, RULE_FACTORIES[name](**params), weight))
+        kwargs.setdefault("min_score", config.get("min_score", PRESCREEN_MIN_SCORE))
+        kwargs.setdefault("max_skip_seconds", config.get("max_skip_seconds", PRESCREEN_MAX_SKIP))
+        return cls(snapshot, indicators, rules=rules, **kwargs)
+
+    def context(self):
+        ctx = self.snapshot.metrics() if self.snapshot is not None else {}
+        reading = self.indicators.reading() if self.indicators is not None else None
+        if reading:
+            ctx.update(rsi=reading["rsi"], macd_hist=reading["macd_hist"], vwap=reading["vwap"])
+            if reading["vwap"] and reading["close"] is not None:
+                ctx["vwap_distance"] = (reading["close"] - reading["vwap"]) / reading["vwap"] * 100
+        return ctx
+
+    def evaluate(self, now=None):
+        now = now or time.time()
+        ctx = self.context()
+        if not ctx:
+            decision = Decision(True, 0.0, reason="no market data")
+        else:
+            passed = []
+            for rule in self.rules:
+                try:
+                    if rule.check(ctx):
+                        passed.append(rule.name)
+                except Exception as e:
+                    logging.error("Pre-screen rule %s Error: %s", rule.name, e)
+            weights = {rule.name: rule.weight for rule in self.rules}
+            score = sum(weights[name] for name in passed)
+            if score >= self.min_score:
+                decision = Decision(True, score, passed, "confluence")
+            elif self.last_call is None or now - self.last_call >= self.max_skip_seconds:
+                decision = Decision(True, score, passed, "max skip interval")
+            else:
+                decision = Decision(False, score, passed, "no setup")
+        self._record(decision, now)
+        return decision
+
+    def _record(self, decision, now):
+        with self._lock:
+            if decision.call:
+                self.calls += 1
+                self.last_call = now
+            else:
+                self.skips += 1
+                self.time_saved += self.expected_call_seconds()
+        logging.info("Pre-screen %s (score %.1f, %s): %s", "call" if decision.call else "skip",
+                     decision.score, decision.reason, ", ".join(decision.passed) or "-")
+
+    def expected_call_seconds(self):
+        # Providers are asked in parallel, so the wall time is the slowest one.
+        means = []
+        for provider in self.providers:
+            hist = latency_histogram(provider)
+            means.append(hist.sum / hist.count if hist.count else DEFAULT_CALL_SECONDS)
+        return max(means, default=DEFAULT_CALL_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            evaluated = self.calls + self.skips
+            return {
+                "evaluated": evaluated,
+                "calls": self.calls,
+                "skips": self.skips,
+                "call_ratio": round(self.calls / evaluated, 3) if evaluated else None,
+                "skip_ratio": round(self.skips / evaluated, 3) if evaluated else None,
+                "time_saved_s": round(self.time_saved, 1),
+            }
+
+
+def prescreen_from_env(snapshot, indicators=None, providers=()):
+    if PRESCREEN_CONFIG:
+        return PreScreen.from_config(PRESCREEN_CONFIG, snapshot, indicators, providers=providers)
+    return PreScreen(snapshot, indicators, providers=providers)
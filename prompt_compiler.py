@@ -0,0 +1,268 @@
+"""
+Builds each model prompt from fixed instructions plus live data slots.
+
+The instructions go first and never change between calls for a given
+instrument, so together with the system message they form a stable prefix
+that providers can serve from their prompt cache. Slots (market data,
+indicators, ...) follow in a fixed order. When the request would exceed
+the token budget, the lowest-priority slot is shortened to its fallback
+text or dropped, until it fits. Tokens are counted with tiktoken when it is
+installed (pip install tiktoken), else estimated at four characters a token.
+"""
+import functools
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import List
+
+import metrics
+from market_data import DATA_NOTE
+from providers import SYSTEM_PROMPT
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Whole request (system message + prompt); 0 = no limit.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+# USD per million input tokens: (uncached, cached). For the savings report only.
+INPUT_PRICES = {
+    "gpt-3.5-turbo": (0.50, None),
+    "gpt-4": (30.0, None),
+    "gpt-4o": (2.50, 1.25),
+    "gpt-4o-mini": (0.15, 0.075),
+    "grok-3": (3.00, 0.75),
+}
+# Providers only cache prompts at least this long.
+PROMPT_CACHE_MIN_TOKENS = 1024
+FALLBACK_ENCODING = "cl100k_base"
+
+TOKENS_SAVED = metrics.counter("prompt_tokens_saved_total", "Input tokens saved by prompt compaction and budgeting.")
+SLOTS_DROPPED = metrics.counter("prompt_slots_dropped_total", "Prompt slots shortened or dropped to fit the budget.")
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception as e:
+        # Encodings are downloaded on first use; offline hosts estimate instead.
+        logging.error("tiktoken encoding for %s Error: %s", model, e)
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """
+    Tokens in text for model. Cached, so the unchanging instructions are
+    only ever encoded once.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def compact(text):
+    """
+    Trailing spaces, runs of spaces and runs of blank lines removed.
+    """
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+@dataclass(frozen=True)
+class Slot:
+    name: str
+    text: str
+    priority: int = 0  # lower priorities give way first
+    fallback: str = ""  # shorter text tried before dropping the slot
+    required: bool = False
+
+
+@dataclass
+class CompiledPrompt:
+    text: str
+    model: str
+    tokens: int  # system message + prompt
+    prefix_tokens: int
+    baseline_tokens: int  # what the uncompiled prompt would have cost
+    kept: List[str] = field(default_factory=list)
+    shortened: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+
+    @property
+    def saved_tokens(self):
+        return max(0, self.baseline_tokens - self.tokens)
+
+    @property
+    def cacheable(self):
+        return self.prefix_tokens >= PROMPT_CACHE_MIN_TOKENS
+
+    @property
+    def saved_cost(self):
+        """
+        USD saved against the baseline prompt.
+        """
+        return self.saved_tokens * INPUT_PRICES.get(self.model, (0.0, None))[0] / 1e6
+
+    @property
+    def cache_saving(self):
+        """
+        USD the prefix would save if the provider serves it from its cache.
+        """
+        price, cached_price = INPUT_PRICES.get(self.model, (0.0, None))
+        if not self.cacheable or cached_price is None:
+            return 0.0
+        return self.prefix_tokens * (price - cached_price) / 1e6
+
+    def report(self):
+        return {
+            "model": self.model,
+            "tokens": self.tokens,
+            "prefix_tokens": self.prefix_tokens,
+            "saved_tokens": self.saved_tokens,
+            "saved_cost": round(self.saved_cost, 6),
+            "cache_saving": round(self.cache_saving, 6),
+            "shortened": self.shortened,
+            "dropped": self.dropped,
+        }
+
+
+class PromptCompiler:
+    """
+    Compiles instructions and slots for one model ("gpt-4o" or a fanout
+    model name such as "openai:gpt-4o") within budget tokens. A leading
+    sentence that repeats the system message is dropped from the
+    instructions, since the model already has it.
+    """
+
+    def __init__(self, model, budget=PROMPT_TOKEN_BUDGET, system_prompt=SYSTEM_PROMPT, footer=DATA_NOTE):
+        self.model = model.split(":")[-1]
+        self.budget = budget
+        self.system_prompt = system_prompt
+        self.footer = footer  # appended after the slots when any are kept
+        self.calls = 0
+        self.saved_tokens = 0
+        self.saved_cost = 0.0
+        self.over_budget = 0
+        self.cached_tokens = 0
+        self._prefixes = {}
+        self._lock = threading.Lock()
+
+    def count(self, text):
+        return count_tokens(text, self.model)
+
+    def _prefix(self, instructions):
+        text = self._prefixes.get(instructions)
+        if text is None:
+            text = compact(instructions)
+            if self.system_prompt and text.startswith(self.system_prompt):
+                text = text[len(self.system_prompt):].lstrip()
+            self._prefixes[instructions] = text
+        return text
+
+    def _render(self, prefix, texts):
+        body = "\n".join(t for t in texts if t)
+        if not body:
+            return prefix
+        return f"{prefix}\n\n{body}" + (f"\n{self.footer}" if self.footer else "")
+
+    def compile(self, instructions, slots=()) -> CompiledPrompt:
+        slots = [s for s in slots if s.text]
+        system_tokens = self.count(self.system_prompt)
+        baseline = "\n".join([instructions] + [s.text for s in slots] + ([self.footer] if slots and self.footer else []))
+        prefix = self._prefix(instructions)
+        texts = {s.name: compact(s.text) for s in slots}
+        shortened, dropped = [], []
+
+        def total():
+            return system_tokens + self.count(self._render(prefix, [texts[s.name] for s in slots if s.name in texts]))
+
+        tokens = total()
+        # Lowest priority first; a slot with a fallback is shortened once before it is dropped.
+        for slot in sorted((s for s in slots if not s.required), key=lambda s: s.priority):
+            if not self.budget or tokens <= self.budget:
+                break
+            if slot.fallback and slot.name not in shortened:
+                texts[slot.name] = compact(slot.fallback)
+                shortened.append(slot.name)
+                tokens = total()
+                if tokens <= self.budget:
+                    break
+            del texts[slot.name]
+            dropped.append(slot.name)
+            tokens = total()
+        if self.budget and tokens > self.budget:
+            self.over_budget += 1
+            logging.warning("Prompt for %s is %d tokens, over the %d token budget.", self.model, tokens, self.budget)
+
+        compiled = CompiledPrompt(
+            text=self._render(prefix, [texts[s.name] for s in slots if s.name in texts]),
+            model=self.model,
+            tokens=tokens,
+            prefix_tokens=system_tokens + self.count(prefix),
+            baseline_tokens=system_tokens + self.count(baseline),
+            kept=[s.name for s in slots if s.name in texts],
+            shortened=[name for name in shortened if name in texts],
+            dropped=dropped,
+        )
+        with self._lock:
+            self.calls += 1
+            self.saved_tokens += compiled.saved_tokens
+            self.saved_cost += compiled.saved_cost
+        TOKENS_SAVED.inc(compiled.saved_tokens, model=self.model)
+        if shortened or dropped:
+            SLOTS_DROPPED.inc(len(shortened) + len(dropped), model=self.model)
+        logging.info("Prompt for %s: %d tokens, %d saved", self.model, compiled.tokens, compiled.saved_tokens,
+                     extra={"event": "prompt", **compiled.report()})
+        return compiled
+
+    def observe(self, usage):
+        """
+        Adds the prompt tokens a provider reports as served from its cache
+        (providers.capture_usage) to the savings.
+        """
+        cached = (usage or {}).get("cached_tokens") or 0
+        if not cached:
+            return
+        price, cached_price = INPUT_PRICES.get(self.model, (0.0, None))
+        with self._lock:
+            self.cached_tokens += cached
+            if cached_price is not None:
+                self.saved_cost += cached * (price - cached_price) / 1e6
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self.model,
+                "calls": self.calls,
+                "saved_tokens": self.saved_tokens,
+                "cached_tokens": self.cached_tokens,
+                "saved_cost": round(self.saved_cost, 4),
+                "over_budget": self.over_budget,
+                "tokenizer": "tiktoken" if _encoding(self.model) is not None else "estimate",
+            }
+
+
+def market_slots(snapshot, indicators=None) -> List[Slot]:
+    """
+    The live data slots: the market snapshot (falling back to the ATM strike
+    alone) ahead of the indicator summary, which is the first to go.
+    """
+    slots = []
+    if snapshot is not None and snapshot.ready():
+        slots.append(Slot("market", snapshot.summary(), priority=2, fallback=snapshot.summary(strikes_around=0)))
+    if indicators is not None:
+        slots.append(Slot("indicators", indicators.summary(), priority=1))
+    return slots
+
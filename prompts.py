@@ -0,0 +1,46 @@
+import functools
+
+# Prompt shared by the API-backed entry points. Its field labels match
+# trades.extract_trades.
+PROMPT = """Act as a professional NIFTY options trader and market analyst. Based on current market conditions (today’s data), give me the best intraday options trade on NIFTY index. Include only 1–2 high-probability trades.
+For each option trade, include the following:
+1. Option Type (CE or PE)
+2. Strike Price
+3. Premium Entry Range
+4. Target(s)
+5. Stop Loss
+6. Ideal Entry Time
+7. Ideal Exit Time
+8. Confidence Level in % (based on OI, volume, trend, VIX, price action, etc.)
+9. Key Factors (OI analysis, PCR, trend, support/resistance, candle patterns, news flow, etc.)
+10. Short Reason Why this trade setup is good today
+Only include trades with strong confirmation from price action + OI shift + volume + momentum indicators. Prefer same day expiry (if Thursday), and ATM/1 strike ITM trades with good liquidity. Be concise, practical and avoid risky trades."""
+
+
+@functools.lru_cache(maxsize=None)
+def prompt_for(instrument="NIFTY"):
+    """
+    PROMPT for another index (BANKNIFTY, FINNIFTY, ...); only the name changes.
+    """
+    return PROMPT if instrument == "NIFTY" else PROMPT.replace("NIFTY", instrument)
+
+
+# Extra instruction appended per strategy variant (see batch_executor).
+STRATEGY_HINTS = {
+    "trend": "Only suggest trades in the direction of the prevailing intraday trend.",
+    "breakout": "Focus on breakouts or breakdowns from the opening range or key levels, confirmed by volume.",
+    "reversal": "Focus on reversals at strong support or resistance confirmed by OI unwinding.",
+}
+
+
+def variant_prompt(instrument="NIFTY", strategy="", expiry=""):
+    """
+    prompt_for(instrument) narrowed to one strategy and expiry. The additions
+    go after the shared instructions so every variant keeps the same prefix.
+    """
+    parts = [prompt_for(instrument)]
+    if strategy:
+        parts.append(STRATEGY_HINTS.get(strategy, f"Use a {strategy} strategy."))
+    if expiry:
+        parts.append(f"Only use the {expiry} expiry.")
+    return "\n".join(parts)
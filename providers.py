@@ -0,0 +1,295 @@
+import contextvars
+import os
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+import httpx
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from http_client import AsyncHttpClient, HttpClient
+from log_setup import log_request, log_response
+from metrics import latency_histogram
+from trade_parser import TRADE_SCHEMA
+
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+XAI_API_KEY = os.getenv("XAI_API_KEY")
+# Point both at mock_server.py to run without keys or spend.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None = the SDK default
+XAI_BASE_URL = os.getenv("XAI_BASE_URL", "https://api.x.ai/v1").rstrip("/")
+XAI_URL = f"{XAI_BASE_URL}/chat/completions"
+
+OPENAI_MODEL = "gpt-3.5-turbo"  # or "gpt-4"
+GROK_MODEL = "grok-3"
+
+SYSTEM_PROMPT = "Act as a professional NIFTY options trader and market analyst."
+
+# Structured output: the model is made to call report_trades with arguments
+# matching TRADE_SCHEMA, and the JSON arguments are returned as the answer
+# text, which extract_trades validates without the label parser.
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"
+TRADE_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "report_trades",
+        "description": "Report the suggested intraday option trades with their levels.",
+        "parameters": TRADE_SCHEMA,
+    },
+}
+TRADE_TOOL_CHOICE = {"type": "function", "function": {"name": "report_trades"}}
+
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 90.0
+
+_client = None
+_xai_http = None
+_xai_async = None
+_call_info = contextvars.ContextVar("provider_call_info", default=None)
+
+
+@contextmanager
+def capture_usage():
+    """
+    Collects token usage reported by the provider calls made inside the block:
+
+        with capture_usage() as usage:
+            answer = ask_chatgpt(prompt)
+        usage.get("prompt_tokens")
+
+    The dict is shared through a context variable, so it also sees calls
+    made through asyncio.to_thread. Cache hits report nothing.
+    """
+    info = {}
+    token = _call_info.set(info)
+    try:
+        yield info
+    finally:
+        _call_info.reset(token)
+
+
+def _record_usage(prompt_tokens, completion_tokens, cached_tokens=None):
+    info = _call_info.get()
+    if info is not None and prompt_tokens is not None:
+        info["prompt_tokens"] = info.get("prompt_tokens", 0) + prompt_tokens
+        info["completion_tokens"] = info.get("completion_tokens", 0) + (completion_tokens or 0)
+        # Prompt tokens the provider served from its prompt cache.
+        info["cached_tokens"] = info.get("cached_tokens", 0) + (cached_tokens or 0)
+
+
+def _record_openai_usage(usage):
+    # Older SDKs keep prompt_tokens_details as a plain dict.
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = details.get("cached_tokens") if isinstance(details, dict) \
+        else getattr(details, "cached_tokens", None)
+    _record_usage(usage.prompt_tokens, usage.completion_tokens, cached_tokens)
+
+
+def _record_usage_dict(usage):
+    usage = usage or {}
+    _record_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"),
+                  (usage.get("prompt_tokens_details") or {}).get("cached_tokens"))
+
+
+def get_openai_client():
+    global _client
+    if _client is None:
+        _client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            timeout=httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT),
+            max_retries=2,
+        )
+    return _client
+
+
+def get_xai_http():
+    global _xai_http
+    if _xai_http is None:
+        _xai_http = HttpClient("grok", connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT)
+    return _xai_http
+
+
+def get_xai_async():
+    """
+    Must be first called from the event loop that will use it.
+    """
+    global _xai_async
+    if _xai_async is None:
+        _xai_async = AsyncHttpClient("grok", connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT)
+    return _xai_async
+
+
+def _grok_request(prompt, stream=False, structured=False):
+    headers = {
+        "Authorization": f"Bearer {XAI_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "model": GROK_MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    }
+    if stream:
+        payload["stream"] = True
+        payload["stream_options"] = {"include_usage": True}
+    if structured:
+        payload["tools"] = [TRADE_TOOL]
+        payload["tool_choice"] = TRADE_TOOL_CHOICE
+    return headers, payload
+
+
+def _grok_content(response_data):
+    if not response_data or not response_data.get("choices"):
+        raise ValueError("No valid response from Grok")
+    _record_usage_dict(response_data.get("usage"))
+    message = response_data["choices"][0]["message"]
+    for call in message.get("tool_calls") or []:
+        if call.get("function", {}).get("name") == TRADE_TOOL["function"]["name"]:
+            return call["function"]["arguments"].strip()
+    return (message.get("content") or "").strip()
+
+
+def ask_chatgpt(prompt, structured=False):
+    try:
+        log_request("ChatGPT", prompt)
+        start = time.perf_counter()
+        tools = {"tools": [TRADE_TOOL], "tool_choice": TRADE_TOOL_CHOICE} if structured else {}
+        response = get_openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            **tools,
+        )
+        latency_histogram("chatgpt").observe(time.perf_counter() - start)
+        if not response or not response.choices:
+            raise ValueError("No valid response from ChatGPT")
+        if response.usage:
+            _record_openai_usage(response.usage)
+
+        message = response.choices[0].message
+        tool_calls = message.tool_calls or []
+        if tool_calls:
+            chatgpt_response = tool_calls[0].function.arguments.strip()
+        else:
+            chatgpt_response = (message.content or "").strip()
+        log_response("ChatGPT", chatgpt_response)
+        return chatgpt_response
+
+    except Exception as e:
+        logging.error("ChatGPT Error: %s", str(e))
+        return f"ChatGPT Error: {e}"
+
+
+def ask_grok(prompt, structured=False):
+    try:
+        log_request("Grok", prompt)
+        headers, payload = _grok_request(prompt, structured=structured)
+        response = get_xai_http().post(XAI_URL, headers=headers, json=payload)
+        response.raise_for_status()
+        grok_response = _grok_content(response.json())
+        log_response("Grok", grok_response)
+        return grok_response
+
+    except Exception as e:
+        logging.error("Grok Error: %s", str(e))
+        return f"Grok Error: {e}"
+
+
+async def ask_grok_async(prompt, structured=False):
+    """
+    Non-blocking ask_grok for the event loop; cancelling it aborts the request.
+    """
+    try:
+        log_request("Grok", prompt)
+        headers, payload = _grok_request(prompt, structured=structured)
+        response = await get_xai_async().post(XAI_URL, headers=headers, json=payload)
+        response.raise_for_status()
+        grok_response = _grok_content(response.json())
+        log_response("Grok", grok_response)
+        return grok_response
+
+    except Exception as e:
+        logging.error("Grok Error: %s", str(e))
+        return f"Grok Error: {e}"
+
+
+def ask_chatgpt_structured(prompt):
+    return ask_chatgpt(prompt, structured=True)
+
+
+async def ask_grok_structured(prompt):
+    return await ask_grok_async(prompt, structured=True)
+
+
+def stream_chatgpt(prompt):
+    """
+    Yields the ChatGPT completion as text deltas while it is generated.
+    Closing the generator early closes the HTTP stream. Token usage comes
+    in a last chunk, so it is only recorded for streams read to the end.
+    """
+    try:
+        log_request("ChatGPT", prompt, stream=True)
+        stream = get_openai_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        try:
+            with stream:
+                for chunk in stream:
+                    if chunk.usage:
+                        _record_openai_usage(chunk.usage)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        parts.append(chunk.choices[0].delta.content)
+                        yield parts[-1]
+        finally:
+            log_response("ChatGPT", "".join(parts))
+    except Exception as e:
+        logging.error("ChatGPT Error: %s", str(e))
+        yield f"ChatGPT Error: {e}"
+
+
+def stream_grok(prompt):
+    """
+    Yields the Grok completion as text deltas from the server-sent event
+    stream. As with stream_chatgpt, usage is recorded from the last event.
+    """
+    try:
+        log_request("Grok", prompt, stream=True)
+        headers, payload = _grok_request(prompt, stream=True)
+        parts = []
+        try:
+            with get_xai_http().post(XAI_URL, headers=headers, json=payload, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    event = json.loads(data)
+                    if event.get("usage"):
+                        _record_usage_dict(event["usage"])
+                    choices = event.get("choices") or []
+                    delta = choices[0].get("delta", {}).get("content") if choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        finally:
+            log_response("Grok", "".join(parts))
+    except Exception as e:
+        logging.error("Grok Error: %s", str(e))
+        yield f"Grok Error: {e}"
@@ -0,0 +1,317 @@
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+CACHE_BUCKET_SECONDS = int(os.getenv("RESPONSE_CACHE_BUCKET", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")  # e.g. "response_cache.sqlite3"
+
+# Provider wrappers return these strings instead of raising; they must
+# never be served from the cache.
+ERROR_PREFIXES = ("ChatGPT Error:", "Grok Error:", "WebDriver error:", "Error:")
+
+
+def cacheable(response):
+    return bool(response and response.strip()) and not response.startswith(ERROR_PREFIXES)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class DiskStore:
+    """
+    SQLite backing store so cached responses survive a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, expires_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            self._conn.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        return row
+
+    def put(self, key, expires_at, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, value) VALUES (?, ?, ?)",
+                (key, expires_at, value),
+            )
+
+    def delete(self, key):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache for LLM responses keyed by (model, prompt hash, time bucket).
+
+    The bucket is the wall-clock window of bucket_seconds the request falls
+    in, so every tick inside the same market minute (by default) shares one
+    answer and the next minute asks again. Concurrent identical requests are
+    collapsed into a single provider call (single flight). Error strings and
+    empty answers are passed through but never stored. With path set, entries
+    are also written to SQLite and read back after a restart.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, bucket_seconds=CACHE_BUCKET_SECONDS,
+                 max_entries=CACHE_MAX_ENTRIES, path=CACHE_PATH):
+        self.ttl = ttl
+        self.bucket_seconds = bucket_seconds
+        self.max_entries = max_entries
+        self.disk = DiskStore(path) if path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._async_flights = {}
+        self._stream_flights = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def key(self, model, prompt, now=None):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:32]
+        bucket = int((now or time.time()) // self.bucket_seconds) if self.bucket_seconds else 0
+        return f"{model}:{digest}:{bucket}"
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        if self.disk:
+            row = self.disk.get(key)
+            if row and row[0] > now:
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.hits += 1
+                return row[1]
+        return None
+
+    def _remember(self, key, expires_at, value):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key, value):
+        if self.ttl <= 0 or not cacheable(value):
+            return
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, value)
+        if self.disk:
+            try:
+                self.disk.put(key, expires_at, value)
+            except sqlite3.Error as e:
+                logging.error("Response cache write Error: %s", e)
+
+    def get_or_call(self, model, prompt, func):
+        """
+        Returns the cached answer or calls func(prompt) once for all threads
+        asking the same question at the same time.
+        """
+        key = self.key(model, prompt)
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func(prompt)
+            self.put(key, flight.result)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    async def get_or_call_async(self, model, prompt, func):
+        """
+        Event-loop variant of get_or_call for coroutine providers.
+        """
+        key = self.key(model, prompt)
+        value = self.get(key)
+        if value is not None:
+            return value
+        pending = self._async_flights.get(key)
+        if pending is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(pending)
+        with self._lock:
+            self.misses += 1
+        future = self._async_flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await func(prompt)
+            self.put(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when no one else is waiting
+            raise
+        finally:
+            self._async_flights.pop(key, None)
+
+    def stream(self, model, prompt, stream_func):
+        """
+        Caches a streaming provider. A hit yields the whole answer as one
+        chunk; a miss passes the deltas through and stores the answer only
+        if the stream ran to the end (a caller that stops early on an
+        early alert leaves nothing half-written in the cache). Concurrent
+        identical streams wait for the first one and replay its answer as
+        one chunk, or stream from the provider themselves if it failed or
+        was stopped early.
+        """
+        key = self.key(model, prompt)
+        value = self.get(key)
+        if value is not None:
+            yield value
+            return
+        with self._lock:
+            flight = self._stream_flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._stream_flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            flight.done.wait()
+            if flight.result is not None:
+                yield flight.result
+                return
+            with self._lock:
+                self.misses += 1
+            yield from self._stream_through(key, prompt, stream_func)
+            return
+        try:
+            flight.result = yield from self._stream_through(key, prompt, stream_func)
+        finally:
+            with self._lock:
+                self._stream_flights.pop(key, None)
+            flight.done.set()
+
+    def _stream_through(self, key, prompt, stream_func):
+        # Yields the provider's deltas and returns the stored answer, or
+        # None when the stream failed.
+        parts = []
+        failed = False
+        upstream = stream_func(prompt)
+        try:
+            for delta in upstream:
+                parts.append(delta)
+                failed = failed or delta.startswith(ERROR_PREFIXES)
+                yield delta
+        finally:
+            upstream.close()
+        value = "".join(parts)
+        if failed or not cacheable(value):
+            return None
+        self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        if self.disk:
+            self.disk.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+
+def cached(func, model, cache=None):
+    """
+    Wraps a provider call (sync, async or streaming generator) with the shared cache.
+    """
+    if asyncio.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(prompt):
+            return await (cache or get_cache()).get_or_call_async(model, prompt, func)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(prompt):
+        return (cache or get_cache()).get_or_call(model, prompt, func)
+    return wrapper
+
+
+def cached_stream(stream_func, model, cache=None):
+    @functools.wraps(stream_func)
+    def wrapper(prompt):
+        return (cache or get_cache()).stream(model, prompt, stream_func)
+    return wrapper
@@ -0,0 +1,161 @@
+import time
+
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.common.by import By
+
+RESPONSE_SELECTOR = "div.markdown.prose"
+STREAMING_SELECTOR = 'button[data-testid="stop-button"], button[aria-label="Stop streaming"]'
+CLOUDFLARE_SELECTOR = (
+    'iframe[src*="challenges.cloudflare.com"], #challenge-form, #challenge-running, '
+    '#cf-challenge-running, input[name="cf-turnstile-response"]'
+)
+
+# Installed into the page before the prompt is sent. A MutationObserver
+# tracks the newest answer element, queues text deltas and flags the answer
+# as done once the stop button is gone and the text has been quiet for
+# quietMs. A pending long-poll (window.__btrader.waiter) is woken on every
+# change so Python sees deltas as they happen.
+_INSTALL_JS = """
+const answersBefore = arguments[0], quietMs = arguments[1];
+const responseSel = arguments[2], streamingSel = arguments[3], cloudflareSel = arguments[4];
+if (window.__btrader && window.__btrader.observer) { window.__btrader.observer.disconnect(); }
+const s = window.__btrader = {
+  deltas: [], text: "", started: false, streaming: false, done: false, cloudflare: false,
+  waiter: null, observer: null, quietTimer: null,
+};
+function wake() {
+  if (s.waiter) { const w = s.waiter; s.waiter = null; w(); }
+}
+function latest() {
+  const all = document.querySelectorAll(responseSel);
+  return all.length > answersBefore ? all[all.length - 1] : null;
+}
+function finishIfQuiet() {
+  if (s.started && !document.querySelector(streamingSel) && s.text.trim()) {
+    s.done = true;
+    s.observer.disconnect();
+    wake();
+  }
+}
+function check() {
+  const cloudflare = !!document.querySelector(cloudflareSel);
+  let changed = cloudflare !== s.cloudflare;
+  s.cloudflare = cloudflare;
+  const streaming = !!document.querySelector(streamingSel);
+  let restart = streaming !== s.streaming;
+  s.streaming = streaming;
+  const el = latest();
+  if (el) {
+    const t = el.innerText;
+    if (t !== s.text) {
+      s.deltas.push(t.startsWith(s.text) ? {append: t.slice(s.text.length)} : {reset: t});
+      s.text = t;
+      s.started = true;
+      changed = restart = true;
+    }
+  }
+  // Only answer text and the stop button restart the quiet timer, so
+  // unrelated page animations cannot hold the answer open.
+  if (restart) {
+    clearTimeout(s.quietTimer);
+    s.quietTimer = setTimeout(finishIfQuiet, quietMs);
+  }
+  if (changed) { wake(); }
+}
+s.observer = new MutationObserver(check);
+s.observer.observe(document.body, {childList: true, subtree: true, characterData: true, attributes: true});
+check();
+"""
+
+_POLL_JS = """
+const done = arguments[arguments.length - 1], waitMs = arguments[0];
+const s = window.__btrader;
+if (!s) { return done({missing: true}); }
+function flush() {
+  done({deltas: s.deltas.splice(0), done: s.done, cloudflare: s.cloudflare});
+}
+if (s.deltas.length || s.done || s.cloudflare) { return flush(); }
+s.waiter = flush;
+setTimeout(() => { if (s.waiter === flush) { s.waiter = null; flush(); } }, waitMs);
+"""
+
+
+def cloudflare_challenge(driver):
+    """
+    Targeted check for a Cloudflare challenge widget instead of scanning page_source.
+    """
+    return bool(driver.find_elements(By.CSS_SELECTOR, CLOUDFLARE_SELECTOR))
+
+
+def count_answers(driver):
+    return len(driver.find_elements(By.CSS_SELECTOR, RESPONSE_SELECTOR))
+
+
+class ResponseDetector:
+    """
+    Event-driven completion detection for a streamed ChatGPT answer.
+
+    install() must run before the prompt is sent. wait() then long-polls the
+    page: each poll returns as soon as the observer has new text or the
+    answer is done, so completion is seen within about quiet_ms of the last
+    change instead of after several fixed sleeps.
+    """
+
+    def __init__(self, driver, answers_before, quiet_ms=1200, poll_ms=10000):
+        self.driver = driver
+        self.answers_before = answers_before
+        self.quiet_ms = quiet_ms
+        self.poll_ms = poll_ms
+        self.text = ""
+        self.cloudflare_hits = 0
+
+    def install(self):
+        # A fresh observer starts from empty text and sends the whole answer
+        # again, so what was collected before it is dropped rather than
+        # doubled.
+        self.text = ""
+        self.driver.execute_script(
+            _INSTALL_JS, self.answers_before, self.quiet_ms,
+            RESPONSE_SELECTOR, STREAMING_SELECTOR, CLOUDFLARE_SELECTOR,
+        )
+
+    def poll(self):
+        self.driver.set_script_timeout(self.poll_ms / 1000 + 5)
+        result = self.driver.execute_async_script(_POLL_JS, self.poll_ms)
+        if result.get("missing"):
+            # The page navigated (e.g. after a challenge); observe it again.
+            self.install()
+            return [], False, False
+        deltas = []
+        for delta in result["deltas"]:
+            if "reset" in delta:
+                self.text = delta["reset"]
+                deltas.append(delta["reset"])
+            else:
+                self.text += delta["append"]
+                deltas.append(delta["append"])
+        return deltas, result["done"], result["cloudflare"]
+
+    def wait(self, timeout=300, on_delta=None, on_cloudflare=None):
+        """
+        Blocks until the answer is done or timeout expires and returns its text.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                deltas, done, cloudflare = self.poll()
+            except (JavascriptException, TimeoutException):
+                self.install()
+                continue
+            if on_delta:
+                for delta in deltas:
+                    on_delta(delta)
+            if cloudflare:
+                self.cloudflare_hits += 1
+                if on_cloudflare:
+                    on_cloudflare()
+                time.sleep(2)
+                continue
+            if done:
+                break
+        return self.text.strip()
@@ -0,0 +1,264 @@
+import datetime
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import metrics
+from log_setup import prompt_hash
+from response_cache import ERROR_PREFIXES
+from scheduler import IST
+from trade_parser import Trade
+
+RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", "runs.sqlite3")
+RUN_RETENTION_DAYS = int(os.getenv("RUN_RETENTION_DAYS", "180"))
+# Raw responses are the bulk of the file; after this many days only the
+# parsed trades and metrics are kept.
+RUN_KEEP_RAW_DAYS = int(os.getenv("RUN_KEEP_RAW_DAYS", "30"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    first_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    source TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_hash TEXT NOT NULL,
+    latency REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    trade_count INTEGER NOT NULL,
+    error TEXT,
+    raw_response TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_day ON runs (day);
+CREATE INDEX IF NOT EXISTS runs_model_day ON runs (model, day);
+CREATE TABLE IF NOT EXISTS trades (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    model TEXT NOT NULL,
+    option_type TEXT NOT NULL,
+    strike INTEGER NOT NULL,
+    entry_low REAL NOT NULL,
+    entry_high REAL NOT NULL,
+    targets TEXT NOT NULL,
+    stop_loss REAL NOT NULL,
+    confidence INTEGER NOT NULL,
+    entry_from INTEGER,
+    entry_to INTEGER,
+    exit_from INTEGER,
+    exit_to INTEGER,
+    key_factors TEXT,
+    reason TEXT,
+    alerted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS trades_day ON trades (day);
+CREATE INDEX IF NOT EXISTS trades_model_day ON trades (model, day);
+CREATE INDEX IF NOT EXISTS trades_strike ON trades (strike, option_type);
+"""
+
+
+@dataclass
+class RunRecord:
+    ts: float
+    source: str
+    model: str
+    prompt: str
+    raw_response: str
+    trades: List[Trade] = field(default_factory=list)
+    latency: Optional[float] = None
+    usage: dict = field(default_factory=dict)
+    alerted: Optional[Trade] = None
+
+
+class RunStore:
+    """
+    Append-only SQLite store (WAL mode) with one row per model answer.
+
+    record() only enqueues; a writer thread commits in batches of up to
+    batch_size rows or every flush_interval seconds, so the alert path
+    never waits on disk. Prompts are stored once per distinct text and
+    referenced by hash. Parsed trades go to their own table with indexes
+    on day, model and strike for analysis and backtests. apply_retention()
+    drops runs older than retention_days and the raw text of runs older
+    than keep_raw_days; compact() also checkpoints the WAL and vacuums.
+    """
+
+    def __init__(self, path=RUN_STORE_PATH, batch_size=50, flush_interval=2.0,
+                 retention_days=RUN_RETENTION_DAYS, keep_raw_days=RUN_KEEP_RAW_DAYS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_days = retention_days
+        self.keep_raw_days = keep_raw_days
+        self.written = 0
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._known_prompts = set()
+        self._conn = self._connect()
+        self._db_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._writer, name="run-store", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def record(self, source, model, prompt, raw_response, trades=(), latency=None,
+               usage=None, alerted=None, ts=None):
+        """
+        Queues one model answer for writing. Never blocks on the database.
+        """
+        self._queue.put(RunRecord(
+            ts=ts or time.time(), source=source, model=model, prompt=prompt,
+            raw_response=raw_response or "", trades=list(trades), latency=latency,
+            usage=dict(usage or {}), alerted=alerted,
+        ))
+
+    def _writer(self):
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            batch, taken = [], 1
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    taken += 1
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            for _ in range(taken):
+                self._queue.task_done()
+
+    def _write(self, batch):
+        new_prompts = set()
+        try:
+            with self._db_lock, self._conn:
+                for record in batch:
+                    digest = prompt_hash(record.prompt)
+                    if digest not in self._known_prompts and digest not in new_prompts:
+                        self._conn.execute(
+                            "INSERT OR IGNORE INTO prompts (hash, text, first_seen) VALUES (?, ?, ?)",
+                            (digest, record.prompt, record.ts),
+                        )
+                        new_prompts.add(digest)
+                    day = datetime.datetime.fromtimestamp(record.ts, IST).date().isoformat()
+                    error = record.raw_response if record.raw_response.startswith(ERROR_PREFIXES) else None
+                    cursor = self._conn.execute(
+                        "INSERT INTO runs (ts, day, source, model, prompt_hash, latency, prompt_tokens, "
+                        "completion_tokens, trade_count, error, raw_response) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (record.ts, day, record.source, record.model, digest, record.latency,
+                         record.usage.get("prompt_tokens"), record.usage.get("completion_tokens"),
+                         len(record.trades), error, None if error else record.raw_response),
+                    )
+                    alerted = (record.alerted.option_type, record.alerted.strike) if record.alerted else None
+                    self._conn.executemany(
+                        "INSERT INTO trades (run_id, day, model, option_type, strike, entry_low, entry_high, "
+                        "targets, stop_loss, confidence, entry_from, entry_to, exit_from, exit_to, "
+                        "key_factors, reason, alerted) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(cursor.lastrowid, day, record.model, t.option_type, t.strike, t.entry_low,
+                          t.entry_high, json.dumps(t.targets), t.stop_loss, t.confidence, t.entry_from,
+                          t.entry_to, t.exit_from, t.exit_to, t.key_factors, t.reason,
+                          int((t.option_type, t.strike) == alerted)) for t in record.trades],
+                    )
+            # Only prompts whose insert was committed; after a rollback they are written again.
+            self._known_prompts |= new_prompts
+            self.written += len(batch)
+        except sqlite3.Error as e:
+            self.errors += len(batch)
+            logging.error("Run store write Error: %s", e)
+
+    def flush(self, timeout=10):
+        """
+        Blocks until everything queued so far has been written.
+        """
+        done = threading.Event()
+        waiter = threading.Thread(target=lambda: (self._queue.join(), done.set()), daemon=True)
+        waiter.start()
+        return done.wait(timeout)
+
+    def close(self, timeout=10):
+        self._queue.put(None)
+        self._thread.join(timeout)
+        with self._db_lock:
+            self._conn.close()
+
+    def query(self, sql, params=()):
+        with self._db_lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def trades(self, day=None, model=None, strike=None, limit=1000):
+        clauses, params = [], []
+        for column, value in (("day", day), ("model", model), ("strike", strike)):
+            if value is not None:
+                clauses.append(f"t.{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.query(
+            "SELECT r.ts, t.model, p.hash, t.option_type, t.strike, t.entry_low, t.entry_high, t.targets, "
+            "t.stop_loss, t.confidence, t.entry_from, t.entry_to, t.exit_from, t.exit_to, t.alerted "
+            "FROM trades t JOIN runs r ON r.id = t.run_id JOIN prompts p ON p.hash = r.prompt_hash "
+            f"{where} ORDER BY r.ts LIMIT ?",
+            (*params, limit),
+        )
+
+    def apply_retention(self, now=None):
+        now = now or time.time()
+        drop_before = now - self.retention_days * 86400
+        strip_before = now - self.keep_raw_days * 86400
+        with self._db_lock, self._conn:
+            dropped = self._conn.execute("DELETE FROM runs WHERE ts < ?", (drop_before,)).rowcount
+            stripped = self._conn.execute(
+                "UPDATE runs SET raw_response = NULL WHERE ts < ? AND raw_response IS NOT NULL", (strip_before,)
+            ).rowcount
+            self._conn.execute(
+                "DELETE FROM prompts WHERE hash NOT IN (SELECT DISTINCT prompt_hash FROM runs)"
+            )
+            self._known_prompts.clear()
+        return {"dropped_runs": dropped, "stripped_raw": stripped}
+
+    def compact(self):
+        result = self.apply_retention()
+        with self._db_lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+        return result
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "written": self.written, "errors": self.errors}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RunStore()
+            metrics.gauge("run_store_queue_depth", "Records waiting for the run store writer.",
+                          _store._queue.qsize)
+        return _store
@@ -0,0 +1,193 @@
+import asyncio
+import datetime
+import logging
+import random
+from dataclasses import dataclass, field
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30), "IST")
+MARKET_OPEN = datetime.time(9, 15)
+MARKET_CLOSE = datetime.time(15, 30)
+# Longest single sleep while waiting for the next session, so a suspended
+# host or a changed system clock is noticed within the hour.
+MAX_CLOSED_SLEEP = 3600.0
+
+
+@dataclass
+class Job:
+    name: str
+    func: object
+    interval: float
+    jitter: float = 0.0
+    market_hours_only: bool = True
+    allow_overlap: bool = False
+    # Counters
+    ticks: int = 0
+    runs: int = 0
+    errors: int = 0
+    missed_ticks: int = 0
+    overlap_skips: int = 0
+    closed_skips: int = 0
+    closed_sleeps: int = 0
+    closed_seconds: float = 0.0
+    last_lag: float = 0.0
+    max_lag: float = 0.0
+    total_lag: float = 0.0
+    running: int = field(default=0, repr=False)
+
+    def stats(self):
+        return {
+            "ticks": self.ticks,
+            "runs": self.runs,
+            "errors": self.errors,
+            "missed_ticks": self.missed_ticks,
+            "overlap_skips": self.overlap_skips,
+            "closed_skips": self.closed_skips,
+            "closed_sleeps": self.closed_sleeps,
+            "closed_seconds": round(self.closed_seconds),
+            "last_lag": round(self.last_lag, 4),
+            "max_lag": round(self.max_lag, 4),
+            "avg_lag": round(self.total_lag / self.ticks, 4) if self.ticks else 0.0,
+            "running": self.running,
+        }
+
+
+class AsyncScheduler:
+    """
+    asyncio replacement for the schedule.run_pending() / time.sleep(1) loop.
+
+    Each job gets its own timer task, so a slow LLM call only delays its own
+    job. Synchronous job functions run in the default thread pool; coroutine
+    functions are awaited on the loop. A tick that arrives while the previous
+    run of the same job is still in flight is counted as an overlap skip
+    unless the job allows overlap, and ticks lost to a stalled loop are
+    counted as missed.
+
+    With a session clock (session_clock.SessionClock), market-hours jobs
+    sleep straight through to the next session instead of waking every
+    interval overnight, and special sessions are honoured.
+    """
+
+    def __init__(self, is_market_closed=None, market_open=MARKET_OPEN,
+                 market_close=MARKET_CLOSE, max_concurrent_jobs=4, clock=None):
+        self.is_market_closed = is_market_closed
+        self.clock = clock
+        self.market_open = market_open
+        self.market_close = market_close
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.jobs = []
+        self._semaphore = None
+        self._stopping = None
+        self._inflight = set()
+
+    def every(self, seconds, func, name=None, jitter=0.0, market_hours_only=True, allow_overlap=False):
+        job = Job(
+            name=name or getattr(func, "__name__", "job"),
+            func=func,
+            interval=float(seconds),
+            jitter=jitter,
+            market_hours_only=market_hours_only,
+            allow_overlap=allow_overlap,
+        )
+        self.jobs.append(job)
+        return job
+
+    def in_market_hours(self, now=None):
+        if self.clock is not None:
+            return self.clock.is_open(now)
+        now = now or datetime.datetime.now(IST)
+        if self.is_market_closed is not None and self.is_market_closed():
+            return False
+        return self.market_open <= now.time() <= self.market_close
+
+    def stats(self):
+        return {job.name: job.stats() for job in self.jobs}
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self):
+        """
+        Runs every registered job until stop() is called.
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrent_jobs)
+        self._stopping = asyncio.Event()
+        timers = [asyncio.create_task(self._timer(job), name=f"timer-{job.name}") for job in self.jobs]
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in timers:
+                task.cancel()
+            await asyncio.gather(*timers, return_exceptions=True)
+            if self._inflight:
+                await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    async def _timer(self, job):
+        loop = asyncio.get_running_loop()
+        next_run = loop.time()
+        while True:
+            if job.market_hours_only and self.clock is not None:
+                wait = self.clock.seconds_until_open()
+                if wait is None or wait > 0:
+                    await self._sleep_until_open(job, wait)
+                    next_run = loop.time()
+
+            target = next_run + (random.uniform(0, job.jitter) if job.jitter else 0.0)
+            delay = target - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            now = loop.time()
+            lag = max(0.0, now - target)
+            job.ticks += 1
+            job.last_lag = lag
+            job.max_lag = max(job.max_lag, lag)
+            job.total_lag += lag
+
+            # Ticks that fell entirely inside a stall are lost, not replayed.
+            behind = int(lag // job.interval)
+            if behind:
+                job.missed_ticks += behind
+                logging.warning("Job %s is %.2fs late, %d tick(s) missed.", job.name, lag, behind)
+            next_run += (behind + 1) * job.interval
+
+            if job.market_hours_only and not self.in_market_hours():
+                job.closed_skips += 1
+                continue
+            if job.running and not job.allow_overlap:
+                job.overlap_skips += 1
+                job.missed_ticks += 1
+                logging.warning("Job %s still running, skipping tick.", job.name)
+                continue
+
+            task = asyncio.create_task(self._execute(job), name=f"run-{job.name}")
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _sleep_until_open(self, job, wait):
+        job.closed_sleeps += 1
+        if wait is not None:
+            logging.info("Job %s sleeping %.0fs until the next session.", job.name, wait)
+        while wait is None or wait > 0:
+            if wait is None:
+                logging.error("Job %s: no session left in the exchange calendar.", job.name)
+                wait = MAX_CLOSED_SLEEP
+            chunk = min(wait, MAX_CLOSED_SLEEP)
+            await asyncio.sleep(chunk)
+            job.closed_seconds += chunk
+            wait = self.clock.seconds_until_open()
+
+    async def _execute(self, job):
+        job.running += 1
+        try:
+            async with self._semaphore:
+                if asyncio.iscoroutinefunction(job.func):
+                    await job.func()
+                else:
+                    await asyncio.get_running_loop().run_in_executor(None, job.func)
+            job.runs += 1
+        except Exception as e:
+            job.errors += 1
+            logging.error("Job %s failed: %s", job.name, e)
+        finally:
+            job.running -= 1
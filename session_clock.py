@@ -0,0 +1,268 @@
+"""
+Exchange calendar and session clock.
+
+The calendar (holidays, special sessions such as Muhurat trading, and the
+weekly expiry weekday over time) is read once from NSE_CALENDAR_PATH and
+expanded into per-day tables, so "is the market open", "next open", "time
+to close" and "next expiry" are dictionary lookups rather than set checks
+and date arithmetic on every call.
+"""
+import datetime
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from scheduler import IST, MARKET_CLOSE, MARKET_OPEN
+
+NSE_CALENDAR_PATH = os.getenv(
+    "NSE_CALENDAR_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "nse_calendar.json")
+)
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+ONE_DAY = datetime.timedelta(days=1)
+
+
+@dataclass(frozen=True)
+class Session:
+    day: datetime.date
+    open: float  # epoch seconds
+    close: float
+    name: str = ""  # set for special sessions
+
+    @property
+    def special(self):
+        return bool(self.name)
+
+    def opens_at(self):
+        return datetime.datetime.fromtimestamp(self.open, IST)
+
+    def closes_at(self):
+        return datetime.datetime.fromtimestamp(self.close, IST)
+
+
+def _time(value, default):
+    if not value:
+        return default
+    hour, minute = value.split(":")
+    return datetime.time(int(hour), int(minute))
+
+
+def _epoch(day, at):
+    return datetime.datetime.combine(day, at, IST).timestamp()
+
+
+def _now(now):
+    if now is None:
+        return datetime.datetime.now(IST)
+    if isinstance(now, (int, float)):
+        return datetime.datetime.fromtimestamp(now, IST)
+    return now.astimezone(IST) if now.tzinfo else now.replace(tzinfo=IST)
+
+
+class SessionClock:
+    """
+    Trading sessions for every day of the years the calendar covers. Days
+    outside that range fall back to plain weekdays at regular hours (with
+    a warning), which is what the scripts did before the calendar existed.
+    """
+
+    def __init__(self, calendar):
+        regular = calendar.get("regular_session", {})
+        self.open_time = _time(regular.get("open"), MARKET_OPEN)
+        self.close_time = _time(regular.get("close"), MARKET_CLOSE)
+        holidays = calendar.get("holidays", {})
+        self.holidays = {datetime.date.fromisoformat(d) for days in holidays.values() for d in days}
+        years = sorted(int(year) for year in holidays) or [datetime.date.today().year]
+        self.first_day = datetime.date(years[0], 1, 1)
+        self.last_day = datetime.date(years[-1], 12, 31)
+
+        specials = {}
+        for entry in calendar.get("special_sessions", []):
+            day = datetime.date.fromisoformat(entry["date"])
+            specials[day] = Session(day, _epoch(day, _time(entry.get("open"), self.open_time)),
+                                    _epoch(day, _time(entry.get("close"), self.close_time)),
+                                    entry.get("name", "special session"))
+        self.expiry_rules = sorted(
+            (datetime.date.fromisoformat(rule["from"]), WEEKDAYS.index(rule["weekday"].lower()))
+            for rule in calendar.get("weekly_expiry", [])
+        )
+
+        self.sessions = {}
+        day = self.first_day
+        while day <= self.last_day:
+            if day in specials:
+                self.sessions[day] = specials[day]
+            elif day.weekday() < 5 and day not in self.holidays:
+                self.sessions[day] = self._regular(day)
+            day += ONE_DAY
+
+        # Walk backwards once so the next session and next expiry on or after
+        # any covered day are single lookups.
+        self.expiries = self._expiries()
+        self._next_session = {}
+        self._next_expiry = {}
+        following, expiry = None, None
+        day = self.last_day
+        while day >= self.first_day:
+            following = self.sessions.get(day, following)
+            expiry = day if day in self.expiries else expiry
+            self._next_session[day] = following
+            self._next_expiry[day] = expiry
+            day -= ONE_DAY
+        self._warned = False
+
+    @classmethod
+    def load(cls, path=NSE_CALENDAR_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _regular(self, day):
+        return Session(day, _epoch(day, self.open_time), _epoch(day, self.close_time))
+
+    def _is_regular_day(self, day):
+        session = self.sessions.get(day)
+        return session is not None and not session.special
+
+    def _expiries(self):
+        """
+        The weekly expiry weekday in force for each week; an expiry that falls
+        on a holiday moves to the previous regular trading day.
+        """
+        expiries = set()
+        if not self.expiry_rules:
+            return expiries
+        day = self.first_day - datetime.timedelta(days=self.first_day.weekday())
+        while day <= self.last_day:
+            weekday = None
+            for start, rule_weekday in self.expiry_rules:
+                if day + datetime.timedelta(days=rule_weekday) >= start:
+                    weekday = rule_weekday
+            if weekday is not None:
+                expiry = day + datetime.timedelta(days=weekday)
+                while expiry >= day and not self._is_regular_day(expiry):
+                    expiry -= ONE_DAY
+                if expiry >= day:
+                    expiries.add(expiry)
+            day += datetime.timedelta(days=7)
+        return expiries
+
+    def _covered(self, day):
+        if self.first_day <= day <= self.last_day:
+            return True
+        if not self._warned:
+            self._warned = True
+            logging.warning("Exchange calendar covers %s to %s; treating %s as a plain weekday calendar.",
+                            self.first_day, self.last_day, day)
+        return False
+
+    def session(self, day=None) -> Optional[Session]:
+        """
+        The session held on day (a date, or today), or None if the market is shut.
+        """
+        day = day or _now(None).date()
+        if self._covered(day):
+            return self.sessions.get(day)
+        return self._regular(day) if day.weekday() < 5 else None
+
+    def is_trading_day(self, day=None):
+        return self.session(day) is not None
+
+    def special_session(self, day=None):
+        session = self.session(day)
+        return session.name if session is not None and session.special else None
+
+    def is_open(self, now=None):
+        now = _now(now)
+        session = self.session(now.date())
+        return session is not None and session.open <= now.timestamp() <= session.close
+
+    def _session_from(self, day) -> Optional[Session]:
+        if self._covered(day):
+            return self._next_session.get(day)
+        while day.weekday() >= 5:
+            day += ONE_DAY
+        return self._regular(day)
+
+    def current_or_next(self, now=None) -> Optional[Session]:
+        """
+        The session in progress, or else the next one to open.
+        """
+        now = _now(now)
+        ts = now.timestamp()
+        session = self._session_from(now.date())
+        if session is not None and ts > session.close:
+            session = self._session_from(session.day + ONE_DAY)
+        return session
+
+    def next_open(self, now=None) -> Optional[datetime.datetime]:
+        """
+        When the next session opens; a session already in progress does not count.
+        """
+        now = _now(now)
+        session = self._session_from(now.date())
+        if session is not None and now.timestamp() >= session.open:
+            session = self._session_from(session.day + ONE_DAY)
+        return session.opens_at() if session is not None else None
+
+    def seconds_until_open(self, now=None):
+        """
+        0 while a session is open, else seconds until the next one opens
+        (None past the end of the calendar).
+        """
+        now = _now(now)
+        session = self.current_or_next(now)
+        if session is None:
+            return None
+        return max(0.0, session.open - now.timestamp())
+
+    def time_to_close(self, now=None):
+        """
+        Seconds left in the current session, or None while the market is shut.
+        """
+        now = _now(now)
+        session = self.session(now.date())
+        ts = now.timestamp()
+        if session is None or not session.open <= ts <= session.close:
+            return None
+        return session.close - ts
+
+    def next_expiry(self, day=None) -> Optional[datetime.date]:
+        """
+        The weekly expiry on or after day.
+        """
+        day = day or _now(None).date()
+        return self._next_expiry.get(day) if self._covered(day) else None
+
+    def is_expiry_day(self, day=None):
+        day = day or _now(None).date()
+        return day in self.expiries
+
+    def stats(self):
+        return {
+            "from": self.first_day.isoformat(),
+            "to": self.last_day.isoformat(),
+            "sessions": len(self.sessions),
+            "special_sessions": sum(1 for s in self.sessions.values() if s.special),
+            "expiries": len(self.expiries),
+        }
+
+
+_clock = None
+_clock_lock = threading.Lock()
+
+
+def get_clock():
+    """
+    The shared clock for NSE_CALENDAR_PATH, built on first use.
+    """
+    global _clock
+    with _clock_lock:
+        if _clock is None:
+            _clock = SessionClock.load()
+        return _clock
+
+
+def is_market_closed_today():
+    return not get_clock().is_trading_day()
@@ -0,0 +1,122 @@
+import json
+import logging
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Tuple
+
+from trade_parser import Trade
+from trade_state import Change, alert_message, invalidation_message
+
+# JSON file of subscriptions, see load_subscriptions. Without it CHAT_ID gets NIFTY.
+SUBSCRIPTIONS_PATH = os.getenv("SUBSCRIPTIONS_PATH")
+DEFAULT_INSTRUMENT = "NIFTY"
+
+
+@dataclass(frozen=True)
+class Subscription:
+    chat_id: str
+    instruments: Tuple[str, ...] = (DEFAULT_INSTRUMENT,)
+    min_confidence: int = 0
+    option_types: Tuple[str, ...] = ()  # empty means CE and PE
+    notify_empty: bool = True  # "no valid trade" notices
+
+    def wants(self, trade: Trade):
+        if trade.confidence < self.min_confidence:
+            return False
+        return not self.option_types or trade.option_type in self.option_types
+
+
+def _subscription(data):
+    return Subscription(
+        chat_id=str(data["chat_id"]),
+        instruments=tuple(i.upper() for i in data.get("instruments", (DEFAULT_INSTRUMENT,))),
+        min_confidence=int(data.get("min_confidence", 0)),
+        option_types=tuple(t.upper() for t in data.get("option_types", ())),
+        notify_empty=bool(data.get("notify_empty", True)),
+    )
+
+
+def load_subscriptions(path=SUBSCRIPTIONS_PATH, default_chat_id=None):
+    """
+    Reads a JSON list (or {"subscriptions": [...]}) of entries such as
+    {"chat_id": -100123, "instruments": ["NIFTY", "BANKNIFTY"],
+     "min_confidence": 75, "option_types": ["CE"], "notify_empty": false}.
+    Without a file, default_chat_id is subscribed to NIFTY alone.
+    """
+    if not path:
+        return [Subscription(str(default_chat_id))] if default_chat_id else []
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("subscriptions", [])
+    result = []
+    for entry in data:
+        try:
+            result.append(_subscription(entry))
+        except (KeyError, TypeError, ValueError) as e:
+            logging.error("Subscription entry %r Error: %s", entry, e)
+    return result
+
+
+class SubscriptionRouter:
+    """
+    Maps each instrument to its subscribers. The pipeline for an instrument
+    runs once per tick and renders its messages once; the router only
+    decides which chats get them, so cost grows with instruments rather
+    than subscribers. Delivery goes through the sender's per-chat and
+    global rate limits.
+    """
+
+    def __init__(self, subscriptions, sender):
+        self.sender = sender
+        self.by_instrument = defaultdict(list)
+        for subscription in subscriptions:
+            for instrument in subscription.instruments:
+                self.by_instrument[instrument].append(subscription)
+        self.delivered = 0
+        self.filtered = 0
+
+    def instruments(self):
+        return list(self.by_instrument)
+
+    def subscribers(self, instrument):
+        return self.by_instrument.get(instrument, [])
+
+    def deliver(self, instrument, trade: Trade, messages, previous: Trade = None):
+        """
+        Sends the messages for a trade to every subscriber whose filters
+        accept it, or accepted previous, the alert it revises.
+        """
+        for subscription in self.subscribers(instrument):
+            if not subscription.wants(trade) and (previous is None or not subscription.wants(previous)):
+                self.filtered += 1
+                continue
+            for message in messages:
+                self.sender.send(message, chat_id=subscription.chat_id)
+                self.delivered += 1
+
+    def deliver_change(self, instrument, change: Change, heading):
+        """
+        Routes a material change. An invalidation goes to the subscribers of
+        the trade it withdraws and a revision also reaches everyone who got
+        the original, so only a brand new alert is filtered on the new trade.
+        """
+        if not change.material:
+            return
+        for old in change.invalidated:
+            self.deliver(instrument, old, [invalidation_message(old, change, instrument)])
+        self.deliver(instrument, change.trade, [alert_message(change, heading)], previous=change.previous)
+
+    def notify(self, instrument, message):
+        for subscription in self.subscribers(instrument):
+            if subscription.notify_empty:
+                self.sender.send(message, chat_id=subscription.chat_id)
+                self.delivered += 1
+
+    def stats(self):
+        return {
+            "instruments": {name: len(subs) for name, subs in self.by_instrument.items()},
+            "delivered": self.delivered,
+            "filtered": self.filtered,
+        }
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from telegram import Bot
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
+
+import async_runtime
+import metrics
+
+_DEFAULT = object()
+# Telegram allows about 30 messages a second per bot, one a second per chat
+# and 20 a minute per group; the defaults stay just under those.
+TELEGRAM_GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", "25"))
+TELEGRAM_CHAT_RATE = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))
+TELEGRAM_GROUP_RATE = float(os.getenv("TELEGRAM_GROUP_RATE", str(18 / 60)))
+MAX_SEND_ATTEMPTS = 3
+# Bot API root; mock_server.py serves a local stand-in.
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+
+
+class TokenBucket:
+    """
+    Token bucket for the event loop: rate tokens per second, up to burst.
+    reserve() takes a token even when none is left and returns how long the
+    caller must wait for it, so concurrent callers queue up fairly without
+    a lock (everything runs on the loop thread).
+    """
+
+    def __init__(self, rate, burst=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    async def acquire(self):
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class TelegramSender:
+    """
+    Keep-alive Telegram client living on the shared background loop.
+
+    Messages are queued and delivered by worker tasks, so callers on the
+    scheduler thread never wait on the network. Each chat is pinned to one
+    worker queue, which keeps per-chat ordering while different chats are
+    sent in parallel. Every send waits on a per-chat token bucket (group
+    chats, whose ids are negative, get the slower group rate) and then on
+    one bucket for the whole bot; a RetryAfter from Telegram is honoured
+    and the message retried.
+    """
+
+    def __init__(self, token, default_chat_id=None, parse_mode=None,
+                 pool_size=8, workers=4, max_queue=1000, global_rate=TELEGRAM_GLOBAL_RATE,
+                 chat_rate=TELEGRAM_CHAT_RATE, group_rate=TELEGRAM_GROUP_RATE):
+        self.token = token
+        self.default_chat_id = default_chat_id
+        self.parse_mode = parse_mode
+        self.pool_size = pool_size
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.sent = 0
+        self.failed = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self._global_bucket = TokenBucket(global_rate, burst=global_rate)
+        self._chat_buckets = {}
+        self.bot = None
+        self._queues = []
+        self._tasks = []
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if not self._started:
+                async_runtime.run(self._start())
+                self._started = True
+        return self
+
+    async def _start(self):
+        request = HTTPXRequest(connection_pool_size=self.pool_size)
+        self.bot = Bot(token=self.token, request=request, base_url=f"{TELEGRAM_API_URL}/bot",
+                       base_file_url=f"{TELEGRAM_API_URL}/file/bot")
+        await self.bot.initialize()
+        self._queues = [asyncio.Queue(maxsize=self.max_queue) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f"telegram-worker-{i}")
+            for i, queue in enumerate(self._queues)
+        ]
+        metrics.gauge("telegram_queue_depth", "Messages waiting in the Telegram send queues.", self.queue_depth)
+        logging.info("Telegram sender started with %d workers.", self.workers)
+
+    def send(self, message, chat_id=None, parse_mode=_DEFAULT):
+        """
+        Queues a message for delivery and returns immediately.
+        """
+        if not self._started:
+            self.start()
+        chat_id = chat_id if chat_id is not None else self.default_chat_id
+        if parse_mode is _DEFAULT:
+            parse_mode = self.parse_mode
+        async_runtime.get_loop().call_soon_threadsafe(self._enqueue, (chat_id, message, parse_mode))
+
+    def broadcast(self, message, chat_ids, parse_mode=_DEFAULT):
+        for chat_id in chat_ids:
+            self.send(message, chat_id=chat_id, parse_mode=parse_mode)
+
+    def queue_depth(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def _enqueue(self, item):
+        queue = self._queues[hash(str(item[0])) % len(self._queues)]
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            logging.warning("Telegram queue full, dropping message for chat %s", item[0])
+
+    def _chat_bucket(self, chat_id):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if str(chat_id).startswith("-"):
+                bucket = TokenBucket(self.group_rate, burst=3)
+            else:
+                bucket = TokenBucket(self.chat_rate, burst=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _throttle(self, chat_id):
+        # Chat first: a message waiting for its chat must not hold a global token.
+        waited = await self._chat_bucket(chat_id).acquire()
+        waited += await self._global_bucket.acquire()
+        if waited:
+            self.throttled += 1
+            self.throttle_seconds += waited
+
+    async def _worker(self, queue):
+        while True:
+            chat_id, message, parse_mode = await queue.get()
+            try:
+                for attempt in range(MAX_SEND_ATTEMPTS):
+                    await self._throttle(chat_id)
+                    try:
+                        with metrics.stage("telegram_send"):
+                            await self.bot.send_message(chat_id=chat_id, text=message, parse_mode=parse_mode)
+                        self.sent += 1
+                        break
+                    except RetryAfter as e:
+                        logging.warning("Telegram flood limit for chat %s; retrying in %ss.", chat_id, e.retry_after)
+                        await asyncio.sleep(e.retry_after)
+                else:
+                    self.failed += 1
+                    logging.error("Telegram Error: gave up on chat %s after %d attempts.", chat_id, MAX_SEND_ATTEMPTS)
+            except Exception as e:
+                self.failed += 1
+                logging.error("Telegram Error: %s", e)
+            finally:
+                queue.task_done()
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "queued": self.queue_depth(),
+            "throttled": self.throttled,
+            "throttle_seconds": round(self.throttle_seconds, 2),
+            "chats": len(self._chat_buckets),
+        }
+
+    async def _flush(self):
+        await asyncio.gather(*(q.join() for q in self._queues))
+
+    def flush(self, timeout=None):
+        """
+        Blocks until every queued message has been handed to Telegram.
+        """
+        if self._started:
+            async_runtime.run(self._flush(), timeout)
+
+    async def _close(self, timeout):
+        try:
+            await asyncio.wait_for(self._flush(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Telegram queue not drained before close.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.bot.shutdown()
+
+    def close(self, timeout=30):
+        """
+        Drains the queue, stops the workers and releases the connection pool.
+        """
+        with self._start_lock:
+            if not self._started:
+                return
+            self._started = False
+        async_runtime.run(self._close(timeout))
@@ -0,0 +1,35 @@
+from backtest import NO_DATA, STOP, TARGET, Alert, BarStore, simulate
+from trade_parser import Trade
+
+TS = 1751514300.0  # 2025-07-03 09:15 IST
+
+BARS = """ts,symbol,strike,option_type,open,high,low,close
+2025-07-03T09:16:00+05:30,NIFTY,24500,CE,104,106,102,105
+2025-07-03T09:17:00+05:30,NIFTY,24500,CE,105,125,104,124
+2025-07-03T09:16:00+05:30,BANKNIFTY,24500,CE,104,106,102,105
+2025-07-03T09:17:00+05:30,BANKNIFTY,24500,CE,105,106,80,82
+"""
+
+
+def trade():
+    return Trade("CE", 24500, 100.0, 108.0, (120.0,), 90.0, 70)
+
+
+def test_bars_are_kept_apart_per_underlying(tmp_path):
+    path = tmp_path / "bars.csv"
+    path.write_text(BARS, encoding="utf-8")
+    bars = BarStore.load(str(path))
+    assert simulate(Alert(TS, "gpt", "p", trade()), bars).status == TARGET
+    assert simulate(Alert(TS, "gpt", "p", trade(), "BANKNIFTY"), bars).status == STOP
+    assert simulate(Alert(TS, "gpt", "p", trade(), "FINNIFTY"), bars).status == NO_DATA
+
+    cached = BarStore.load(str(path))
+    assert sorted(cached.series) == [("BANKNIFTY", 24500, "CE"), ("NIFTY", 24500, "CE")]
+    assert simulate(Alert(TS, "gpt", "p", trade(), "BANKNIFTY"), cached).status == STOP
+
+
+def test_bars_without_a_symbol_are_the_index(tmp_path):
+    path = tmp_path / "bars.csv"
+    path.write_text("ts,strike,option_type,price\n2025-07-03T09:16:00+05:30,24500,CE,104\n", encoding="utf-8")
+    bars = BarStore.load(str(path), use_cache=False)
+    assert list(bars.series) == [("NIFTY", 24500, "CE")]
@@ -0,0 +1,81 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from indicators import EMA, RSI, IndicatorEngine, ema, rsi
+from market_data import Tick
+from prescreen import PreScreen
+from scheduler import IST
+from trade_parser import Trade
+
+
+def at(day, hour, minute, second=0):
+    return datetime.datetime(2025, 7, day, hour, minute, second, tzinfo=IST).timestamp()
+
+
+def index_bars(engine, day, prices, symbol="NIFTY", option_volume=1000):
+    """
+    One index tick and one option tick (with rising cumulative volume) per minute.
+    """
+    for i, price in enumerate(prices):
+        ts = at(day, 9, 15 + i)
+        engine.on_tick(Tick(ts, symbol, price))
+        engine.on_tick(Tick(ts, symbol, 100.0, volume=option_volume * (i + 1), oi=50000, strike=24500,
+                            option_type="CE"))
+
+
+def test_incremental_indicators_match_batch():
+    closes = 24500 + np.cumsum(np.random.default_rng(1).normal(0, 5, 200))
+    incremental_ema, incremental_rsi = EMA(20), RSI()
+    for close in closes:
+        incremental_ema.update(close)
+        incremental_rsi.update(close)
+    assert incremental_ema.value == pytest.approx(ema(closes, span=20)[-1])
+    assert incremental_rsi.value == pytest.approx(rsi(closes)[-1])
+
+
+def test_index_vwap_is_weighted_by_option_volume():
+    engine = IndicatorEngine()
+    index_bars(engine, 3, [100.0, 110.0, 120.0])
+    # Bars 100 and 110 are closed, each with 1000 option contracts traded.
+    assert engine.reading()["vwap"] == pytest.approx(105.0)
+
+
+def test_futures_volume_replaces_option_volume():
+    engine = IndicatorEngine()
+    index_bars(engine, 3, [100.0, 110.0])
+    engine.on_tick(Tick(at(3, 9, 17), "NIFTY", 130.0, volume=500, option_type="FUT"))
+    engine.on_tick(Tick(at(3, 9, 17), "NIFTY", 130.0))
+    engine.on_tick(Tick(at(3, 9, 18), "NIFTY", 140.0))
+    assert engine.reading()["vwap"] == pytest.approx(130.0)
+
+
+def test_vwap_restarts_each_session():
+    engine = IndicatorEngine()
+    index_bars(engine, 3, [100.0, 100.0, 100.0])
+    index_bars(engine, 4, [200.0, 200.0, 200.0])
+    assert engine.reading()["vwap"] == pytest.approx(200.0)
+
+
+def test_chains_are_kept_per_symbol():
+    engine = IndicatorEngine()
+    ts = at(3, 9, 15)
+    engine.on_tick(Tick(ts, "NIFTY", 100.0, oi=1000, strike=24500, option_type="CE"))
+    engine.on_tick(Tick(ts, "NIFTY", 100.0, oi=2000, strike=24500, option_type="PE"))
+    engine.on_tick(Tick(ts, "BANKNIFTY", 300.0, oi=1000, strike=52000, option_type="CE"))
+    engine.on_tick(Tick(ts, "BANKNIFTY", 300.0, oi=500, strike=52000, option_type="PE"))
+    assert engine.chain("NIFTY").pcr() == pytest.approx(2.0)
+    assert engine.chain("BANKNIFTY").pcr() == pytest.approx(0.5)
+
+
+def test_vwap_reaches_summary_prescreen_and_trade_check():
+    engine = IndicatorEngine()
+    index_bars(engine, 3, [100.0 + i for i in range(30)])
+    assert "VWAP" in engine.summary()
+    assert PreScreen(None, engine).context()["vwap_distance"] > 0
+
+    put = Trade("PE", 24500, 100.0, 105.0, (120.0,), 90.0, 80)
+    screen = engine.check_trade(put)
+    assert not screen.ok
+    assert "above VWAP" in screen.reasons[0]
@@ -0,0 +1,39 @@
+from market_data import MarketSnapshot, Tick
+
+DAY1 = 1751514300.0  # 2025-07-03 09:15 IST
+DAY2 = DAY1 + 86400
+
+
+def test_session_levels_restart_on_a_new_day():
+    snapshot = MarketSnapshot()
+    snapshot.update(Tick(DAY1, "NIFTY", 24500.0))
+    snapshot.update(Tick(DAY1 + 60, "NIFTY", 24600.0))
+    snapshot.update(Tick(DAY1, "INDIAVIX", 13.0))
+    snapshot.update(Tick(DAY1, "NIFTY", 120.0, 1000, 50000, 24500, "CE"))
+    assert (snapshot.day_open, snapshot.day_high, snapshot.vix_open) == (24500.0, 24600.0, 13.0)
+
+    snapshot.update(Tick(DAY2, "NIFTY", 24400.0))
+    assert (snapshot.day_open, snapshot.day_high, snapshot.day_low) == (24400.0, 24400.0, 24400.0)
+    assert snapshot.vix is None and snapshot.chain == {}
+    snapshot.update(Tick(DAY2 + 1, "INDIAVIX", 14.0))
+    assert snapshot.vix_open == 14.0
+    assert "open 24400.00 high 24400.00" in snapshot.summary()
+
+
+def test_other_underlyings_do_not_touch_the_chain():
+    snapshot = MarketSnapshot()
+    snapshot.update(Tick(DAY1, "NIFTY", 24500.0))
+    snapshot.update(Tick(DAY1, "NIFTY", 120.0, 1000, 50000, 24500, "CE"))
+    snapshot.update(Tick(DAY1, "BANKNIFTY", 52000.0))
+    snapshot.update(Tick(DAY1, "BANKNIFTY", 300.0, 900, 90000, 24500, "CE"))
+    snapshot.update(Tick(DAY1, "NIFTY", 24510.0, 500, 0, 0, "FUT"))
+    assert snapshot.spot == 24500.0
+    assert list(snapshot.chain) == [(24500, "CE")]
+    assert snapshot.chain[(24500, "CE")].oi == 50000
+
+
+def test_summary_names_the_underlying():
+    snapshot = MarketSnapshot(symbol="BANKNIFTY")
+    snapshot.update(Tick(DAY1, "BANKNIFTY", 52000.0))
+    snapshot.update(Tick(DAY1, "NIFTY", 24500.0))
+    assert snapshot.summary().splitlines()[1].startswith("BANKNIFTY 52000.00")
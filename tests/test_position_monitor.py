@@ -0,0 +1,81 @@
+import json
+
+from position_monitor import CLOSED, PositionMonitor, replay
+from trade_parser import Trade
+
+HEADER = "ts,symbol,strike,option_type,price,volume,oi\n"
+
+
+def tick_rows(*ticks):
+    return HEADER + "".join(f"2025-07-03T{t}:00+05:30,NIFTY,{strike},{side},{price},0,0\n"
+                            for t, strike, side, price in ticks)
+
+
+def alert(ts, option_type, strike, entry, targets, stop, entry_to, exit_to):
+    return json.dumps({"ts": f"2025-07-03T{ts}:00+05:30", "trade": {
+        "option_type": option_type, "strike": strike, "entry_low": entry[0], "entry_high": entry[1],
+        "targets": targets, "stop_loss": stop, "confidence": 70, "entry_to": entry_to, "exit_to": exit_to,
+    }})
+
+
+def run(tmp_path, ticks, alerts):
+    ticks_path, alerts_path = tmp_path / "ticks.csv", tmp_path / "alerts.jsonl"
+    ticks_path.write_text(tick_rows(*ticks), encoding="utf-8")
+    alerts_path.write_text("\n".join(alerts) + "\n", encoding="utf-8")
+    messages = []
+    monitor = replay(str(ticks_path), str(alerts_path), notify=messages.append)
+    return monitor, messages
+
+
+def test_replay_event_sequence(tmp_path):
+    monitor, messages = run(tmp_path, [
+        ("09:20", 24500, "CE", 104),
+        ("09:20", 24500, "PE", 130),
+        ("09:25", 24500, "CE", 131),
+        ("09:30", 24500, "CE", 152),
+        ("09:50", 24600, "CE", 50),
+    ], [
+        alert("09:18", "CE", 24500, (100, 108), [130, 150], 92, 580, 615),
+        alert("09:18", "PE", 24500, (115, 122), [140], 105, 570, 615),
+        alert("09:19", "CE", 24600, (63, 68), [90], 55, 575, 615),
+    ])
+    assert messages == [
+        "✅ NIFTY 24500 CE entry zone reached at ₹104.",
+        "🎯 NIFTY 24500 CE target 1 ₹130 hit at ₹131 (+27 pts from ₹104).",
+        "🎯 NIFTY 24500 CE target 2 ₹150 hit at ₹152 (+48 pts from ₹104) — final target, position closed.",
+        "⌛ NIFTY 24500 PE was not triggered in its entry window.",
+        "⌛ NIFTY 24600 CE was not triggered in its entry window.",
+    ]
+    assert monitor.closed == {"target": 1, "expired": 2}
+    assert monitor.positions == []
+
+
+def test_stop_at_the_exit_time_is_reported_once(tmp_path):
+    monitor, messages = run(tmp_path, [
+        ("09:20", 24500, "CE", 104),
+        ("10:15", 24500, "CE", 90),
+        ("10:16", 24500, "CE", 95),
+    ], [alert("09:18", "CE", 24500, (100, 108), [130], 92, 580, 615)])
+    assert [m[0] for m in messages] == ["✅", "🛑"]
+    assert monitor.closed == {"stop": 1}
+
+
+def test_final_target_at_the_exit_time_is_reported_once(tmp_path):
+    monitor, messages = run(tmp_path, [
+        ("09:20", 24500, "CE", 104),
+        ("10:15", 24500, "CE", 131),
+    ], [alert("09:18", "CE", 24500, (100, 108), [130], 92, 580, 615)])
+    assert [m[0] for m in messages] == ["✅", "🎯"]
+    assert monitor.closed == {"target": 1}
+
+
+def test_revision_keeps_the_fill_and_close_invalidates():
+    monitor = PositionMonitor()
+    trade = Trade("CE", 24500, 100.0, 108.0, (130.0, 150.0), 92.0, 70)
+    position = monitor.open(trade, now=1751514600.0)
+    position.state, position.entry_price = 1, 104.0
+    revised = monitor.open(Trade("CE", 24500, 100.0, 108.0, (140.0,), 95.0, 72), now=1751514660.0)
+    assert revised.entry_price == 104.0
+    closed = monitor.close(trade)
+    assert closed.state == CLOSED and closed.exit_reason == "invalidated"
+    assert monitor.positions == []
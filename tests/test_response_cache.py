@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from response_cache import ResponseCache, cacheable
+
+
+def counting(answer):
+    calls = []
+
+    def ask(prompt):
+        calls.append(prompt)
+        return answer
+    return ask, calls
+
+
+@pytest.mark.parametrize("response", [
+    "", "   ", "ChatGPT Error: no response received.", "Grok Error: 500", "WebDriver error: gone",
+    "Error: Redirected from ChatGPT page. Please log in manually.",
+])
+def test_errors_and_empty_answers_are_not_cacheable(response):
+    assert not cacheable(response)
+
+
+def test_hit_within_the_bucket():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    ask, calls = counting("Option Type: CE")
+    assert cache.get_or_call("gpt", "prompt", ask) == "Option Type: CE"
+    assert cache.get_or_call("gpt", "prompt", ask) == "Option Type: CE"
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_model_and_prompt_are_part_of_the_key():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    ask, calls = counting("answer")
+    cache.get_or_call("gpt", "prompt", ask)
+    cache.get_or_call("grok", "prompt", ask)
+    cache.get_or_call("gpt", "other prompt", ask)
+    assert len(calls) == 3
+
+
+def test_failure_is_not_stored():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    ask, calls = counting("ChatGPT Error: no response received.")
+    cache.get_or_call("chatgpt-web", "prompt", ask)
+    cache.get_or_call("chatgpt-web", "prompt", ask)
+    assert len(calls) == 2
+
+
+def test_next_bucket_asks_again():
+    cache = ResponseCache(ttl=600, bucket_seconds=60, path=None)
+    assert cache.key("gpt", "prompt", now=120.0) == cache.key("gpt", "prompt", now=179.0)
+    assert cache.key("gpt", "prompt", now=120.0) != cache.key("gpt", "prompt", now=180.0)
+
+
+def test_concurrent_callers_share_one_call():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    release = threading.Event()
+    calls = []
+
+    def slow(prompt):
+        calls.append(prompt)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_call("gpt", "prompt", slow)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while cache.stats()["coalesced"] < 3 and time.time() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["answer"] * 4
+    assert len(calls) == 1
+
+
+def test_async_callers_share_one_call():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    calls = []
+
+    async def ask(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_call_async("gpt", "prompt", ask) for _ in range(3)))
+
+    assert asyncio.run(run()) == ["answer"] * 3
+    assert len(calls) == 1
+
+
+def test_stream_stopped_early_is_not_stored():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+
+    def stream(prompt):
+        yield "Option Type: CE\n"
+        yield "Strike Price: 24500\n"
+
+    chunks = cache.stream("gpt", "prompt", stream)
+    next(chunks)
+    chunks.close()
+    assert cache.get(cache.key("gpt", "prompt")) is None
+    assert "".join(cache.stream("gpt", "prompt", stream)) == "Option Type: CE\nStrike Price: 24500\n"
+    assert cache.get(cache.key("gpt", "prompt")) == "Option Type: CE\nStrike Price: 24500\n"
+
+
+def start_streams(cache, stream, count):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append("".join(cache.stream("gpt", "prompt", stream))))
+               for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 5
+    while cache.stats()["coalesced"] < count - 1 and time.time() < deadline:
+        time.sleep(0.001)
+    return threads, results
+
+
+def test_concurrent_streams_share_one_call():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    release = threading.Event()
+    calls = []
+
+    def stream(prompt):
+        calls.append(prompt)
+        yield "Option Type: CE\n"
+        release.wait(5)
+        yield "Strike Price: 24500\n"
+
+    threads, results = start_streams(cache, stream, 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ["Option Type: CE\nStrike Price: 24500\n"] * 4
+    assert len(calls) == 1
+
+
+def test_streams_waiting_on_a_failed_stream_ask_again():
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=None)
+    release = threading.Event()
+    calls = []
+
+    def stream(prompt):
+        calls.append(prompt)
+        if len(calls) == 1:
+            release.wait(5)
+            yield "Grok Error: 500"
+        else:
+            yield "answer"
+
+    threads, results = start_streams(cache, stream, 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == ["Grok Error: 500", "answer", "answer"]
+    assert len(calls) == 3
+
+
+def test_disk_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResponseCache(ttl=60, bucket_seconds=0, path=path)
+    cache.put(cache.key("gpt", "prompt"), "answer")
+    cache.close()
+    reopened = ResponseCache(ttl=60, bucket_seconds=0, path=path)
+    assert reopened.get(reopened.key("gpt", "prompt")) == "answer"
+    reopened.close()
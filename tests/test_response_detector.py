@@ -0,0 +1,66 @@
+from selenium.common.exceptions import JavascriptException
+
+from response_detector import ResponseDetector
+
+
+class FakeDriver:
+    """
+    Answers each long-poll with the next scripted result; an exception
+    instance is raised instead of returned.
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.installs = 0
+
+    def execute_script(self, script, *args):
+        self.installs += 1
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_async_script(self, script, *args):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def poll(deltas, done=False):
+    return {"deltas": deltas, "done": done, "cloudflare": False}
+
+
+def wait(results):
+    driver = FakeDriver(results)
+    detector = ResponseDetector(driver, answers_before=0)
+    detector.install()
+    return detector.wait(timeout=5), driver
+
+
+def test_deltas_are_joined():
+    text, _ = wait([poll([{"append": "Option Type: "}]), poll([{"append": "CE"}], done=True)])
+    assert text == "Option Type: CE"
+
+
+def test_reset_replaces_the_text():
+    text, _ = wait([poll([{"append": "Draft"}]), poll([{"reset": "Final answer"}], done=True)])
+    assert text == "Final answer"
+
+
+def test_reinstall_after_navigation_does_not_duplicate():
+    text, driver = wait([
+        poll([{"append": "Option Type: CE"}]),
+        {"missing": True},
+        poll([{"append": "Option Type: CE\nStrike Price: 24500"}], done=True),
+    ])
+    assert text == "Option Type: CE\nStrike Price: 24500"
+    assert driver.installs == 2
+
+
+def test_reinstall_after_script_error_does_not_duplicate():
+    text, _ = wait([
+        poll([{"append": "Option Type: CE"}]),
+        JavascriptException("page reloaded"),
+        poll([{"append": "Option Type: CE"}], done=True),
+    ])
+    assert text == "Option Type: CE"
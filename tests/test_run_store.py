@@ -0,0 +1,69 @@
+import pytest
+
+from run_store import RunStore
+from trade_parser import Trade
+
+TS = 1751514300.0  # 2025-07-03 09:15 IST
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = RunStore(path=str(tmp_path / "runs.sqlite3"), flush_interval=0.05,
+                     retention_days=30, keep_raw_days=7)
+    yield store
+    store.close()
+
+
+def trade(strike=24500, confidence=70):
+    return Trade("CE", strike, 100.0, 105.0, (120.0, 130.0), 90.0, confidence)
+
+
+def test_runs_and_trades_are_written(store):
+    alerted = trade(24500, 80)
+    store.record("main.py", "openai:gpt", "prompt", "Option Type: CE", [alerted, trade(24600)],
+                 latency=1.5, usage={"prompt_tokens": 900, "completion_tokens": 120}, alerted=alerted, ts=TS)
+    assert store.flush()
+    assert store.query("SELECT day, prompt_tokens, completion_tokens, trade_count, error FROM runs") == [
+        ("2025-07-03", 900, 120, 2, None),
+    ]
+    rows = store.trades(day="2025-07-03", model="openai:gpt")
+    assert [(r[4], r[7], r[14]) for r in rows] == [(24500, "[120.0, 130.0]", 1), (24600, "[120.0, 130.0]", 0)]
+    assert store.stats() == {"queued": 0, "written": 1, "errors": 0}
+
+
+def test_prompt_is_stored_once(store):
+    for i in range(3):
+        store.record("grok.py", "xai:grok", "same prompt", "answer", [trade()], ts=TS + i)
+    assert store.flush()
+    assert store.query("SELECT COUNT(*) FROM prompts") == [(1,)]
+    assert len(store.trades()) == 3
+
+
+def test_error_answers_keep_no_raw_text(store):
+    store.record("main.py", "openai:gpt", "prompt", "ChatGPT Error: timeout", ts=TS)
+    assert store.flush()
+    assert store.query("SELECT error, raw_response FROM runs") == [("ChatGPT Error: timeout", None)]
+
+
+def test_rolled_back_batch_writes_its_prompt_again(store):
+    # A trade without a strike violates NOT NULL and rolls the batch back,
+    # including the prompt row it inserted.
+    store.record("main.py", "openai:gpt", "prompt", "answer", [trade(strike=None)], ts=TS)
+    assert store.flush()
+    assert store.stats()["errors"] == 1
+    store.record("main.py", "openai:gpt", "prompt", "answer", [trade()], ts=TS + 60)
+    assert store.flush()
+    assert store.query("SELECT COUNT(*) FROM prompts") == [(1,)]
+    assert len(store.trades()) == 1
+
+
+def test_retention_drops_old_runs_and_strips_raw_text(store):
+    now = TS + 40 * 86400
+    store.record("main.py", "openai:gpt", "old prompt", "old", [trade()], ts=TS)
+    store.record("main.py", "openai:gpt", "prompt", "middle", [trade()], ts=now - 10 * 86400)
+    store.record("main.py", "openai:gpt", "prompt", "recent", [trade()], ts=now - 86400)
+    assert store.flush()
+    assert store.apply_retention(now) == {"dropped_runs": 1, "stripped_raw": 1}
+    assert store.query("SELECT raw_response FROM runs ORDER BY ts") == [(None,), ("recent",)]
+    assert store.query("SELECT COUNT(*) FROM trades") == [(2,)]
+    assert store.query("SELECT COUNT(*) FROM prompts") == [(1,)]
@@ -0,0 +1,63 @@
+from subscriptions import Subscription, SubscriptionRouter
+from trade_parser import Trade
+from trade_state import TradeStateTracker
+
+
+class FakeSender:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message, chat_id=None):
+        self.sent.append((chat_id, message))
+
+
+def trade(option_type="PE", strike=24500, entry=100.0, confidence=80):
+    return Trade(option_type, strike, entry, entry + 5, (entry * 1.2,), entry * 0.8, confidence)
+
+
+def received(sender, chat_id):
+    return [message for chat, message in sender.sent if chat == chat_id]
+
+
+def test_invalidation_reaches_subscribers_of_the_withdrawn_trade():
+    sender = FakeSender()
+    router = SubscriptionRouter([Subscription("pe", option_types=("PE",)), Subscription("all")], sender)
+    tracker = TradeStateTracker(path=None)
+
+    router.deliver_change("NIFTY", tracker.observe(trade("PE")), "Alert")
+    router.deliver_change("NIFTY", tracker.observe(trade("CE", 24600)), "Alert")
+
+    pe = received(sender, "pe")
+    assert len(pe) == 2
+    assert "PE 24500 alert invalidated" in pe[1]
+    assert len(received(sender, "all")) == 3
+
+
+def test_new_alert_is_filtered_on_the_new_trade():
+    sender = FakeSender()
+    router = SubscriptionRouter([Subscription("strict", min_confidence=90)], sender)
+    router.deliver_change("NIFTY", TradeStateTracker(path=None).observe(trade(confidence=80)), "Alert")
+    assert sender.sent == []
+    assert router.filtered == 1
+
+
+def test_revision_reaches_everyone_who_got_the_original():
+    sender = FakeSender()
+    router = SubscriptionRouter([Subscription("strict", min_confidence=75)], sender)
+    tracker = TradeStateTracker(path=None)
+
+    router.deliver_change("NIFTY", tracker.observe(trade(confidence=80)), "Alert")
+    router.deliver_change("NIFTY", tracker.observe(trade(entry=130.0, confidence=70)), "Alert")
+
+    messages = received(sender, "strict")
+    assert len(messages) == 2
+    assert "revised" in messages[1]
+
+
+def test_duplicates_send_nothing():
+    sender = FakeSender()
+    router = SubscriptionRouter([Subscription("all")], sender)
+    tracker = TradeStateTracker(path=None)
+    router.deliver_change("NIFTY", tracker.observe(trade()), "Alert")
+    router.deliver_change("NIFTY", tracker.observe(trade()), "Alert")
+    assert len(sender.sent) == 1
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+from trade_parser import parse_json_trades, parse_trades
+from trades import TradeStreamParser, extract_trades
+
+BENCH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench")
+with open(os.path.join(BENCH, "expected.json"), encoding="utf-8") as f:
+    EXPECTED = json.load(f)
+
+TRADE = """Option Type: CE
+Strike Price: 24500
+Premium Entry Range: ₹120–126
+Target(s): ₹150 / ₹170
+Stop Loss: ₹104
+Ideal Entry Time: 09:45–10:15
+Ideal Exit Time: 1:30 pm
+Confidence Level: 76%
+Key Factors: Call unwinding at 24500.
+Short Reason: Breakout above the opening range,
+confirmed by rising volume
+and a PCR above one.
+"""
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_corpus(name):
+    with open(os.path.join(BENCH, "corpus", name), encoding="utf-8") as f:
+        assert len(extract_trades(f.read())) == EXPECTED[name]
+
+
+def test_fields_are_parsed_to_numbers():
+    trade, = parse_trades(TRADE)
+    assert (trade.option_type, trade.strike) == ("CE", 24500)
+    assert (trade.entry_low, trade.entry_high) == (120.0, 126.0)
+    assert trade.targets == (150.0, 170.0)
+    assert trade.stop_loss == 104.0
+    assert trade.confidence == 76
+    assert (trade.entry_from, trade.entry_to, trade.exit_from) == (585, 615, 810)
+
+
+@pytest.mark.parametrize("targets", [
+    "Target 1: ₹150 / Target 2: ₹170",
+    "Target 1: ₹150\nTarget 2: ₹170",
+    "**Target 1:** ₹150, **Target 2:** ₹170",
+])
+def test_numbered_targets(targets):
+    text = TRADE.replace("Target(s): ₹150 / ₹170", targets)
+    trade, = parse_trades(text)
+    assert trade.targets == (150.0, 170.0)
+
+
+def test_incomplete_trade_is_dropped():
+    assert parse_trades(TRADE.replace("Stop Loss: ₹104\n", "")) == []
+
+
+def test_stream_emits_a_trade_once_its_reason_ends():
+    text = TRADE + "\nMore commentary that is not part of the trade.\n"
+    parser = TradeStreamParser()
+    streamed = []
+    for i in range(0, len(text), 7):
+        streamed.extend(parser.feed(text[i:i + 7]))
+    trade, = streamed
+    assert trade.reason == ("Breakout above the opening range, confirmed by rising volume "
+                            "and a PCR above one.")
+    assert parser.close() == []
+
+
+def test_stream_emits_when_a_label_follows_the_reason():
+    text = TRADE.replace("Key Factors: Call unwinding at 24500.\n", "") + "Key Factors: Call unwinding.\n"
+    parser = TradeStreamParser()
+    trade, = parser.feed(text)
+    assert trade.reason.endswith("and a PCR above one.")
+    assert trade.key_factors == "Call unwinding."
+    assert parser.close() == []
+
+
+def test_stream_holds_the_last_reason_line_until_the_end():
+    parser = TradeStreamParser()
+    assert parser.feed(TRADE) == []
+    trade, = parser.close()
+    assert trade.reason.endswith("and a PCR above one.")
+
+
+def test_stream_emits_a_trade_when_the_next_one_starts():
+    parser = TradeStreamParser()
+    first = parser.feed("Trade 1\n" + TRADE + "\nTrade 2\n")
+    assert [t.strike for t in first] == [24500]
+    second = parser.feed(TRADE.replace("24500", "24600")) + parser.close()
+    assert [t.strike for t in second] == [24600]
+
+
+def test_json_trades_in_a_fence():
+    text = '```json\n{"trades": [{"option_type": "PE", "strike": 24400, "entry_low": 90, "entry_high": 96, ' \
+           '"targets": [115], "stop_loss": 80, "confidence": 62}]}\n```'
+    trade, = parse_json_trades(text)
+    assert (trade.option_type, trade.strike, trade.targets) == ("PE", 24400, (115.0,))
+    assert parse_json_trades("Option Type: CE") is None
@@ -0,0 +1,119 @@
+import time
+
+from trade_parser import Trade
+from trade_state import DUPLICATE, NEW, REVISED, TradeStateTracker, alert_messages, same_levels
+
+T0 = 1751514300.0
+
+
+def ce(strike=24500, entry=(100.0, 105.0), targets=(120.0, 130.0), stop=90.0):
+    return Trade("CE", strike, entry[0], entry[1], targets, stop, 70)
+
+
+def pe(strike=24400):
+    return Trade("PE", strike, 80.0, 85.0, (100.0,), 70.0, 65)
+
+
+def test_small_price_drift_is_the_same_levels():
+    assert same_levels(ce(), ce(entry=(101.0, 106.0), stop=91.0), tolerance=0.05)
+    assert not same_levels(ce(), ce(targets=(120.0,)), tolerance=0.05)
+    assert not same_levels(ce(), ce(stop=70.0), tolerance=0.05)
+
+
+def test_repeat_within_the_window_is_a_duplicate():
+    tracker = TradeStateTracker(window=900, path=None)
+    assert tracker.observe(ce(), now=T0).kind == NEW
+    change = tracker.observe(ce(entry=(101.0, 105.0)), now=T0 + 60)
+    assert change.kind == DUPLICATE and not change.material
+    assert alert_messages(change, "Alert") == []
+    assert tracker.stats() == {"active": 1, "suppressed": 1}
+
+
+def test_repeat_after_the_window_is_new_again():
+    tracker = TradeStateTracker(window=900, path=None)
+    tracker.observe(ce(), now=T0)
+    assert tracker.observe(ce(), now=T0 + 900).kind == NEW
+
+
+def test_changed_levels_are_a_revision():
+    tracker = TradeStateTracker(window=900, path=None)
+    tracker.observe(ce(), now=T0)
+    change = tracker.observe(ce(targets=(140.0, 160.0)), now=T0 + 60)
+    assert change.kind == REVISED
+    assert change.previous == ce()
+    [message] = alert_messages(change, "Alert")
+    assert message.startswith("Alert — revised")
+    assert "Was: " in message
+
+
+def test_other_side_invalidates_the_active_trades():
+    tracker = TradeStateTracker(window=900, path=None)
+    tracker.observe(ce(24500), now=T0)
+    tracker.observe(ce(24600), now=T0 + 10)
+    change = tracker.observe(pe(), now=T0 + 60)
+    assert change.kind == NEW
+    assert {t.strike for t in change.invalidated} == {24500, 24600}
+    messages = alert_messages(change, "Alert")
+    assert len(messages) == 3
+    assert messages[0].startswith("❌ NIFTY CE")
+    assert tracker.stats()["active"] == 1
+
+
+def test_expired_trades_are_not_invalidated():
+    tracker = TradeStateTracker(window=900, path=None)
+    tracker.observe(ce(24500), now=T0)
+    tracker.observe(ce(24600), now=T0 + 600)
+    change = tracker.observe(pe(), now=T0 + 1000)
+    assert change.kind == NEW
+    assert [t.strike for t in change.invalidated] == [24600]
+    assert len(alert_messages(change, "Alert")) == 2
+
+
+def test_expired_trades_leave_the_saved_state(tmp_path):
+    path = str(tmp_path / "state.json")
+    now = time.time()
+    tracker = TradeStateTracker(window=900, path=path)
+    tracker.observe(ce(24500), now=now - 1000)
+    tracker.observe(ce(24600), now=now)
+    assert list(tracker.active) == [("CE", 24600)]
+    assert list(TradeStateTracker(window=900, path=path).active) == [("CE", 24600)]
+
+
+def test_same_side_trade_does_not_invalidate():
+    tracker = TradeStateTracker(window=900, path=None)
+    tracker.observe(ce(24500), now=T0)
+    assert tracker.observe(ce(24600), now=T0 + 60).invalidated == ()
+
+
+def test_closed_trade_alerts_again():
+    tracker = TradeStateTracker(window=900, path=None)
+    tracker.observe(ce(), now=T0)
+    tracker.close(ce())
+    assert tracker.observe(ce(), now=T0 + 60).kind == NEW
+
+
+def test_no_trade_is_reported_once_per_window():
+    tracker = TradeStateTracker(window=900, path=None)
+    assert tracker.observe_empty(now=T0)
+    assert not tracker.observe_empty(now=T0 + 60)
+    assert tracker.observe_empty(now=T0 + 900)
+    tracker.observe(ce(), now=T0 + 960)
+    assert tracker.observe_empty(now=T0 + 1020)
+
+
+def test_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / "state.json")
+    now = time.time()
+    tracker = TradeStateTracker(window=900, path=path)
+    tracker.observe(ce(), now=now)
+    tracker.observe(ce(24600), now=now - 1000)
+
+    reloaded = TradeStateTracker(window=900, path=path)
+    assert list(reloaded.active) == [("CE", 24500)]
+    assert reloaded.observe(ce(), now=now + 60).kind == DUPLICATE
+
+
+def test_unreadable_state_starts_empty(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("not json", encoding="utf-8")
+    assert TradeStateTracker(window=900, path=str(path)).active == {}
@@ -0,0 +1,368 @@
+import json
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# Label variants seen in model output, mapped to the field they fill.
+# Lookup is on the lower-cased label with whitespace collapsed.
+FIELD_LABELS = {
+    "option type": "option_type",
+    "option": "option_type",
+    "type": "option_type",
+    "strike price": "strike",
+    "strike": "strike",
+    "premium entry range": "entry",
+    "premium entry": "entry",
+    "entry premium": "entry",
+    "entry range": "entry",
+    "entry price": "entry",
+    "entry zone": "entry",
+    "entry": "entry",
+    "targets": "targets",
+    "target": "targets",
+    "stop loss": "stop_loss",
+    "stop-loss": "stop_loss",
+    "stoploss": "stop_loss",
+    "sl": "stop_loss",
+    "ideal entry time": "entry_time",
+    "entry time": "entry_time",
+    "ideal exit time": "exit_time",
+    "exit time": "exit_time",
+    "confidence level": "confidence",
+    "confidence": "confidence",
+    "key technical + derivative factors": "key_factors",
+    "key factors": "key_factors",
+    "short reason": "reason",
+    "short justification": "reason",
+    "justification": "reason",
+    "reason": "reason",
+}
+REQUIRED_FIELDS = ("option_type", "strike", "entry", "targets", "stop_loss", "confidence")
+MULTILINE_FIELDS = ("key_factors", "reason")
+
+
+def _label_alternation():
+    # Longest first so "entry time" wins over "entry" and "strike price" over "strike".
+    labels = sorted(FIELD_LABELS, key=len, reverse=True)
+    return "|".join(re.escape(label).replace(r"\ ", r"\s*") for label in labels)
+
+
+# One anchored match per line: optional bullets, numbering, emoji or markdown,
+# a known label (or a "Trade #n" marker), an optional ordinal ("Target 2"),
+# an optional short parenthetical such as "(s)" or "(%)", then a colon/dash
+# separator or the end of the line. No nested or lazy-dot quantifiers, and
+# the lookahead stops the prefix from retrying every label at each
+# backtracked position, so the cost is linear in the line length.
+LINE_RE = re.compile(
+    r"^(?:[^\w\n]|_|\d+[.)])*(?=[A-Za-z])"
+    r"(?:(?P<marker>trade\s*#?\s*\d+)|(?P<label>" + _label_alternation() + r")(?P<ordinal>\s*\d{1,2}\b)?)"
+    r"(?:\s*\([^)\n]{0,12}\))?[*_\s]*(?:[:：–—-]|$)[*_\s]*(?P<value>.*)$",
+    re.IGNORECASE,
+)
+OPTION_TYPE_RE = re.compile(r"(?<![A-Za-z])(CE|PE|CALL|PUT)(?![A-Za-z])", re.IGNORECASE)
+STRIKE_RE = re.compile(r"\b(\d{2},?\d{3})\b")
+DIGITS_RE = re.compile(r"\d+")
+# "Target 2:" inside a targets value ("Target 1: ₹150 / Target 2: ₹170"),
+# removed so the ordinal is not read as a price.
+TARGET_ORDINAL_RE = re.compile(r"\btargets?\s*\d{1,2}\s*[:：–—-]", re.IGNORECASE)
+
+
+PRICE_RE = re.compile(r"\d+(?:,\d{3})*(?:\.\d+)?")
+TIME_RE = re.compile(r"(\d{1,2})[:.](\d{2})\s*([ap]\.?m\.?)?", re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class Trade:
+    """
+    One suggested option trade with its levels parsed to numbers.
+    Times are minutes after midnight (IST); None when the model gave none.
+    """
+    option_type: str
+    strike: int
+    entry_low: float
+    entry_high: float
+    targets: Tuple[float, ...]
+    stop_loss: float
+    confidence: int
+    entry_from: Optional[int] = None
+    entry_to: Optional[int] = None
+    exit_from: Optional[int] = None
+    exit_to: Optional[int] = None
+    key_factors: str = ""
+    reason: str = ""
+    models: Tuple[str, ...] = ()
+
+
+def parse_prices(text):
+    return [float(n.replace(",", "")) for n in PRICE_RE.findall(text or "")]
+
+
+def parse_times(text):
+    """
+    Returns every HH:MM in text as minutes after midnight. Hours before 8
+    without am/pm are read as afternoon, since NSE trades 09:15-15:30.
+    """
+    minutes = []
+    for hour, minute, meridiem in TIME_RE.findall(text or ""):
+        hour, minute = int(hour), int(minute)
+        suffix = meridiem.lower().replace(".", "")
+        if suffix == "pm" and hour < 12 or not suffix and hour < 8:
+            hour += 12
+        elif suffix == "am" and hour == 12:
+            hour = 0
+        if hour < 24 and minute < 60:
+            minutes.append(hour * 60 + minute)
+    return minutes
+
+
+def build_trade(fields):
+    """
+    Converts a block of raw field strings into a Trade, or None when a
+    required level has no number in it.
+    """
+    strike = parse_prices(fields.get("strike"))
+    entry = parse_prices(fields.get("entry"))
+    targets = parse_prices(fields.get("targets"))
+    stop_loss = parse_prices(fields.get("stop_loss"))
+    if not (strike and entry and targets and stop_loss):
+        return None
+    entry_times = parse_times(fields.get("entry_time"))
+    exit_times = parse_times(fields.get("exit_time"))
+    return Trade(
+        option_type=fields["option_type"],
+        strike=int(strike[0]),
+        entry_low=min(entry[:2]),
+        entry_high=max(entry[:2]),
+        targets=tuple(targets),
+        stop_loss=stop_loss[0],
+        confidence=fields["confidence"],
+        entry_from=entry_times[0] if entry_times else None,
+        entry_to=entry_times[-1] if entry_times else None,
+        exit_from=exit_times[0] if exit_times else None,
+        exit_to=exit_times[-1] if exit_times else None,
+        key_factors=fields.get("key_factors", ""),
+        reason=fields.get("reason", ""),
+    )
+
+
+def _clean(value):
+    return value.strip().strip("*_").strip()
+
+
+def _option_type(value):
+    match = OPTION_TYPE_RE.search(value)
+    if not match:
+        return None
+    return "CE" if match.group(1).upper() in ("CE", "CALL") else "PE"
+
+
+class TradeTokenizer:
+    """
+    Single-pass, line-oriented trade extractor.
+
+    Each line is matched once against LINE_RE. A "Trade #n" marker or a second
+    option type starts a new block; unlabelled lines continue the previous
+    multi-line field (key factors, reason). Field order within a block does
+    not matter. Option type and strike written on the marker line itself
+    ("Trade 1: 24500 CE") are used until explicit labels override them. The
+    same object serves whole responses (parse) and streamed text
+    (push_line / finish).
+    """
+
+    def __init__(self):
+        self.current = {}
+        self.field = None
+        self.inferred = set()
+
+    def push_line(self, line):
+        """
+        Consumes one line and returns the trade it completed, if any.
+        """
+        match = LINE_RE.match(line)
+        if match is None:
+            text = _clean(line).lstrip("-•·").strip()
+            if text and self.field in MULTILINE_FIELDS:
+                previous = self.current.get(self.field, "")
+                self.current[self.field] = f"{previous} {text}" if previous else text
+            elif not text and self.field in MULTILINE_FIELDS and self.current.get(self.field):
+                self.field = None
+            return None
+
+        if match.group("marker"):
+            completed = self.finish()
+            self._infer(match.group("value"))
+            return completed
+
+        field = FIELD_LABELS[" ".join(match.group("label").lower().split())]
+        value = _clean(match.group("value"))
+        completed = None
+        if field == "option_type":
+            value = _option_type(value)
+            if not value:
+                return None
+            if "option_type" in self.current and "option_type" not in self.inferred:
+                completed = self.finish()
+        elif field == "confidence":
+            digits = DIGITS_RE.search(value)
+            if not digits:
+                return None
+            value = int(digits.group())
+        elif field == "targets":
+            value = TARGET_ORDINAL_RE.sub(" ", value).strip()
+        if field not in MULTILINE_FIELDS and not value:
+            return None
+        if field == "targets" and match.group("ordinal") and "targets" in self.current:
+            # "Target 1: ..." / "Target 2: ..." on separate lines.
+            self.current[field] = f"{self.current[field]} / {value}"
+            self.field = None
+            return completed
+        if field in self.current and field not in MULTILINE_FIELDS and field not in self.inferred:
+            # Keep the first value; repeats are usually restated summaries.
+            self.field = None
+            return completed
+        self.current[field] = value
+        self.inferred.discard(field)
+        self.field = field
+        return completed
+
+    def _infer(self, value):
+        option_type = _option_type(value)
+        if option_type:
+            self.current["option_type"] = option_type
+            self.inferred.add("option_type")
+        strike = STRIKE_RE.search(value)
+        if strike:
+            self.current["strike"] = strike.group(1)
+            self.inferred.add("strike")
+
+    def complete(self):
+        """
+        True once the current block has every required field.
+        """
+        return all(self.current.get(field) for field in REQUIRED_FIELDS)
+
+    def finish(self):
+        """
+        Closes the current block and returns it as a Trade if it is complete.
+        """
+        current, self.current, self.field = self.current, {}, None
+        self.inferred = set()
+        if not all(current.get(field) for field in REQUIRED_FIELDS):
+            return None
+        return build_trade(current)
+
+    def parse(self, text) -> List[Trade]:
+        trades = []
+        for line in text.splitlines():
+            trade = self.push_line(line)
+            if trade:
+                trades.append(trade)
+        trade = self.finish()
+        if trade:
+            trades.append(trade)
+        return trades
+
+
+def parse_trades(text) -> List[Trade]:
+    return TradeTokenizer().parse(text or "")
+
+
+# JSON schema for structured output (tool calling). Times are "HH:MM" or
+# "HH:MM-HH:MM" in IST, read with parse_times like the free-text labels.
+TRADE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "trades": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "option_type": {"type": "string", "enum": ["CE", "PE"]},
+                    "strike": {"type": "integer"},
+                    "entry_low": {"type": "number", "description": "Lower end of the premium entry range"},
+                    "entry_high": {"type": "number", "description": "Upper end of the premium entry range"},
+                    "targets": {"type": "array", "items": {"type": "number"}, "minItems": 1},
+                    "stop_loss": {"type": "number"},
+                    "confidence": {"type": "integer", "minimum": 0, "maximum": 100},
+                    "entry_time": {"type": "string", "description": "Ideal entry time, HH:MM-HH:MM IST"},
+                    "exit_time": {"type": "string", "description": "Ideal exit time, HH:MM-HH:MM IST"},
+                    "key_factors": {"type": "string"},
+                    "reason": {"type": "string"},
+                },
+                "required": ["option_type", "strike", "entry_low", "entry_high", "targets", "stop_loss",
+                             "confidence", "entry_time", "exit_time", "key_factors", "reason"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["trades"],
+    "additionalProperties": False,
+}
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    prices = parse_prices(str(value))
+    return prices[0] if prices else None
+
+
+def trade_from_dict(item) -> Optional[Trade]:
+    """
+    Validates one TRADE_SCHEMA item into a Trade, or None when a required
+    level is missing or not a number.
+    """
+    if not isinstance(item, dict):
+        return None
+    option_type = _option_type(str(item.get("option_type", "")))
+    strike, entry_low, entry_high, stop_loss = (
+        _number(item.get(key)) for key in ("strike", "entry_low", "entry_high", "stop_loss")
+    )
+    targets = item.get("targets")
+    targets = [_number(t) for t in (targets if isinstance(targets, list) else [targets])]
+    confidence = _number(item.get("confidence"))
+    if not option_type or not strike or entry_low is None or stop_loss is None or not confidence:
+        return None
+    if not targets or None in targets:
+        return None
+    entry_high = entry_low if entry_high is None else entry_high
+    entry_times = parse_times(item.get("entry_time"))
+    exit_times = parse_times(item.get("exit_time"))
+    return Trade(
+        option_type=option_type,
+        strike=int(strike),
+        entry_low=min(entry_low, entry_high),
+        entry_high=max(entry_low, entry_high),
+        targets=tuple(targets),
+        stop_loss=stop_loss,
+        confidence=int(confidence),
+        entry_from=entry_times[0] if entry_times else None,
+        entry_to=entry_times[-1] if entry_times else None,
+        exit_from=exit_times[0] if exit_times else None,
+        exit_to=exit_times[-1] if exit_times else None,
+        key_factors=str(item.get("key_factors") or ""),
+        reason=str(item.get("reason") or ""),
+    )
+
+
+def parse_json_trades(text) -> Optional[List[Trade]]:
+    """
+    Trades from a structured (TRADE_SCHEMA) answer, or None when text is not
+    JSON, so the caller can fall back to parse_trades. A ```json fence is
+    tolerated.
+    """
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.strip("`").strip()
+        if text.lower().startswith("json"):
+            text = text[4:].lstrip()
+    if not text.startswith(("{", "[")):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    items = data.get("trades", []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return None
+    return [trade for trade in map(trade_from_dict, items) if trade is not None]
@@ -0,0 +1,214 @@
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional, Tuple
+
+import metrics
+from trade_parser import Trade
+from trades import format_entry, format_price, format_trade
+
+DEDUP_WINDOW = float(os.getenv("ALERT_DEDUP_WINDOW", "900"))
+PRICE_TOLERANCE = float(os.getenv("ALERT_PRICE_TOLERANCE", "0.05"))
+STATE_PATH = os.getenv("TRADE_STATE_PATH")  # e.g. "trade_state.json"
+
+NEW = "new"
+REVISED = "revised"
+DUPLICATE = "duplicate"
+
+
+def fingerprint(trade: Trade):
+    """
+    Identity of a trade idea: the same option type and strike is the same
+    trade, whatever levels the model quotes for it this time.
+    """
+    return trade.option_type, trade.strike
+
+
+def _close(a, b, tolerance):
+    return abs(a - b) <= tolerance * max(abs(a), abs(b), 1.0)
+
+
+def same_levels(a: Trade, b: Trade, tolerance=PRICE_TOLERANCE):
+    """
+    True when entry band, targets and stop loss all agree within tolerance
+    (a fraction of the price), so rewording and ₹1-2 drift do not count as
+    a change.
+    """
+    if len(a.targets) != len(b.targets):
+        return False
+    pairs = [(a.entry_low, b.entry_low), (a.entry_high, b.entry_high), (a.stop_loss, b.stop_loss)]
+    pairs.extend(zip(a.targets, b.targets))
+    return all(_close(x, y, tolerance) for x, y in pairs)
+
+
+@dataclass
+class ActiveTrade:
+    trade: Trade
+    sent_at: float
+    repeats: int = 0
+
+
+@dataclass
+class Change:
+    kind: str
+    trade: Trade
+    previous: Optional[Trade] = None
+    invalidated: Tuple[Trade, ...] = field(default_factory=tuple)
+
+    @property
+    def material(self):
+        return self.kind != DUPLICATE
+
+
+def levels_summary(trade: Trade):
+    targets = " / ".join(format_price(t) for t in trade.targets)
+    return f"entry {format_entry(trade)}, target {targets}, SL {format_price(trade.stop_loss)}"
+
+
+def invalidation_message(old: Trade, change: Change, instrument="NIFTY"):
+    return (f"❌ {instrument} {old.option_type} {old.strike} alert invalidated by a new "
+            f"{change.trade.option_type} setup.")
+
+
+def alert_message(change: Change, heading, markdown=False):
+    """
+    The alert for a material change, marked as a revision when it replaces
+    the levels of an alert already sent.
+    """
+    body = format_trade(change.trade, markdown=markdown)
+    if change.kind == REVISED:
+        heading = f"{heading} — revised"
+        body = f"{body}\nWas: {levels_summary(change.previous)}"
+    return f"{heading}\n\n{body}"
+
+
+def alert_messages(change: Change, heading, markdown=False, instrument="NIFTY"):
+    """
+    Telegram messages for a material change: invalidation notices for the
+    trades it replaces, then the alert itself. Duplicates produce none.
+    """
+    if not change.material:
+        return []
+    messages = [invalidation_message(old, change, instrument) for old in change.invalidated]
+    messages.append(alert_message(change, heading, markdown=markdown))
+    return messages
+
+
+class TradeStateTracker:
+    """
+    Remembers the trades already alerted so each tick only sends what changed.
+
+    Active trades are held in a dict keyed by fingerprint (option type,
+    strike), so checking a trade is one lookup plus a comparison of its
+    levels. Within window seconds of the last send a trade with the same
+    levels is a duplicate; changed levels are a revision. A new trade on the
+    other side (CE after PE or the reverse) invalidates the active trades
+    of the old side. Repeated "no trade" results are reported once per
+    window. With path set the state is saved as JSON after every change
+    and reloaded on start.
+    """
+
+    def __init__(self, window=DEDUP_WINDOW, tolerance=PRICE_TOLERANCE, path=STATE_PATH):
+        self.window = window
+        self.tolerance = tolerance
+        self.path = path
+        self.active = {}
+        self.empty_since = None
+        self.suppressed = 0
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _expire(self, now):
+        # Called with the lock held. Drops trades whose window has passed, so
+        # they are neither invalidated nor kept in the saved state.
+        expired = [key for key, entry in self.active.items() if now - entry.sent_at >= self.window]
+        for key in expired:
+            del self.active[key]
+        return bool(expired)
+
+    def observe(self, trade: Trade, now=None):
+        """
+        Classifies trade against the active state and records it if it will be sent.
+        """
+        now = now or time.time()
+        key = fingerprint(trade)
+        with self._lock:
+            self.empty_since = None
+            expired = self._expire(now)
+            entry = self.active.get(key)
+            if entry is not None and same_levels(entry.trade, trade, self.tolerance):
+                entry.repeats += 1
+                self.suppressed += 1
+                metrics.SUPPRESSED_ALERTS.inc(reason="duplicate")
+                if expired:
+                    self._save()
+                return Change(DUPLICATE, trade, previous=entry.trade)
+
+            invalidated = ()
+            if entry is None:
+                opposite = [k for k in self.active if k[0] != trade.option_type]
+                invalidated = tuple(self.active.pop(k).trade for k in opposite)
+            self.active[key] = ActiveTrade(trade, now)
+            self._save()
+        if entry is not None:
+            return Change(REVISED, trade, previous=entry.trade)
+        return Change(NEW, trade, invalidated=invalidated)
+
+    def observe_empty(self, now=None):
+        """
+        Returns True when a "no valid trade" notice should go out: the first
+        empty result after a trade, then at most once per window.
+        """
+        now = now or time.time()
+        with self._lock:
+            if self.empty_since is not None and now - self.empty_since < self.window:
+                self.suppressed += 1
+                metrics.SUPPRESSED_ALERTS.inc(reason="no_trade")
+                return False
+            self.empty_since = now
+            return True
+
+    def close(self, trade: Trade):
+        with self._lock:
+            if self.active.pop(fingerprint(trade), None) is not None:
+                self._save()
+
+    def stats(self):
+        return {"active": len(self.active), "suppressed": self.suppressed}
+
+    def _save(self):
+        if not self.path:
+            return
+        state = [
+            {"trade": asdict(entry.trade), "sent_at": entry.sent_at, "repeats": entry.repeats}
+            for entry in self.active.values()
+        ]
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.error("Trade state save Error: %s", e)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logging.error("Trade state load Error: %s", e)
+            return
+        now = time.time()
+        for item in state:
+            fields = item["trade"]
+            fields["targets"] = tuple(fields["targets"])
+            fields["models"] = tuple(fields.get("models", ()))
+            entry = ActiveTrade(Trade(**fields), item["sent_at"], item.get("repeats", 0))
+            if now - entry.sent_at < self.window:
+                self.active[fingerprint(entry.trade)] = entry
@@ -0,0 +1,177 @@
+import metrics
+from response_cache import ERROR_PREFIXES
+from trade_parser import Trade, TradeTokenizer, parse_json_trades, parse_trades
+
+
+def extract_trades(text):
+    """
+    Extracts trades from a model response and returns them as Trade
+    records. Structured (JSON) answers are validated directly; anything else
+    goes through the label parser, which reads both the API format
+    (Option Type:, Strike Price:, ...) and the ChatGPT web format
+    (📈 Trade #1: ...).
+    """
+    with metrics.stage("parse"):
+        trades = parse_json_trades(text)
+        if trades:
+            metrics.STRUCTURED_PARSES.inc(outcome="json")
+        else:
+            if trades is not None:
+                metrics.STRUCTURED_PARSES.inc(outcome="fallback")
+            trades = parse_trades(text)
+    if not trades:
+        count_parse_failure(text)
+    return trades
+
+
+def count_parse_failure(text):
+    # Provider errors are not parse failures; they are counted as errors upstream.
+    if text and text.strip() and not text.startswith(ERROR_PREFIXES):
+        metrics.PARSE_FAILURES.inc()
+
+
+def select_highest_confidence(trades):
+    if not trades:
+        return None
+    return max(trades, key=lambda trade: trade.confidence)
+
+
+def format_price(value):
+    return f"₹{value:g}"
+
+
+def format_minutes(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def format_window(start, end):
+    if start is None:
+        return ""
+    if end is None or end == start:
+        return format_minutes(start)
+    return f"{format_minutes(start)}–{format_minutes(end)}"
+
+
+def format_entry(trade: Trade):
+    entry = format_price(trade.entry_low)
+    if trade.entry_high != trade.entry_low:
+        entry += f"–{trade.entry_high:g}"
+    return entry
+
+
+def trade_fields(trade: Trade):
+    """
+    Display label/value pairs for a trade, in the order of the prompt.
+    """
+    fields = [
+        ("Option Type", trade.option_type),
+        ("Strike Price", str(trade.strike)),
+        ("Premium Entry Range", format_entry(trade)),
+        ("Target(s)", " / ".join(format_price(t) for t in trade.targets)),
+        ("Stop Loss", format_price(trade.stop_loss)),
+        ("Ideal Entry Time", format_window(trade.entry_from, trade.entry_to)),
+        ("Ideal Exit Time", format_window(trade.exit_from, trade.exit_to)),
+        ("Confidence Level", f"{trade.confidence}%"),
+        ("Key Factors", trade.key_factors),
+        ("Reason", trade.reason),
+    ]
+    if trade.models:
+        fields.append(("Models", ", ".join(trade.models)))
+    return [(label, value) for label, value in fields if value]
+
+
+def format_trade(trade: Trade, markdown=False):
+    """
+    Renders a trade as Telegram message lines; markdown=True bolds the labels.
+    """
+    if markdown:
+        return "\n".join(f"*{label}:* {value}" for label, value in trade_fields(trade))
+    return "\n".join(f"{label}: {value}" for label, value in trade_fields(trade))
+
+
+class TradeStreamParser:
+    """
+    Incremental extract_trades for streamed completions.
+
+    feed() takes text deltas and returns the trades completed by them. A trade
+    is emitted as soon as its required fields are in and its reason block has
+    ended (a blank line or the next label), or when the next trade (or the
+    end of the stream) begins. Multi-line reasons arrive whole and the first
+    trade is available long before the model finishes writing.
+    """
+
+    def __init__(self):
+        self.text = []
+        self.trades = []
+        self._partial = ""
+        self._tokenizer = TradeTokenizer()
+
+    def feed(self, chunk):
+        self.text.append(chunk)
+        lines = (self._partial + chunk).split("\n")
+        self._partial = lines.pop()
+        ready = []
+        for line in lines:
+            ready.extend(self._line(line))
+        self.trades.extend(ready)
+        return ready
+
+    def close(self):
+        ready = self._line(self._partial) if self._partial else []
+        self._partial = ""
+        trade = self._tokenizer.finish()
+        if trade:
+            ready.append(trade)
+        self.trades.extend(ready)
+        return ready
+
+    def raw_response(self):
+        return "".join(self.text)
+
+    def _line(self, line):
+        ready = []
+        trade = self._tokenizer.push_line(line)
+        if trade:
+            ready.append(trade)
+        tokenizer = self._tokenizer
+        if tokenizer.complete() and tokenizer.current.get("reason") and tokenizer.field != "reason":
+            trade = tokenizer.finish()
+            if trade:
+                ready.append(trade)
+        return ready
+
+
+def stream_trades(chunks, parser=None):
+    """
+    Yields trades from an iterable of text deltas as soon as each is complete.
+    """
+    parser = parser or TradeStreamParser()
+    try:
+        for chunk in chunks:
+            yield from parser.feed(chunk)
+        yield from parser.close()
+        if not parser.trades:
+            count_parse_failure(parser.raw_response())
+    finally:
+        # Stop the upstream HTTP stream when the caller stops early.
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def pick_streamed_trade(trades, early_confidence):
+    """
+    Returns the first streamed trade at or above early_confidence as soon as it
+    arrives, otherwise the highest-confidence trade once the stream has ended.
+    """
+    seen = []
+    try:
+        for trade in trades:
+            if trade.confidence >= early_confidence:
+                return trade
+            seen.append(trade)
+    finally:
+        close = getattr(trades, "close", None)
+        if close:
+            close()
+    return select_highest_confidence(seen)